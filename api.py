@@ -0,0 +1,192 @@
+#----------------------------------------------------------------------------#
+# JSON API (/api/v1).
+#
+# The routes share their payload builders with the HTML pages. Around them
+# sits the response plumbing: a fast serializer (orjson when installed),
+# field selection and strong ETags derived from a cheap version query, so an
+# unchanged resource answers If-None-Match with 304 before its payload is
+# ever built.
+#----------------------------------------------------------------------------#
+
+import hashlib
+import json
+from datetime import date, datetime
+from flask import Blueprint, Response, request, abort, current_app
+
+from extensions import db
+from models import Venue, Artist, Program, venue_typeahead, artist_typeahead, venue_locations
+from helpers import past_page_args, genre_arg
+from venues import venues_payload, venue_payload
+from artists import artists_payload, artist_payload
+from shows import shows_payload
+
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+
+def _default(value):
+  if isinstance(value, (datetime, date)):
+    return value.isoformat()
+  raise TypeError('%r is not JSON serializable' % (value,))
+
+def dumps(payload):
+  if orjson is not None:
+    return orjson.dumps(payload, default=_default)
+  return json.dumps(payload, default=_default, separators=(',', ':')).encode('utf-8')
+
+def parse_fields(spec):
+  # 'name,upcoming_shows.start_time' -> {'name': {}, 'upcoming_shows': {'start_time': {}}}
+  tree = {}
+  for path in (spec or '').split(','):
+    node = tree
+    for part in path.strip().split('.'):
+      if part:
+        node = node.setdefault(part, {})
+  return tree
+
+def select_fields(payload, tree):
+  # keeps only the selected keys; lists apply the selection to each item
+  if not tree:
+    return payload
+  if isinstance(payload, list):
+    return [select_fields(item, tree) for item in payload]
+  if isinstance(payload, dict):
+    return dict((key, select_fields(payload[key], subtree))
+                for key, subtree in tree.items() if key in payload)
+  return payload
+
+def conditional_json(version, build):
+  # version: any repr()-able value that changes whenever the payload would;
+  # build: callable producing the payload, skipped on a 304
+  digest = hashlib.sha1(repr(version).encode('utf-8'))
+  digest.update(request.query_string)
+  etag = digest.hexdigest()
+  # weak comparison: compress.py serves compressed bodies under W/ tags
+  if request.if_none_match.contains_weak(etag):
+    response = Response(status=304)
+  else:
+    payload = select_fields(build(), parse_fields(request.args.get('fields')))
+    response = Response(dumps(payload), mimetype='application/json')
+  response.set_etag(etag)
+  response.headers['Cache-Control'] = 'no-cache'
+  return response
+
+
+@api.errorhandler(400)
+@api.errorhandler(404)
+def api_error(error):
+  return Response(dumps({"error": error.name, "status": error.code}),
+                  status=error.code, mimetype='application/json')
+
+
+#  Routes
+#  ----------------------------------------------------------------
+#  Each route first runs a one-row version query (row counts, newest
+#  updated_at, upcoming count) for the ETag, and only builds the payload
+#  when the client's copy is stale.
+
+@api.route('/venues')
+def api_venues():
+  now = datetime.now()
+  version = (
+      db.session.query(db.func.count(Venue.id), db.func.max(Venue.updated_at)).one(),
+      db.session.query(
+          db.func.count(Program.id),
+          db.func.max(Program.updated_at),
+          db.func.count(Program.id).filter(Program.time_to_start > now)
+      ).one()
+  )
+  genre = genre_arg()
+  return conditional_json(tuple(version) + (genre,), lambda: venues_payload(genre=genre))
+
+def timeline_version(entity, entity_id):
+  # entity row version plus the versions of its programs and their
+  # artist/venue rows; None when the entity does not exist
+  now = datetime.now()
+  if entity is Venue:
+    related = Artist
+    own_programs, related_programs = Program.venue_id == Venue.id, Program.artist_id == Artist.id
+  else:
+    related = Venue
+    own_programs, related_programs = Program.artist_id == Artist.id, Program.venue_id == Venue.id
+  return db.session.query(
+      entity.updated_at,
+      db.func.count(Program.id),
+      db.func.max(Program.updated_at),
+      db.func.count(Program.id).filter(Program.time_to_start > now),
+      db.func.max(related.updated_at)
+  ).select_from(entity) \
+   .outerjoin(Program, own_programs) \
+   .outerjoin(related, related_programs) \
+   .filter(entity.id == entity_id) \
+   .group_by(entity.id) \
+   .first()
+
+@api.route('/venues/<int:venue_id>')
+def api_show_venue(venue_id):
+  version = timeline_version(Venue, venue_id)
+  if version is None:
+    abort(404)
+  return conditional_json(tuple(version), lambda: venue_payload(venue_id, *past_page_args()))
+
+@api.route('/artists')
+def api_artists():
+  version = db.session.query(db.func.count(Artist.id), db.func.max(Artist.updated_at)).one()
+  genre = genre_arg()
+  return conditional_json(tuple(version) + (genre,), lambda: artists_payload(genre=genre))
+
+@api.route('/artists/<int:artist_id>')
+def api_show_artist(artist_id):
+  version = timeline_version(Artist, artist_id)
+  if version is None:
+    abort(404)
+  return conditional_json(tuple(version), lambda: artist_payload(artist_id, *past_page_args()))
+
+@api.route('/shows')
+def api_shows():
+  version = (
+      db.session.query(db.func.count(Program.id), db.func.max(Program.updated_at)).one(),
+      db.session.query(db.func.max(Venue.updated_at)).scalar(),
+      db.session.query(db.func.max(Artist.updated_at)).scalar(),
+      current_app.config['SHOWS_PAGE_SIZE']
+  )
+
+  def build():
+    data, next_cursor = shows_payload(request.args.get('cursor'))
+    return {"shows": data, "next_cursor": next_cursor}
+  return conditional_json(tuple(version), build)
+
+@api.route('/typeahead')
+def api_typeahead():
+  # served from the in-process prefix index (typeahead.py): no query per
+  # keystroke, so no ETag either
+  index = {'venue': venue_typeahead, 'artist': artist_typeahead}.get(request.args.get('kind'))
+  if index is None:
+    abort(400)
+  limit = min(max(request.args.get('limit', 10, type=int), 1), current_app.config['TYPEAHEAD_MAX_RESULTS'])
+  payload = [{"id": entity_id, "name": name, "upcoming_shows_count": count}
+             for entity_id, name, count in index.complete(request.args.get('q', ''), limit)]
+  response = Response(dumps(payload), mimetype='application/json')
+  response.headers['Cache-Control'] = 'private, max-age=30'
+  return response
+
+@api.route('/venues/near')
+def api_venues_near():
+  # ?lat=&lng= and either radius_km= (venues within it) or nothing (the
+  # nearest ones); see geo.py
+  lat, lng = request.args.get('lat', type=float), request.args.get('lng', type=float)
+  radius_km = request.args.get('radius_km', type=float)
+  if lat is None or lng is None or not (-90 <= lat <= 90 and -180 <= lng <= 180) \
+      or (radius_km is not None and not radius_km > 0):
+    abort(400)
+  limit = min(max(request.args.get('limit', 10, type=int), 1), current_app.config['NEARBY_MAX_RESULTS'])
+  payload = [{"id": row.id, "name": row.name, "address": row.address, "city": row.city, "state": row.state,
+              "latitude": row.latitude, "longitude": row.longitude, "distance_km": round(distance, 3)}
+             for row, distance in venue_locations.nearby(lat, lng, radius_km, limit)]
+  response = Response(dumps(payload), mimetype='application/json')
+  response.headers['Cache-Control'] = 'private, max-age=30'
+  return response
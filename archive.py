@@ -0,0 +1,220 @@
+#----------------------------------------------------------------------------#
+# Cold archive of past shows.
+#
+# `flask archive` moves the shows of every month older than
+# ARCHIVE_AFTER_MONTHS out of Program into gzipped NDJSON files under
+# ARCHIVE_DIR, one pair per month and side:
+#
+#   program-2023-04.venue.ndjson.gz    program-2023-04.venue.index.json
+#   program-2023-04.artist.ndjson.gz   program-2023-04.artist.index.json
+#
+# The shows of one venue (or artist) are one gzip member of the month's
+# file, newest first, and the index maps its id to the member's offset,
+# length and show count. The whole file still reads with zcat, while the
+# past shows of one venue cost one seek and one small decompression per
+# month it had shows in. The month's rows then leave the database: on a
+# partitioned Program (partitions.py) its partition is dropped.
+#
+# Venues and artists keep the number of their archived shows in
+# archived_shows_count. Their pages list the live past shows first and
+# read the archive only when the requested page of the past shows goes
+# beyond them. Archived shows are not in /shows or the counters' recounts,
+# and stay archived when their venue or artist is deleted; the other side
+# just no longer lists them.
+#----------------------------------------------------------------------------#
+
+import gzip
+import json
+import os
+import re
+import threading
+from datetime import datetime
+from sqlalchemy import bindparam, select
+
+import partitions
+
+COLUMNS = ('id', 'venue_id', 'artist_id', 'time_to_start', 'updated_at')
+_index_name = re.compile(r'^program-(\d{4}-\d{2})\.(\w+)\.index\.json$')
+
+
+class ArchivedShow(object):
+  # stands in for a Program row on the venue and artist pages
+  __slots__ = COLUMNS + ('venue', 'artist')
+
+  def __init__(self, row):
+    for name in COLUMNS:
+      setattr(self, name, row[name])
+
+
+def _encode(row):
+  return json.dumps(dict((name, row[name].isoformat() if isinstance(row[name], datetime) else row[name])
+                         for name in COLUMNS))
+
+def _decode(line):
+  row = json.loads(line)
+  for name in ('time_to_start', 'updated_at'):
+    row[name] = datetime.fromisoformat(row[name])
+  return row
+
+def _newest_first(row):
+  return (row['time_to_start'], row['id'])
+
+
+class ShowArchive(object):
+
+  def __init__(self, program, owners):
+    # owners: (model, foreign key attribute on program) pairs, as for
+    # ShowCounters, whose models carry archived_shows_count
+    self.program = program.__table__
+    self.owners = owners
+    self.sides = dict((model, key[:-len('_id')]) for model, key in owners)
+    self.directory = 'archive'
+    self._indexes = {}
+    self._lock = threading.Lock()
+
+  def init_app(self, app):
+    self.directory = app.config.get('ARCHIVE_DIR', self.directory)
+
+  def _path(self, month, side, kind):
+    return os.path.join(self.directory, 'program-%s.%s.%s' % (month, side, kind))
+
+  def months(self):
+    # the archived months ('2023-04'), newest first
+    if not os.path.isdir(self.directory):
+      return []
+    found = set()
+    for name in os.listdir(self.directory):
+      match = _index_name.match(name)
+      if match:
+        found.add(match.group(1))
+    return sorted(found, reverse=True)
+
+  #  Writing
+  #  ----------------------------------------------------------------
+
+  def _write(self, month, side, rows):
+    # rows of one month, grouped by the side's id into gzip members
+    key = side + '_id'
+    rows = sorted(rows, key=lambda row: (row[key],) + _newest_first(row))
+    index = {}
+    data_path, index_path = self._path(month, side, 'ndjson.gz'), self._path(month, side, 'index.json')
+    with open(data_path + '.tmp', 'wb') as stream:
+      start = 0
+      while start < len(rows):
+        owner_id = rows[start][key]
+        end = start
+        while end < len(rows) and rows[end][key] == owner_id:
+          end += 1
+        owned = sorted(rows[start:end], key=_newest_first, reverse=True)
+        member = gzip.compress(''.join(_encode(row) + '\n' for row in owned).encode('utf-8'))
+        index[owner_id] = (stream.tell(), len(member), end - start)
+        stream.write(member)
+        start = end
+      stream.flush()
+      os.fsync(stream.fileno())
+    with open(index_path + '.tmp', 'w') as stream:
+      json.dump(index, stream, separators=(',', ':'))
+      stream.flush()
+      os.fsync(stream.fileno())
+    os.replace(data_path + '.tmp', data_path)
+    os.replace(index_path + '.tmp', index_path)
+
+  def _read_month(self, month, side):
+    path = self._path(month, side, 'ndjson.gz')
+    if not os.path.exists(path):
+      return []
+    with gzip.open(path, 'rt', encoding='utf-8') as stream:
+      return [_decode(line) for line in stream if line.strip()]
+
+  def archive_month(self, session, start, counters):
+    # moves the shows of the month beginning at `start` into its files and
+    # out of the database; returns their number and {table: ids} of the
+    # venues and artists that had them. A month archived before is merged
+    # with the shows booked into it since. The caller commits.
+    program = self.program
+    end = partitions.add_months(start, 1)
+    month = start.strftime('%Y-%m')
+    in_month = (program.c.time_to_start >= start) & (program.c.time_to_start < end)
+    rows = [dict(zip(COLUMNS, row)) for row in session.execute(
+        select(*[program.c[name] for name in COLUMNS]).where(in_month))]
+    if not rows:
+      return 0, {}
+    os.makedirs(self.directory, exist_ok=True)
+    ids = set(row['id'] for row in rows)
+    merged = [row for row in self._read_month(month, self.sides[self.owners[0][0]]) if row['id'] not in ids]
+    for model, key in self.owners:
+      self._write(month, self.sides[model], merged + rows)
+
+    affected = {}
+    for model, key in self.owners:
+      table = model.__table__
+      counts = {}
+      for row in rows:
+        counts[row[key]] = counts.get(row[key], 0) + 1
+      session.execute(table.update().where(table.c.id == bindparam('owner_id'))
+                      .values(archived_shows_count=table.c.archived_shows_count + bindparam('shows')),
+                      [{'owner_id': owner_id, 'shows': shows} for owner_id, shows in counts.items()])
+      affected[table] = set(counts)
+    connection = session.connection()
+    if partitions.is_partitioned(connection):
+      partitions.drop_partition(connection, start)
+    # shows of the month left in the default partition (or the whole table)
+    session.execute(program.delete().where(in_month))
+    counters.refresh(session, affected)
+    return len(rows), affected
+
+  #  Reading
+  #  ----------------------------------------------------------------
+
+  def _index(self, month, side):
+    # {owner id: (offset, length, shows)}, reloaded when the file changes
+    path = self._path(month, side, 'index.json')
+    try:
+      mtime = os.stat(path).st_mtime
+    except OSError:
+      return {}
+    cached = self._indexes.get(path)
+    if cached is None or cached[0] != mtime:
+      with open(path) as stream:
+        index = dict((int(owner_id), entry) for owner_id, entry in json.load(stream).items())
+      with self._lock:
+        self._indexes[path] = cached = (mtime, index)
+    return cached[1]
+
+  def _member(self, month, side, offset, length):
+    with open(self._path(month, side, 'ndjson.gz'), 'rb') as stream:
+      stream.seek(offset)
+      data = gzip.decompress(stream.read(length)).decode('utf-8')
+    return [_decode(line) for line in data.splitlines() if line.strip()]
+
+  def past_shows(self, session, entity, offset=0, limit=None):
+    # [ArchivedShow] of a venue or artist, newest first, with the other
+    # side (show.artist or show.venue) loaded in one query
+    side = self.sides[type(entity)]
+    rows = []
+    for month in self.months():
+      entry = self._index(month, side).get(entity.id)
+      if entry is None:
+        continue
+      position, length, count = entry
+      if offset >= count:
+        offset -= count
+        continue
+      rows.extend(self._member(month, side, position, length)[offset:])
+      offset = 0
+      if limit is not None and len(rows) >= limit:
+        del rows[limit:]
+        break
+    if not rows:
+      return []
+    other, key = [(model, key) for model, key in self.owners if model is not type(entity)][0]
+    related = dict((row.id, row) for row in
+                   session.query(other).filter(other.id.in_(set(row[key] for row in rows))))
+    shows = []
+    for row in rows:
+      if row[key] in related:
+        show = ArchivedShow(row)
+        setattr(show, self.sides[other], related[row[key]])
+        setattr(show, self.sides[type(entity)], entity)
+        shows.append(show)
+    return shows
@@ -0,0 +1,201 @@
+#----------------------------------------------------------------------------#
+# Artist pages.
+#
+# The WTForms classes are imported inside the form views, so only requests
+# that render or read a form load them.
+#----------------------------------------------------------------------------#
+
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+from sqlalchemy.orm.exc import StaleDataError
+
+from extensions import db, page_cache
+from models import Artist, Program, artist_search, artist_genres, deletions
+from filters import format_datetimes
+from genres import facet_list
+from edits import apply_edit, version_token
+from helpers import program_timeline, past_page_args, search_payload, expire_cache_at, \
+    artist_page_keys, genre_arg
+
+blueprint = Blueprint('artists', __name__)
+
+def artists_payload(session=None, genre=None):
+  session = session or db.session
+  # array of artisits (tagged with `genre`, if given), only the columns the
+  # listing needs
+  data = []
+  rows = session.query(Artist.id, Artist.name)
+  if genre is not None:
+    rows = rows.filter(artist_genres.criterion(genre, session))
+
+  for artist_id, name in rows.order_by(Artist.id):
+    data.append({
+        "id": artist_id,
+        "name": name
+    })
+  return data
+
+def artist_genre_payload(session=None):
+  # artist counts per genre over all cities
+  totals = {}
+  for counts in artist_genres.counts(session).values():
+    for genre, count in counts.items():
+      totals[genre] = totals.get(genre, 0) + count
+  return facet_list(totals)
+
+@blueprint.route('/artists')
+@page_cache.cached('artists')
+def artists():
+  genre = genre_arg()
+  return render_template('pages/artists.html', artists=artists_payload(genre=genre),
+                         genres=artist_genre_payload(), genre=genre)
+
+@blueprint.route('/artists/search', methods=['POST'])
+def search_artists():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
+  # search for "band" should return "The Wild Sax Band".
+  response = search_payload(artist_search, request.form)
+  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+
+def artist_payload(artist_id, past_limit=None, past_offset=0, session=None):
+  session = session or db.session
+  particular_artist = session.query(Artist).get(artist_id)
+  if particular_artist is None:
+    abort(404)
+  upcoming, past, upcoming_count, past_count = program_timeline(
+      session, particular_artist, Program.artist_id == artist_id, Program.venue, past_limit, past_offset)
+
+  # programs at venues wrt artist id, venue columns already joined in
+  def program_data(programs):
+    start_times = format_datetimes([program.time_to_start for program in programs], 'full')
+    return [{
+        "venue_id": program.venue_id,
+        "venue_name": program.venue.name,
+        "venue_image_link": program.venue.image_link,
+        "start_time": start_time
+    } for program, start_time in zip(programs, start_times)]
+  future_programs = program_data(upcoming)
+  prev_programs = program_data(past)
+  # the upcoming/past split moves when the next show starts
+  expire_cache_at(upcoming[0].time_to_start if upcoming else None)
+
+  data={
+    "id": particular_artist.id,
+    "name": particular_artist.name,
+    "genres": particular_artist.genres,
+    "city": particular_artist.city,
+    "state": particular_artist.state,
+    "phone": particular_artist.phone,
+    "facebook_link": particular_artist.facebook_link,
+    "image_link": particular_artist.image_link,
+    "past_shows": prev_programs,
+    "upcoming_shows": future_programs,
+    "past_shows_count": past_count,
+    "upcoming_shows_count": upcoming_count,
+  }
+  return data
+
+@blueprint.route('/artists/<int:artist_id>')
+@page_cache.cached('artist:{artist_id}')
+def show_artist(artist_id):
+  # shows the artist page with the given artist_id
+  data = artist_payload(artist_id, *past_page_args())
+  return render_template('pages/show_artist.html', artist=data)
+
+#  Update
+#  ----------------------------------------------------------------
+
+# (model attribute, form field) pairs of the edit form, in version token order
+EDIT_FIELDS = [
+  ('name', 'name'), ('genres', 'genres'), ('city', 'city'), ('state', 'state'),
+  ('phone', 'phone'), ('web_link', 'website_link'), ('facebook_link', 'facebook_link'),
+  ('seek_desc', 'seeking_description'), ('image_link', 'image_link'),
+]
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['GET'])
+def edit_artist(artist_id):
+  from forms import ArtistForm
+  particular_artist = Artist.query.get_or_404(artist_id)
+  form = ArtistForm(data=dict((field, getattr(particular_artist, attribute)) for attribute, field in EDIT_FIELDS))
+  form.version_token.data = version_token(particular_artist.version,
+                                          [form[field].data for attribute, field in EDIT_FIELDS])
+  return render_template('forms/edit_artist.html', form=form, artist=particular_artist)
+
+@blueprint.route('/artists/<int:artist_id>/edit', methods=['POST'])
+def edit_artist_submission(artist_id):
+  from forms import ArtistForm
+  form = ArtistForm()
+  try:
+    # one UPDATE of the changed columns, guarded by the version the form was made from
+    changed = apply_edit(db.session, Artist, artist_id, form.version_token.data,
+                         [(attribute, form[field].data) for attribute, field in EDIT_FIELDS])
+    stale_pages = artist_page_keys(artist_id) if changed else []
+    db.session.commit()
+    page_cache.invalidate(*stale_pages)
+    flash('The Artist data has been successfully updated!')
+  except StaleDataError:
+    db.session.rollback()
+    flash('This artist was changed by someone else meanwhile; reopen the form to edit it')
+  except:
+    flash('An Error occured and the update was unsuccessful')
+    db.session.rollback()
+  finally:
+    db.session.close()
+  return redirect(url_for('artists.show_artist', artist_id=artist_id))
+
+#  Create Artist
+#  ----------------------------------------------------------------
+
+@blueprint.route('/artists/create', methods=['GET'])
+def create_artist_form():
+  from forms import ArtistForm
+  form = ArtistForm()
+  return render_template('forms/new_artist.html', form=form)
+
+@blueprint.route('/artists/create', methods=['POST'])
+def create_artist_submission():
+  from forms import ArtistForm
+  # called upon submitting the new artist listing form
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  form = ArtistForm()
+
+  try:
+    artist = Artist(name=form.name.data.strip(), city=form.city.data.strip(), state=form.city.data, phone=form.phone.data, genres=form.genres.data, 
+                    image_link=form.image_link.data, facebook_link=form.facebook_link.data,web_link=form.website_link.data,seek_desc= form.seeking_description.data)
+    
+    db.session.add(artist)
+    db.session.commit()
+    page_cache.invalidate('artists')
+
+  # on successful db insert, flash success
+    flash('Artist was successfully created!')
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Artist ' + data.name + ' could not be listed.')
+  except:
+    db.session.rollback()
+    flash('An error occurred. Artist could not be created.')
+  finally:
+    db.session.close()
+  
+  return render_template('pages/home.html')
+
+@blueprint.route('/artist/<artist_id>', methods=['DELETE'])
+def remove_artist(artist_id):
+  try:
+
+    # its shows go in set-based batches (or, with SOFT_DELETE, later)
+    stale_pages = artist_page_keys(artist_id)
+    if deletions.delete(db.session, Artist, artist_id):
+      db.session.commit()
+      page_cache.invalidate(*stale_pages)
+      flash('Particular artist was deleted')
+    else:
+      flash('Artist not found')
+  except:
+    flash('An error occured and Artist  could not be deleted')
+    db.session.rollback()
+  finally:
+    db.session.close()
+
+  return redirect(url_for('index'))
@@ -0,0 +1,207 @@
+#----------------------------------------------------------------------------#
+# ASGI entry point.
+#
+#   uvicorn asgi:application --workers 2
+#
+# The read-heavy pages (venue/artist directories and detail pages, the show
+# listing and both searches) run as async views over an async SQLAlchemy
+# engine (asyncpg for Postgres, aiosqlite for SQLite), so a worker keeps
+# serving other requests while one waits on the database. They reuse the
+# payload builders and templates of the blueprints: the sync query code runs through
+# AsyncSession.run_sync() and the page is rendered inside a regular Flask
+# request context built from the ASGI scope. Every other route (forms,
+# deletes, the JSON API, /metrics) is handed to the WSGI app through
+# asgiref's WsgiToAsgi adapter and behaves exactly as under `flask run`.
+#
+# Needs asgiref, an ASGI server (e.g. uvicorn) and asyncpg or aiosqlite.
+#----------------------------------------------------------------------------#
+
+import io
+import os
+import re
+import sys
+
+from asgiref.wsgi import WsgiToAsgi
+from flask import render_template, request, stream_template, Response
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from werkzeug.exceptions import HTTPException
+
+import config
+from app import create_app
+from genres import GENRES
+from helpers import genre_arg, past_page_args, search_payload, show_filter_args, show_filters
+from models import schedule_index, venue_search, artist_search
+from venues import venues_payload, venue_payload
+from artists import artists_payload, artist_genre_payload, artist_payload
+from shows import shows_payload
+
+ASYNC_DRIVERS = {'postgresql': 'asyncpg', 'sqlite': 'aiosqlite'}
+
+
+def async_database_url(uri):
+  url = make_url(uri)
+  backend = url.get_backend_name()
+  return str(url.set(drivername='%s+%s' % (backend, ASYNC_DRIVERS[backend])))
+
+def async_engine_options(uri):
+  # the configured pool sizing; the instrumented pool class is sync-only
+  options = config.engine_options(uri)
+  options.pop('poolclass', None)
+  return options
+
+async def read_body(receive):
+  chunks, more_body = [], True
+  while more_body:
+    message = await receive()
+    chunks.append(message.get('body', b''))
+    more_body = message.get('more_body', False)
+  return b''.join(chunks)
+
+def build_environ(scope, body):
+  server = scope.get('server') or ('localhost', 80)
+  environ = {
+    'REQUEST_METHOD': scope['method'],
+    'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+    'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+    'QUERY_STRING': scope['query_string'].decode('ascii'),
+    'SERVER_NAME': server[0],
+    'SERVER_PORT': str(server[1]),
+    'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+    'wsgi.version': (1, 0),
+    'wsgi.url_scheme': scope.get('scheme', 'http'),
+    'wsgi.input': io.BytesIO(body),
+    'wsgi.errors': sys.stderr,
+    'wsgi.multithread': True,
+    'wsgi.multiprocess': True,
+    'wsgi.run_once': False,
+  }
+  if scope.get('client'):
+    environ['REMOTE_ADDR'] = scope['client'][0]
+  for name, value in scope['headers']:
+    name = name.decode('latin1')
+    if name == 'content-length':
+      key = 'CONTENT_LENGTH'
+    elif name == 'content-type':
+      key = 'CONTENT_TYPE'
+    else:
+      key = 'HTTP_' + name.upper().replace('-', '_')
+    value = value.decode('latin1')
+    environ[key] = environ[key] + ',' + value if key in environ else value
+  return environ
+
+
+class AsyncFyyur(object):
+
+  def __init__(self, flask_app, database_uri):
+    self.flask_app = flask_app
+    self.wsgi = WsgiToAsgi(flask_app)
+    url = async_database_url(database_uri)
+    self.engine = create_async_engine(url, **async_engine_options(url))
+    self.sessions = sessionmaker(self.engine, class_=AsyncSession, expire_on_commit=False)
+    self.routes = [
+      ('GET', re.compile(r'^/venues$'), self.venues),
+      ('GET', re.compile(r'^/venues/(?P<venue_id>\d+)$'), self.show_venue),
+      ('POST', re.compile(r'^/venues/search$'), self.search_venues),
+      ('GET', re.compile(r'^/artists$'), self.artists),
+      ('GET', re.compile(r'^/artists/(?P<artist_id>\d+)$'), self.show_artist),
+      ('POST', re.compile(r'^/artists/search$'), self.search_artists),
+      ('GET', re.compile(r'^/shows$'), self.shows),
+    ]
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      return await self.lifespan(receive, send)
+    if scope['type'] == 'http':
+      for method, pattern, view in self.routes:
+        match = pattern.match(scope['path'])
+        if match and scope['method'] == method:
+          kwargs = dict((key, int(value)) for key, value in match.groupdict().items())
+          return await self.dispatch(view, kwargs, scope, receive, send)
+    await self.wsgi(scope, receive, send)
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        # build the schedule index before taking traffic
+        await self.run(schedule_index.build)
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        await self.engine.dispose()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  async def dispatch(self, view, kwargs, scope, receive, send):
+    environ = build_environ(scope, await read_body(receive))
+    flask_app = self.flask_app
+    with flask_app.request_context(environ):
+      try:
+        response = flask_app.preprocess_request()
+        if response is None:
+          response = await view(**kwargs)
+        response = flask_app.make_response(response)
+      except HTTPException as error:
+        response = flask_app.make_response(flask_app.handle_user_exception(error))
+      except Exception as error:
+        response = flask_app.make_response(flask_app.handle_exception(error))
+      response = flask_app.process_response(response)
+
+      await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin1'), value.encode('latin1'))
+                    for name, value in response.headers.items()],
+      })
+      # streamed templates go out chunk by chunk
+      for chunk in response.iter_encoded():
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+      await send({'type': 'http.response.body', 'body': b''})
+
+  async def run(self, payload, *args, **kwargs):
+    # runs a sync payload builder on an async connection
+    async with self.sessions() as session:
+      return await session.run_sync(lambda sync_session: payload(*args, session=sync_session, **kwargs))
+
+  #  Views
+  #  ----------------------------------------------------------------
+
+  async def venues(self):
+    genre = genre_arg()
+    return render_template('pages/venues.html', areas=await self.run(venues_payload, genre=genre),
+                           genre=genre)
+
+  async def show_venue(self, venue_id):
+    past_limit, past_offset = past_page_args()
+    data = await self.run(venue_payload, venue_id, past_limit, past_offset)
+    return render_template('pages/show_venue.html', venue=data)
+
+  async def search_venues(self):
+    response = await self.run(search_payload, venue_search, request.form)
+    return render_template('pages/search_venues.html', results=response,
+                           search_term=request.form.get('search_term', ''))
+
+  async def artists(self):
+    genre = genre_arg()
+    return render_template('pages/artists.html', artists=await self.run(artists_payload, genre=genre),
+                           genres=await self.run(artist_genre_payload), genre=genre)
+
+  async def show_artist(self, artist_id):
+    past_limit, past_offset = past_page_args()
+    data = await self.run(artist_payload, artist_id, past_limit, past_offset)
+    return render_template('pages/show_artist.html', artist=data)
+
+  async def search_artists(self):
+    response = await self.run(search_payload, artist_search, request.form)
+    return render_template('pages/search_artists.html', results=response,
+                           search_term=request.form.get('search_term', ''))
+
+  async def shows(self):
+    data, next_cursor = await self.run(shows_payload, request.args.get('cursor'),
+                                       filters=show_filters(), format_times=False)
+    return Response(stream_template('pages/shows.html', shows=data, next_cursor=next_cursor,
+                                    filters=show_filter_args(), genres=GENRES))
+
+
+application = AsyncFyyur(create_app(), os.environ.get('ASYNC_DATABASE_URL', config.SQLALCHEMY_DATABASE_URI))
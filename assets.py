@@ -0,0 +1,170 @@
+#----------------------------------------------------------------------------#
+# Static asset bundles and the template bytecode cache.
+#
+# `flask assets build` concatenates the stylesheets and scripts of
+# layouts/main.html into one file per BUNDLES entry under static/dist,
+# named after a hash of its content (main.3f2a9c1b0d4e.css), writes a .gz
+# (and, with the brotli package, a .br) copy next to each one and records
+# the hashed names in static/dist/manifest.json. It also compiles every
+# template into the Jinja bytecode cache, so workers load them instead of
+# compiling on first hit.
+#
+# With the manifest in place url_for('static', filename='dist/main.css')
+# emits the hashed name, and those files are served with a year-long
+# `immutable` Cache-Control in the best encoding the client accepts: their
+# name changes whenever their content does. Without it (a checkout that has
+# not been built) bundle() lists the source files instead.
+#----------------------------------------------------------------------------#
+
+import hashlib
+import json
+import mimetypes
+import os
+import re
+from flask import request, send_from_directory
+from jinja2 import FileSystemBytecodeCache
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+try:
+  import rjsmin
+except ImportError:
+  rjsmin = None
+
+DIST = 'dist'
+MANIFEST = 'manifest.json'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# bundle -> source files (relative to static/), in page order. Bundles sit
+# at the same depth as css/, so relative url()s in the sources still resolve.
+BUNDLES = {
+  'dist/main.css': ['css/bootstrap.min.css', 'css/layout.main.css', 'css/main.css',
+                    'css/main.responsive.css', 'css/main.quickfix.css'],
+  'dist/head.js': ['js/libs/modernizr-2.8.2.min.js', 'js/libs/moment.min.js'],
+  'dist/main.js': ['js/script.js', 'js/libs/bootstrap-3.1.1.min.js', 'js/plugins.js'],
+}
+
+_css_comments = re.compile(r'/\*(?!!).*?\*/', re.S)
+_css_whitespace = re.compile(r'\s+')
+_css_punctuation = re.compile(r'\s*([{};,>])\s*')
+
+
+def minify_css(source):
+  # comments (except /*! licences */) and insignificant whitespace
+  source = _css_comments.sub('', source)
+  source = _css_whitespace.sub(' ', source)
+  source = _css_punctuation.sub(r'\1', source)
+  return source.replace(';}', '}').strip()
+
+def minify_js(source):
+  # rjsmin when installed; the vendored libraries are minified already
+  return rjsmin.jsmin(source) if rjsmin is not None else source
+
+
+def build_bundles(static_folder):
+  # writes the hashed bundles and their compressed variants, then the
+  # manifest; returns {bundle: (hashed name, bytes, gzip bytes)}
+  import gzip
+  dist = os.path.join(static_folder, DIST)
+  os.makedirs(dist, exist_ok=True)
+  manifest, sizes = {}, {}
+  for name, sources in sorted(BUNDLES.items()):
+    minify = minify_css if name.endswith('.css') else minify_js
+    parts = []
+    for source in sources:
+      with open(os.path.join(static_folder, source), encoding='utf-8') as source_file:
+        parts.append(minify(source_file.read()))
+    # a newline (js: a semicolon too) keeps one file's tail from running
+    # into the next file's head
+    content = ('\n;\n' if name.endswith('.js') else '\n').join(parts).encode('utf-8')
+    stem, extension = os.path.splitext(name)
+    hashed = '%s.%s%s' % (stem, hashlib.sha256(content).hexdigest()[:12], extension)
+    path = os.path.join(static_folder, hashed)
+    with open(path, 'wb') as bundle_file:
+      bundle_file.write(content)
+    # mtime=0 keeps the .gz byte-identical across builds
+    compressed = gzip.compress(content, compresslevel=9, mtime=0)
+    with open(path + '.gz', 'wb') as bundle_file:
+      bundle_file.write(compressed)
+    if brotli is not None:
+      with open(path + '.br', 'wb') as bundle_file:
+        bundle_file.write(brotli.compress(content, quality=11))
+    manifest[name] = hashed
+    sizes[name] = (hashed, len(content), len(compressed))
+  # earlier builds' files stay: cached pages may still link to them
+  with open(os.path.join(dist, MANIFEST), 'w') as manifest_file:
+    json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+  return sizes
+
+def compile_templates(app):
+  # loads every template once, which stores its bytecode in the cache
+  names = app.jinja_env.list_templates()
+  for name in names:
+    app.jinja_env.get_template(name)
+  return names
+
+
+class Assets(object):
+
+  def __init__(self, app=None):
+    self.manifest = {}
+    self.encodings = {}
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    # must run before anything touches app.jinja_env: the bytecode cache
+    # is an option of the environment
+    cache_dir = app.config.get('JINJA_CACHE_DIR')
+    if cache_dir:
+      os.makedirs(cache_dir, exist_ok=True)
+      app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(cache_dir))
+    self.static_folder = app.static_folder
+    self.load()
+    app.url_defaults(self._hashed_url)
+    app.context_processor(lambda: {'bundle': self.bundle})
+    self._send_static_file = app.view_functions['static']
+    app.view_functions['static'] = self.send_static
+
+  def load(self):
+    # reads the manifest of the last build, if any
+    self.manifest, self.encodings = {}, {}
+    try:
+      with open(os.path.join(self.static_folder, DIST, MANIFEST)) as manifest_file:
+        self.manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+      return
+    for hashed in self.manifest.values():
+      path = os.path.join(self.static_folder, hashed)
+      self.encodings[hashed] = [(encoding, suffix) for encoding, suffix in (('br', '.br'), ('gzip', '.gz'))
+                                if os.path.exists(path + suffix)]
+
+  def bundle(self, name):
+    # the static filenames to link for a bundle
+    if name in self.manifest:
+      return [name]
+    return BUNDLES[name]
+
+  def _hashed_url(self, endpoint, values):
+    if endpoint == 'static' and values.get('filename') in self.manifest:
+      values['filename'] = self.manifest[values['filename']]
+
+  def send_static(self, filename):
+    if filename not in self.encodings:
+      return self._send_static_file(filename=filename)
+    served = filename
+    encoding = None
+    for candidate, suffix in self.encodings[filename]:
+      if request.accept_encodings[candidate]:
+        served, encoding = filename + suffix, candidate
+        break
+    response = send_from_directory(self.static_folder, served,
+                                   mimetype=mimetypes.guess_type(filename)[0])
+    if encoding is not None:
+      response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
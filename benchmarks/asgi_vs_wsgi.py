@@ -0,0 +1,153 @@
+#----------------------------------------------------------------------------#
+# WSGI vs ASGI throughput.
+#
+#   python -m benchmarks.asgi_vs_wsgi --scale 1k --connections 1 8 32
+#
+# Seeds the same dataset as benchmarks.run, then serves it twice from a
+# subprocess on a loopback port: once through werkzeug's threaded WSGI
+# server (`python app.py`) and once through uvicorn (`asgi:application`).
+# Each read route is driven with a fixed number of concurrent connections
+# and the requests per second of both modes are printed side by side.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WSGI_SERVER = '''
+import logging, sys
+from werkzeug.serving import make_server
+from app import create_app
+logging.getLogger('werkzeug').setLevel(logging.ERROR)
+make_server('127.0.0.1', int(sys.argv[1]), create_app(), threaded=True).serve_forever()
+'''
+
+
+def free_port():
+  sock = socket.socket()
+  sock.bind(('127.0.0.1', 0))
+  port = sock.getsockname()[1]
+  sock.close()
+  return port
+
+def wait_until_up(base, timeout=30):
+  deadline = time.time() + timeout
+  while time.time() < deadline:
+    try:
+      urllib.request.urlopen(base + '/').read()
+      return
+    except (urllib.error.URLError, ConnectionError):
+      time.sleep(0.2)
+  raise RuntimeError('server at %s did not start' % base)
+
+def start_server(mode, port, env):
+  if mode == 'wsgi':
+    command = [sys.executable, '-c', WSGI_SERVER, str(port)]
+  else:
+    command = [sys.executable, '-m', 'uvicorn', 'asgi:application', '--port', str(port),
+               '--log-level', 'warning', '--no-access-log']
+  return subprocess.Popen(command, cwd=ROOT, env=env)
+
+def drive(url, method, data, requests, connections):
+  body = urllib.parse.urlencode(data).encode() if data else None
+
+  def fetch(i):
+    try:
+      with urllib.request.urlopen(urllib.request.Request(url, data=body, method=method)) as response:
+        response.read()
+      return True
+    except urllib.error.URLError:
+      return False
+
+  started = time.perf_counter()
+  with ThreadPoolExecutor(max_workers=connections) as pool:
+    outcomes = list(pool.map(fetch, range(requests)))
+  elapsed = time.perf_counter() - started
+  return {'throughput_rps': len(outcomes) / elapsed, 'errors': outcomes.count(False)}
+
+
+def main(argv=None):
+  from benchmarks.datagen import SCALES, database_url
+  parser = argparse.ArgumentParser(description='Compare WSGI and ASGI throughput of the read routes.')
+  parser.add_argument('--scale', choices=sorted(SCALES), default='1k')
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--database', help='SQLAlchemy URL; a SQLite file in the temp dir by default')
+  parser.add_argument('--connections', type=int, nargs='+', default=[1, 8, 32])
+  parser.add_argument('--requests', type=int, default=200, help='requests per route and connection count')
+  parser.add_argument('--output', help='write the results as JSON')
+  args = parser.parse_args(argv)
+
+  database = args.database or database_url('%s-%d' % (args.scale, args.seed))
+  os.environ['DATABASE_URL'] = database
+  # the async views do not go through the page cache; keep the modes comparable
+  os.environ['CACHE_TYPE'] = 'null'
+
+  from app import create_app
+  from extensions import db
+  from models import Venue, Artist, Program, show_counters
+  from benchmarks.datagen import generate
+  with create_app().app_context():
+    db.create_all()
+    if Program.query.first() is None:
+      generate(db, Venue.__table__, Artist.__table__, Program.__table__,
+               scale=args.scale, seed=args.seed)
+      # the seed inserts bypass the ORM events
+      show_counters.refresh(db.session)
+      db.session.commit()
+    venue_id = db.session.query(db.func.min(Venue.id)).scalar()
+    artist_id = db.session.query(db.func.min(Artist.id)).scalar()
+    db.session.remove()
+
+  routes = [
+    ('venues', 'GET', '/venues', None),
+    ('show_venue', 'GET', '/venues/%d' % venue_id, None),
+    ('artists', 'GET', '/artists', None),
+    ('show_artist', 'GET', '/artists/%d' % artist_id, None),
+    ('shows', 'GET', '/shows', None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'hop'}),
+  ]
+
+  env = dict(os.environ, PYTHONWARNINGS='ignore')
+  results = {'meta': {'scale': args.scale, 'seed': args.seed,
+                      'database': database.split('@')[-1]}}
+  for mode in ('wsgi', 'asgi'):
+    port = free_port()
+    server = start_server(mode, port, env)
+    base = 'http://127.0.0.1:%d' % port
+    try:
+      wait_until_up(base)
+      results[mode] = {}
+      for name, method, path, data in routes:
+        for connections in args.connections:
+          drive(base + path, method, data, min(args.requests, 20), connections)  # warm up
+          results[mode]['%s@%d' % (name, connections)] = drive(
+              base + path, method, data, args.requests, connections)
+    finally:
+      server.terminate()
+      server.wait()
+
+  print('%-24s %12s %12s %8s' % ('route@connections', 'wsgi req/s', 'asgi req/s', 'change'))
+  for key, wsgi in results['wsgi'].items():
+    asgi = results['asgi'][key]
+    print('%-24s %12.1f %12.1f %+7.1f%%%s' % (
+        key, wsgi['throughput_rps'], asgi['throughput_rps'],
+        (asgi['throughput_rps'] - wsgi['throughput_rps']) / wsgi['throughput_rps'] * 100,
+        '  errors %d/%d' % (wsgi['errors'], asgi['errors']) if wsgi['errors'] or asgi['errors'] else ''))
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+  main()
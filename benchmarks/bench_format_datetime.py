@@ -0,0 +1,45 @@
+#----------------------------------------------------------------------------#
+# Micro-benchmark: per-tile start time formatting cost.
+#
+#   python -m benchmarks.bench_format_datetime [tiles]
+#
+# "before" replays the old path (str() -> dateutil parse -> babel format in
+# the controller, then parse + format again in the template filter); "after"
+# formats the datetime objects of a whole page with format_datetimes().
+#----------------------------------------------------------------------------#
+
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+import babel.dates
+import dateutil.parser
+
+from filters import format_datetime, format_datetimes
+
+
+def legacy_format_datetime(value, format='medium'):
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format, locale='en')
+
+def before(values):
+  return [legacy_format_datetime(legacy_format_datetime(str(value)), 'full') for value in values]
+
+def single(values):
+  return [format_datetime(value, 'full') for value in values]
+
+def after(values):
+  return format_datetimes(values, 'full')
+
+
+if __name__ == '__main__':
+  tiles = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+  start = datetime(2026, 1, 1, 20, 30)
+  values = [start + timedelta(hours=i) for i in range(tiles)]
+  for name, fn in (('before', before), ('format_datetime', single), ('format_datetimes', after)):
+    runs = timeit.repeat(lambda: fn(values), number=1, repeat=5)
+    print('%-18s %8.2f us/tile' % (name, min(runs) / tiles * 1e6))
@@ -0,0 +1,157 @@
+#----------------------------------------------------------------------------#
+# Seeded synthetic dataset for benchmarks.
+#
+# Builds venues, artists and shows at a named scale. Show placement is
+# Zipf-skewed, so a handful of venues and artists carry a large share of
+# all shows, the way real popular venues do. The same seed always
+# produces the same dataset.
+#
+# The benchmarks keep their seeded SQLite files in the temp dir between
+# runs. database_url() names each file after a hash of the models' schema,
+# so a file from before a schema change is never reused: it is deleted
+# and the new one seeded afresh.
+#----------------------------------------------------------------------------#
+
+import bisect
+import glob
+import hashlib
+import itertools
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from genres import GENRES
+from geo import geohash
+from importer import chunked
+from search import search_document
+
+# scale name -> (venues, artists, shows)
+SCALES = {
+  'smoke': (20, 40, 200),
+  '1k': (50, 100, 1000),
+  '100k': (2000, 5000, 100000),
+  '1m': (10000, 30000, 1000000),
+}
+
+CITIES = [
+  ('San Francisco', 'CA'), ('New York', 'NY'), ('Chicago', 'IL'), ('Austin', 'TX'),
+  ('Seattle', 'WA'), ('Nashville', 'TN'), ('New Orleans', 'LA'), ('Denver', 'CO'),
+  ('Boston', 'MA'), ('Atlanta', 'GA'), ('Portland', 'OR'), ('Detroit', 'MI'),
+]
+# city centres as in data/gazetteer.csv; venues are scattered around them
+CENTRES = {
+  'San Francisco': (37.7749, -122.4194), 'New York': (40.7128, -74.0060), 'Chicago': (41.8781, -87.6298),
+  'Austin': (30.2672, -97.7431), 'Seattle': (47.6062, -122.3321), 'Nashville': (36.1627, -86.7816),
+  'New Orleans': (29.9511, -90.0715), 'Denver': (39.7392, -104.9903), 'Boston': (42.3601, -71.0589),
+  'Atlanta': (33.7490, -84.3880), 'Portland': (45.5152, -122.6784), 'Detroit': (42.3314, -83.0458),
+}
+WORDS = ['Blue', 'Velvet', 'Hop', 'Lounge', 'Hall', 'Garden', 'Sax', 'Band', 'Wild', 'Live',
+         'Coffee', 'Square', 'Park', 'Echo', 'Static', 'Neon', 'Crown', 'River', 'Moon', 'Room']
+
+
+def schema_hash():
+  # of the CREATE TABLE and CREATE INDEX statements of every model on SQLite
+  from sqlalchemy.dialects import sqlite
+  from sqlalchemy.schema import CreateIndex, CreateTable
+  from extensions import db
+  import models
+  dialect = sqlite.dialect()
+  statements = []
+  for table in db.metadata.sorted_tables:
+    statements.append(str(CreateTable(table).compile(dialect=dialect)))
+    statements.extend(sorted(str(CreateIndex(index).compile(dialect=dialect)) for index in table.indexes))
+  return hashlib.sha1('\n'.join(statements).encode('utf-8')).hexdigest()[:10]
+
+def database_url(name):
+  # SQLite URL of the benchmark database `name` (e.g. '1k-42') for the
+  # current schema; files of the same name for other schemas are removed
+  prefix = os.path.join(tempfile.gettempdir(), 'fyyur-bench-%s' % name)
+  path = '%s-%s.db' % (prefix, schema_hash())
+  for stale in glob.glob(glob.escape(prefix) + '-*.db') + [prefix + '.db']:
+    if stale != path and os.path.exists(stale):
+      os.remove(stale)
+  return 'sqlite:///' + path
+
+def zipf_cumulative_weights(n, s=1.1):
+  return list(itertools.accumulate(1.0 / (rank ** s) for rank in range(1, n + 1)))
+
+def pick(rng, ids, cumulative):
+  # weighted choice over ids using precomputed cumulative weights
+  return ids[bisect.bisect(cumulative, rng.random() * cumulative[-1])]
+
+def entity_name(rng, kind, i):
+  return '%s %s %s %d' % (rng.choice(WORDS), rng.choice(WORDS), kind, i)
+
+def generate(db, venue_table, artist_table, program_table, scale='1k', seed=42,
+             chunk_size=5000, now=None):
+  # inserts the dataset and returns the ids of the busiest venue and artist
+  n_venues, n_artists, n_shows = SCALES[scale]
+  rng = random.Random(seed)
+  # its own stream, so the rest of the dataset matches earlier runs
+  scatter = random.Random(seed + 1)
+  now = now or datetime.now().replace(microsecond=0)
+
+  def people(kind, n, extra):
+    for i in range(n):
+      city, state = rng.choice(CITIES)
+      genres = rng.sample(GENRES, rng.randint(1, 3))
+      name = entity_name(rng, kind, i)
+      row = {
+        'name': name,
+        'city': city,
+        'state': state,
+        'phone': '%03d-%03d-%04d' % (rng.randint(200, 999), rng.randint(0, 999), rng.randint(0, 9999)),
+        'image_link': 'https://images.example.com/%s/%d.jpg' % (kind.lower(), i),
+        'facebook_link': 'https://www.facebook.com/%s%d' % (kind.lower(), i),
+        'genres': genres,
+        'web_link': 'https://%s%d.example.com' % (kind.lower(), i),
+        'seek_desc': rng.choice(['', 'Looking for local acts to play on weekends.']),
+        'search_document': search_document(name, city, genres),
+        'updated_at': now,
+      }
+      row.update(extra(i, row))
+      yield row
+
+  def insert(table, rows):
+    for chunk in chunked(rows, chunk_size):
+      db.session.execute(table.insert(), chunk)
+    db.session.commit()
+
+  def venue(i, row):
+    # about 5 km around the city centre
+    lat, lng = CENTRES[row['city']]
+    lat, lng = lat + scatter.gauss(0, 0.05), lng + scatter.gauss(0, 0.06)
+    return {
+      'address': '%d %s Street' % (rng.randint(1, 9999), rng.choice(WORDS)),
+      'looking_for_talent': rng.random() < 0.3,
+      'latitude': lat,
+      'longitude': lng,
+      'geohash': geohash(lat, lng),
+    }
+
+  insert(venue_table, people('Venue', n_venues, venue))
+  insert(artist_table, people('Artist', n_artists, lambda i, row: {}))
+
+  venue_ids = [row[0] for row in db.session.query(venue_table.c.id).order_by(venue_table.c.id)]
+  artist_ids = [row[0] for row in db.session.query(artist_table.c.id).order_by(artist_table.c.id)]
+  venue_weights = zipf_cumulative_weights(len(venue_ids))
+  artist_weights = zipf_cumulative_weights(len(artist_ids))
+
+  # roughly three quarters of the shows are in the past two years, the
+  # rest spread over the coming year
+  def shows():
+    for i in range(n_shows):
+      if rng.random() < 0.75:
+        offset = -rng.randint(1, 730 * 24)
+      else:
+        offset = rng.randint(1, 365 * 24)
+      yield {
+        'venue_id': pick(rng, venue_ids, venue_weights),
+        'artist_id': pick(rng, artist_ids, artist_weights),
+        'time_to_start': now + timedelta(hours=offset),
+        'updated_at': now,
+      }
+  insert(program_table, shows())
+  return {'hot_venue_id': venue_ids[0], 'hot_artist_id': artist_ids[0],
+          'venues': n_venues, 'artists': n_artists, 'shows': n_shows}
@@ -0,0 +1,111 @@
+#----------------------------------------------------------------------------#
+# Statements and bytes sent per venue edit.
+#
+#   python -m benchmarks.edits --scale smoke
+#
+# Seeds (or reuses) the benchmarks.run database and edits the phone number
+# of --edits venues twice over: once as edit_venue_submission did before
+# diff-based edits (load the row, assign every form field, commit) and once
+# through edits.apply_edit with the version token the edit form carries.
+# Reports the statements per edit, the bytes of SQL and bound values sent
+# to the database per edit, and the median time of one edit.
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import statistics
+import time
+
+
+class StatementLog(object):
+
+  def __init__(self):
+    self.statements = 0
+    self.sql_bytes = 0
+    self.value_bytes = 0
+
+  def __call__(self, conn, cursor, statement, parameters, context, executemany):
+    self.statements += 1
+    self.sql_bytes += len(statement.encode('utf-8'))
+    values = parameters.values() if isinstance(parameters, dict) else parameters or ()
+    self.value_bytes += sum(len(str(value).encode('utf-8')) for value in values if value is not None)
+
+
+def main(argv=None):
+  from benchmarks.datagen import SCALES, database_url
+  parser = argparse.ArgumentParser(description='Measure venue edits.')
+  parser.add_argument('--scale', choices=sorted(SCALES), default='smoke')
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--database', help='SQLAlchemy URL; a SQLite file in the temp dir by default')
+  parser.add_argument('--edits', type=int, default=200)
+  args = parser.parse_args(argv)
+
+  os.environ['DATABASE_URL'] = args.database or database_url('%s-%d' % (args.scale, args.seed))
+  os.environ['CACHE_TYPE'] = 'null'
+
+  from sqlalchemy import event
+  from app import create_app
+  from edits import apply_edit, version_token
+  from extensions import db
+  from models import Venue, Artist, Program, show_counters
+  from venues import EDIT_FIELDS
+  from benchmarks.datagen import generate
+  app = create_app()
+  with app.app_context():
+    db.create_all()
+    if Program.query.first() is None:
+      generate(db, Venue.__table__, Artist.__table__, Program.__table__,
+               scale=args.scale, seed=args.seed)
+      show_counters.refresh(db.session)
+      db.session.commit()
+    venue_ids = [venue_id for venue_id, in db.session.query(Venue.id).order_by(Venue.id).limit(args.edits)]
+
+    def submitted(venue, phone):
+      # the values the edit form posts back: as shown, with a new phone
+      values = [getattr(venue, attribute) for attribute, field in EDIT_FIELDS]
+      return values, [(attribute, phone if attribute == 'phone' else value)
+                      for (attribute, field), value in zip(EDIT_FIELDS, values)]
+
+    forms = {}
+    for venue in Venue.query.filter(Venue.id.in_(venue_ids)):
+      forms[venue.id] = submitted(venue, '555-%03d-0000' % (venue.id % 1000))
+    db.session.remove()
+
+    def edit_before(venue_id):
+      venue = Venue.query.get(venue_id)
+      for attribute, value in forms[venue_id][1]:
+        setattr(venue, attribute, value)
+      db.session.commit()
+
+    tokens = {}
+    def render_forms():
+      # the tokens the edit forms would carry; rendered before the timing
+      for venue_id, version in db.session.query(Venue.id, Venue.version).filter(Venue.id.in_(venue_ids)):
+        tokens[venue_id] = version_token(version, forms[venue_id][0])
+      db.session.remove()
+
+    def edit_after(venue_id):
+      apply_edit(db.session, Venue, venue_id, tokens[venue_id], forms[venue_id][1])
+      db.session.commit()
+
+    print('%-8s %12s %12s %14s %12s' % ('mode', 'statements', 'SQL bytes', 'value bytes', 'median ms'))
+    for name, prepare, edit in (('before', None, edit_before), ('after', render_forms, edit_after)):
+      if prepare is not None:
+        prepare()
+      log = StatementLog()
+      times = []
+      for venue_id in venue_ids:
+        event.listen(db.engine, 'before_cursor_execute', log)
+        started = time.perf_counter()
+        edit(venue_id)
+        times.append(time.perf_counter() - started)
+        event.remove(db.engine, 'before_cursor_execute', log)
+        db.session.remove()
+      count = float(len(venue_ids))
+      print('%-8s %12.1f %12.0f %14.0f %12.2f' % (
+          name, log.statements / count, log.sql_bytes / count, log.value_bytes / count,
+          statistics.median(times) * 1000))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,88 @@
+#----------------------------------------------------------------------------#
+# Render time and bytes on the wire of the listing pages.
+#
+#   python -m benchmarks.listing_pages --scale 1m
+#
+# Seeds (or reuses) the benchmarks.run database and requests /venues,
+# /artists and the first two pages of /shows with the page cache off, once
+# as the app ran before response compression and fragment caching (both
+# switched off) and once as configured. Every page is fetched with each
+# content coding; the table shows the median server time (fragment cache
+# warm) and the body size for each.
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import statistics
+import time
+
+
+def settings(**overrides):
+  # the config module as a class, with overrides
+  import config
+  values = dict((key, getattr(config, key)) for key in dir(config) if key.isupper())
+  values.update(overrides)
+  return type('BenchmarkConfig', (object,), values)
+
+def measure(app, path, encoding, repeat):
+  # (median milliseconds, body bytes) of GET path with Accept-Encoding
+  client = app.test_client()
+  headers = {'Accept-Encoding': encoding}
+  client.get(path, headers=headers).close()
+  times = []
+  for i in range(repeat):
+    started = time.perf_counter()
+    size = len(client.get(path, headers=headers).get_data())
+    times.append(time.perf_counter() - started)
+  return statistics.median(times) * 1000, size
+
+
+def main(argv=None):
+  from benchmarks.datagen import SCALES, database_url
+  parser = argparse.ArgumentParser(description='Measure the listing pages.')
+  parser.add_argument('--scale', choices=sorted(SCALES), default='1m')
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--database', help='SQLAlchemy URL; a SQLite file in the temp dir by default')
+  parser.add_argument('--repeat', type=int, default=10)
+  args = parser.parse_args(argv)
+
+  os.environ['DATABASE_URL'] = args.database or database_url('%s-%d' % (args.scale, args.seed))
+  os.environ['CACHE_TYPE'] = 'null'
+
+  from app import create_app
+  from compress import brotli
+  from extensions import db
+  from models import Venue, Artist, Program, show_counters
+  from shows import shows_payload
+  from benchmarks.datagen import generate
+  paths = ['/venues', '/artists', '/shows']
+  app = create_app()
+  with app.app_context():
+    db.create_all()
+    if Program.query.first() is None:
+      generate(db, Venue.__table__, Artist.__table__, Program.__table__,
+               scale=args.scale, seed=args.seed)
+      show_counters.refresh(db.session)
+      db.session.commit()
+    with app.test_request_context('/shows'):
+      next_cursor = shows_payload()[1]
+    if next_cursor:
+      paths.append('/shows?cursor=' + next_cursor)
+
+  encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+  modes = [
+    ('before', settings(COMPRESS_ENABLED=False, FRAGMENT_CACHE_MAX_ENTRIES=0)),
+    ('after', settings()),
+  ]
+  print('%-18s %-7s' % ('page', 'mode') + ''.join('%22s' % encoding for encoding in encodings))
+  for path in paths:
+    for name, config_object in modes:
+      app = create_app(config_object)
+      with app.app_context():
+        cells = [measure(app, path, encoding, args.repeat) for encoding in encodings]
+      print('%-18s %-7s' % (path[:18], name) +
+            ''.join('%9.2f ms %9d B' % cell for cell in cells))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,112 @@
+#----------------------------------------------------------------------------#
+# "Venues near me": index pruning against a full scan.
+#
+#   python -m benchmarks.nearby --venues 100000
+#
+# Seeds (or reuses, while the schema is unchanged) a SQLite database of
+# --venues venues scattered around the cities of data/gazetteer.csv and
+# runs --queries searches from random points near those cities twice
+# over: through geo.Locations.nearby (the geohash cells prune the
+# candidates) and as a scan computing the distance of every venue.
+# Reports the candidates per search and the latency percentiles of both,
+# for a radius search and a k-nearest search, and checks that both return
+# the same venues.
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import time
+
+
+def percentiles(samples, points=(50, 90, 99)):
+  samples = sorted(samples)
+  return [samples[min(len(samples) - 1, int(len(samples) * point / 100.0))] * 1000 for point in points]
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Measure the nearby venue search.')
+  parser.add_argument('--venues', type=int, default=100000)
+  parser.add_argument('--queries', type=int, default=500)
+  parser.add_argument('--radius', type=float, default=10.0, help='radius of the radius searches, km')
+  parser.add_argument('--k', type=int, default=10)
+  parser.add_argument('--limit', type=int, default=50, help='most results of a radius search')
+  parser.add_argument('--seed', type=int, default=42)
+  args = parser.parse_args(argv)
+
+  from benchmarks.datagen import database_url
+  os.environ['DATABASE_URL'] = database_url('nearby-%d-%d' % (args.venues, args.seed))
+  os.environ['CACHE_TYPE'] = 'null'
+
+  from app import create_app
+  from extensions import db
+  from geo import geohash, haversine_km, nearest, numpy
+  from importer import chunked
+  from models import Venue, venue_locations
+  app = create_app()
+  rng = random.Random(args.seed)
+  centres = sorted(venue_locations.geocoder.places.items())
+
+  with app.app_context():
+    db.create_all()
+    if Venue.query.first() is None:
+      def venues():
+        for i in range(args.venues):
+          (city, state), (lat, lng) = rng.choice(centres)
+          # metro areas some 30 km across
+          lat, lng = lat + rng.gauss(0, 0.15), lng + rng.gauss(0, 0.2)
+          yield {'name': 'Venue %d' % i, 'city': city.title(), 'state': state, 'genres': ['Jazz'],
+                 'latitude': lat, 'longitude': lng, 'geohash': geohash(lat, lng)}
+      for chunk in chunked(venues(), 10000):
+        db.session.execute(Venue.__table__.insert(), chunk)
+      db.session.commit()
+
+    points = []
+    for i in range(args.queries):
+      lat, lng = rng.choice(centres)[1]
+      points.append((lat + rng.gauss(0, 0.1), lng + rng.gauss(0, 0.1)))
+
+    candidates = []
+    counting = venue_locations.candidates
+    def counted(*arguments):
+      rows = counting(*arguments)
+      candidates.append(len(rows))
+      return rows
+    venue_locations.candidates = counted
+
+    def scan(lat, lng, radius_km, k):
+      if radius_km is None:
+        radius_km = venue_locations.max_radius_km
+      rows = db.session.query(Venue.id, Venue.latitude, Venue.longitude) \
+          .filter(Venue.latitude.isnot(None)).order_by(Venue.id).all()
+      candidates.append(len(rows))
+      distances = haversine_km(lat, lng, [row.latitude for row in rows], [row.longitude for row in rows])
+      return [rows[i].id for i in nearest(distances, radius_km, k)]
+
+    def indexed(lat, lng, radius_km, k):
+      return [row.id for row, distance in venue_locations.nearby(lat, lng, radius_km, k)]
+
+    print('%d venues, distances with %s' % (Venue.query.count(), 'NumPy' if numpy is not None else 'pure Python'))
+    print('%-22s %12s %10s %10s %10s' % ('search', 'candidates', 'p50 ms', 'p90 ms', 'p99 ms'))
+    for label, radius_km, k in (('radius %g km' % args.radius, args.radius, args.limit),
+                                ('%d nearest' % args.k, None, args.k)):
+      results = {}
+      for mode, search in (('scan', scan), ('index', indexed)):
+        del candidates[:]
+        times, found = [], []
+        for lat, lng in points:
+          started = time.perf_counter()
+          found.append(search(lat, lng, radius_km, k))
+          times.append(time.perf_counter() - started)
+          db.session.remove()
+        results[mode] = found
+        print('%-22s %12.0f %10.2f %10.2f %10.2f' % (
+            (label + ', ' + mode, sum(candidates) / float(len(points))) + tuple(percentiles(times))))
+      if results['scan'] != results['index']:
+        mismatches = sum(a != b for a, b in zip(results['scan'], results['index']))
+        raise SystemExit('%d of %d searches differ between the scan and the index' % (mismatches, len(points)))
+    print('the index and the scan found the same venues')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,254 @@
+#----------------------------------------------------------------------------#
+# Benchmark runner.
+#
+#   python -m benchmarks.run --scale 1k --output baseline.json
+#   python -m benchmarks.run --scale 1k --compare baseline.json
+#
+# Seeds a SQLite file (or the database in --database, e.g. a local Postgres)
+# with benchmarks.datagen, reusing the file while the schema is unchanged
+# (see datagen.database_url), then drives every route of the app twice:
+# serially through the Flask test client, recording latency percentiles and
+# queries per request, and concurrently over HTTP against a loopback server.
+# Everything runs locally; no network access is needed.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+
+def percentile(samples, p):
+  ordered = sorted(samples)
+  if not ordered:
+    return 0.0
+  index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * len(ordered))) - 1))
+  return ordered[index]
+
+def summarize(samples, queries=None):
+  summary = {
+    'requests': len(samples),
+    'p50_ms': percentile(samples, 50) * 1000,
+    'p95_ms': percentile(samples, 95) * 1000,
+    'p99_ms': percentile(samples, 99) * 1000,
+    'mean_ms': sum(samples) / len(samples) * 1000 if samples else 0.0,
+  }
+  if queries is not None:
+    summary['queries_per_request'] = sum(queries) / float(len(queries)) if queries else 0.0
+  return summary
+
+def peak_rss_kb():
+  usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # bytes on macOS, kilobytes on Linux
+  return usage // 1024 if sys.platform == 'darwin' else usage
+
+def git_revision():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                   stderr=subprocess.DEVNULL).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def routes(dataset):
+  # (name, method, path, form data) for every route of the app. The DELETE
+  # routes are left out so repeated runs keep measuring the same dataset.
+  venue_id, artist_id = dataset['hot_venue_id'], dataset['hot_artist_id']
+  start_time = (datetime.now() + timedelta(days=30)).strftime('%Y-%m-%d %H:%M:%S')
+  venue_form = {'name': 'Bench Venue', 'city': 'Austin', 'state': 'TX', 'address': '1 Main St',
+                'phone': '512-555-0100', 'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/bench'}
+  artist_form = {'name': 'Bench Artist', 'city': 'Austin', 'state': 'TX', 'phone': '512-555-0101',
+                 'genres': 'Jazz', 'facebook_link': 'https://www.facebook.com/bench',
+                 'website_link': 'https://bench.example.com'}
+  return [
+    ('index', 'GET', '/', None),
+    ('venues', 'GET', '/venues', None),
+    ('show_venue_hot', 'GET', '/venues/%d' % venue_id, None),
+    ('show_venue_tail', 'GET', '/venues/%d' % (venue_id + dataset['venues'] - 1), None),
+    ('search_venues', 'POST', '/venues/search', {'search_term': 'hop'}),
+    ('create_venue_form', 'GET', '/venues/create', None),
+    ('edit_venue', 'GET', '/venues/%d/edit' % venue_id, None),
+    ('artists', 'GET', '/artists', None),
+    ('show_artist_hot', 'GET', '/artists/%d' % artist_id, None),
+    ('search_artists', 'POST', '/artists/search', {'search_term': 'band'}),
+    ('create_artist_form', 'GET', '/artists/create', None),
+    ('edit_artist', 'GET', '/artists/%d/edit' % artist_id, None),
+    ('shows', 'GET', '/shows', None),
+    ('create_show_form', 'GET', '/shows/create', None),
+    ('api_venues', 'GET', '/api/v1/venues', None),
+    ('api_show_venue', 'GET', '/api/v1/venues/%d' % venue_id, None),
+    ('api_artists', 'GET', '/api/v1/artists', None),
+    ('api_show_artist', 'GET', '/api/v1/artists/%d' % artist_id, None),
+    ('api_shows', 'GET', '/api/v1/shows', None),
+    ('metrics', 'GET', '/metrics', None),
+    ('create_venue', 'POST', '/venues/create', venue_form),
+    ('edit_venue_submission', 'POST', '/venues/%d/edit' % venue_id,
+     dict(venue_form, name='Bench Venue Edited')),
+    ('create_artist', 'POST', '/artists/create', artist_form),
+    ('edit_artist_submission', 'POST', '/artists/%d/edit' % artist_id,
+     dict(artist_form, name='Bench Artist Edited')),
+    ('create_show', 'POST', '/shows/create',
+     {'artist_id': str(artist_id), 'venue_id': str(venue_id), 'start_time': start_time}),
+  ]
+
+
+def run_serial(app, dataset, iterations):
+  from profiler import profile_queries
+  client = app.test_client()
+  results = {}
+  for name, method, path, data in routes(dataset):
+    samples, queries, errors = [], [], 0
+    for i in range(iterations):
+      with profile_queries() as profile:
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        body = response.get_data()
+        samples.append(time.perf_counter() - started)
+      queries.append(profile.count)
+      if response.status_code >= 400:
+        errors += 1
+    results[name] = dict(summarize(samples, queries), errors=errors, bytes=len(body))
+  return results
+
+def run_http(app, dataset, requests_per_route, concurrency):
+  from werkzeug.serving import make_server
+  logging.getLogger('werkzeug').setLevel(logging.ERROR)
+  server = make_server('127.0.0.1', 0, app, threaded=True)
+  thread = threading.Thread(target=server.serve_forever)
+  thread.daemon = True
+  thread.start()
+  base = 'http://127.0.0.1:%d' % server.server_port
+  results = {}
+  try:
+    for name, method, path, data in routes(dataset):
+      if method != 'GET':
+        continue
+
+      def fetch(i):
+        started = time.perf_counter()
+        try:
+          with urllib.request.urlopen(base + path) as response:
+            response.read()
+          ok = True
+        except urllib.error.URLError:
+          ok = False
+        return time.perf_counter() - started, ok
+
+      started = time.perf_counter()
+      with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(fetch, range(requests_per_route)))
+      elapsed = time.perf_counter() - started
+      samples = [duration for duration, ok in outcomes]
+      results[name] = dict(summarize(samples),
+                           errors=sum(1 for duration, ok in outcomes if not ok),
+                           throughput_rps=len(outcomes) / elapsed)
+  finally:
+    server.shutdown()
+  return results
+
+
+def compare(current, baseline):
+  # per-route p50/p95 change against a previous run
+  lines = []
+  for section in ('serial', 'http'):
+    for name, stats in sorted(current.get(section, {}).items()):
+      old = baseline.get(section, {}).get(name)
+      if not old:
+        continue
+      changes = []
+      for key in ('p50_ms', 'p95_ms', 'queries_per_request'):
+        if key in stats and old.get(key):
+          changes.append('%s %+.1f%%' % (key, (stats[key] - old[key]) / old[key] * 100))
+      lines.append('%-7s %-24s %s' % (section, name, '  '.join(changes)))
+  return '\n'.join(lines)
+
+
+def main(argv=None):
+  from benchmarks.datagen import SCALES, database_url
+  parser = argparse.ArgumentParser(description='Benchmark every route of the Fyyur app.')
+  parser.add_argument('--scale', choices=sorted(SCALES), default='1k')
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--database', help='SQLAlchemy URL; a SQLite file in the temp dir by default')
+  parser.add_argument('--iterations', type=int, default=20, help='serial requests per route')
+  parser.add_argument('--requests', type=int, default=200, help='HTTP requests per route')
+  parser.add_argument('--concurrency', type=int, default=8)
+  parser.add_argument('--cache', action='store_true', help='keep the page cache enabled')
+  parser.add_argument('--output', help='write the results as JSON')
+  parser.add_argument('--compare', help='baseline JSON to diff against')
+  args = parser.parse_args(argv)
+
+  database = args.database or database_url('%s-%d' % (args.scale, args.seed))
+  # configuration is read when config is imported
+  os.environ['DATABASE_URL'] = database
+  os.environ.setdefault('CACHE_TYPE', 'simple' if args.cache else 'null')
+
+  from app import create_app
+  from extensions import db
+  from models import Venue, Artist, Program, show_counters
+  from benchmarks.datagen import generate
+  app = create_app()
+  app.config['WTF_CSRF_ENABLED'] = False
+  # a failing route is reported as errors instead of aborting the run
+  app.config['PROPAGATE_EXCEPTIONS'] = False
+
+  with app.app_context():
+    db.create_all()
+    if Program.query.first() is None:
+      started = time.perf_counter()
+      dataset = generate(db, Venue.__table__, Artist.__table__, Program.__table__,
+                         scale=args.scale, seed=args.seed)
+      # the seed inserts bypass the ORM events
+      show_counters.refresh(db.session)
+      db.session.commit()
+      print('seeded %(venues)d venues, %(artists)d artists, %(shows)d shows' % dataset,
+            'in %.1fs' % (time.perf_counter() - started))
+    else:
+      venues, artists, shows = SCALES[args.scale]
+      dataset = {'hot_venue_id': db.session.query(db.func.min(Venue.id)).scalar(),
+                 'hot_artist_id': db.session.query(db.func.min(Artist.id)).scalar(),
+                 'venues': venues, 'artists': artists, 'shows': shows}
+    db.session.remove()
+
+  results = {
+    'meta': {
+      'scale': args.scale,
+      'seed': args.seed,
+      'database': database.split('@')[-1],
+      'revision': git_revision(),
+      'python': platform.python_version(),
+      'timestamp': datetime.now().isoformat(),
+    },
+    'serial': run_serial(app, dataset, args.iterations),
+    'http': run_http(app, dataset, args.requests, args.concurrency),
+  }
+  results['peak_rss_kb'] = peak_rss_kb()
+
+  for section in ('serial', 'http'):
+    print('\n%s' % section)
+    for name, stats in results[section].items():
+      print('  %-24s p50 %7.2fms  p95 %7.2fms  p99 %7.2fms%s%s' % (
+          name, stats['p50_ms'], stats['p95_ms'], stats['p99_ms'],
+          '  %5.1f q/req' % stats['queries_per_request'] if 'queries_per_request' in stats else '',
+          '  %d errors' % stats['errors'] if stats['errors'] else ''))
+  print('\npeak RSS %d KB' % results['peak_rss_kb'])
+
+  if args.output:
+    with open(args.output, 'w') as f:
+      json.dump(results, f, indent=2, sort_keys=True)
+  if args.compare:
+    with open(args.compare) as f:
+      print('\nchange vs %s\n%s' % (args.compare, compare(results, json.load(f))))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,96 @@
+#----------------------------------------------------------------------------#
+# Schedule index size and query latency.
+#
+#   python -m benchmarks.schedule_index --scale 1m
+#
+# Seeds (or reuses) the benchmarks.run database, builds the in-process
+# schedule index from it and reports the memory it holds per show, both
+# as raw array bytes and as everything allocated by the build (posting
+# list objects, dict entries), then times a few /shows filters against the
+# equivalent SQL query.
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+
+def timed(function, repeat):
+  started = time.perf_counter()
+  for i in range(repeat):
+    result = function()
+  return (time.perf_counter() - started) / repeat * 1000, result
+
+
+def main(argv=None):
+  from benchmarks.datagen import SCALES, database_url
+  parser = argparse.ArgumentParser(description='Measure the schedule index.')
+  parser.add_argument('--scale', choices=sorted(SCALES), default='1m')
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--database', help='SQLAlchemy URL; a SQLite file in the temp dir by default')
+  parser.add_argument('--repeat', type=int, default=20)
+  args = parser.parse_args(argv)
+
+  os.environ['DATABASE_URL'] = args.database or database_url('%s-%d' % (args.scale, args.seed))
+  os.environ['CACHE_TYPE'] = 'null'
+
+  from app import create_app
+  from extensions import db
+  from models import Venue, Artist, Program, schedule_index, show_counters
+  from benchmarks.datagen import generate
+  app = create_app()
+  with app.app_context():
+    db.create_all()
+    if Program.query.first() is None:
+      started = time.perf_counter()
+      generate(db, Venue.__table__, Artist.__table__, Program.__table__,
+               scale=args.scale, seed=args.seed)
+      # the seed inserts bypass the ORM events
+      show_counters.refresh(db.session)
+      db.session.commit()
+      print('seeded in %.1fs' % (time.perf_counter() - started))
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    schedule_index.build()
+    build_seconds = time.perf_counter() - started
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    stats = schedule_index.stats()
+    shows = stats['shows']
+    print('%d shows, %d posting lists, %d postings (%.1f per show), built in %.1fs' % (
+        shows, stats['lists'], stats['postings'], stats['postings'] / float(shows), build_seconds))
+    print('array bytes  %8.1f MB  %6.1f bytes/show' % (stats['array_bytes'] / 1e6, stats['array_bytes'] / float(shows)))
+    print('allocated    %8.1f MB  %6.1f bytes/show' % (allocated / 1e6, allocated / float(shows)))
+
+    now = datetime.now().replace(microsecond=0)
+    city, genre = 'Austin', 'Jazz'
+    venues_in_city = db.session.query(Venue.id).filter(Venue.city == city)
+    artists_in_genre = [artist_id for artist_id, genres in db.session.query(Artist.id, Artist.genres)
+                        if genre in (genres or ())]
+    cases = [
+      ('next week', dict(start=now, end=now + timedelta(days=7)),
+       Program.time_to_start.between(now, now + timedelta(days=7))),
+      ('next month in city', dict(start=now, end=now + timedelta(days=30), city=city),
+       db.and_(Program.time_to_start.between(now, now + timedelta(days=30)),
+               Program.venue_id.in_(venues_in_city))),
+      ('next month in city and genre', dict(start=now, end=now + timedelta(days=30), city=city, genre=genre),
+       db.and_(Program.time_to_start.between(now, now + timedelta(days=30)),
+               Program.venue_id.in_(venues_in_city), Program.artist_id.in_(artists_in_genre))),
+    ]
+    page_size = app.config['SHOWS_PAGE_SIZE']
+    print('\n%-30s %10s %10s %8s' % ('first page of', 'index ms', 'sql ms', 'matches'))
+    for name, filters, criterion in cases:
+      index_ms, ids = timed(lambda: schedule_index.query(limit=page_size + 1, **filters), args.repeat)
+      sql_ms, rows = timed(lambda: db.session.query(Program.id).filter(criterion)
+                           .order_by(Program.time_to_start, Program.id).limit(page_size + 1).all(), args.repeat)
+      matches = len(schedule_index.query(**filters))
+      print('%-30s %10.3f %10.3f %8d%s' % (name, index_ms, sql_ms, matches,
+                                          '' if ids == [row[0] for row in rows] else '  MISMATCH'))
+
+
+if __name__ == '__main__':
+  main()
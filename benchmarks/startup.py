@@ -0,0 +1,101 @@
+#----------------------------------------------------------------------------#
+# Cold start cost of the app factory.
+#
+#   python -m benchmarks.startup --runs 10
+#
+# Every run is a fresh interpreter, so nothing is cached in-process. It
+# reports the median time to import app.py and call create_app(), the
+# median latency of the first request after that (GET /venues through the
+# test client, which pays for the template compile and the first
+# connection), the packages that dominate `python -X importtime`, and
+# whether any of the lazily imported libraries (babel, dateutil, WTForms)
+# were loaded before the first request.
+#----------------------------------------------------------------------------#
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY = ('babel', 'dateutil', 'wtforms', 'flask_wtf')
+
+COLD_START = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+created = time.perf_counter() - started
+loaded = sorted(set(name.split('.')[0] for name in sys.modules) & set(%(lazy)r))
+client = app.test_client()
+started = time.perf_counter()
+status = client.get('/venues').status_code
+first = time.perf_counter() - started
+print(json.dumps({'create': created, 'first': first, 'status': status, 'loaded': loaded}))
+'''
+
+IMPORTTIME = re.compile(r'^import time:\s+(\d+) \|\s+\d+ \| *(\S+)')
+
+
+def cold_start(env):
+  output = subprocess.run([sys.executable, '-c', COLD_START % {'lazy': LAZY}], cwd=ROOT, env=env,
+                          check=True, capture_output=True, text=True).stdout
+  return json.loads(output.strip().splitlines()[-1])
+
+def import_times(env):
+  # [(microseconds, package)]: import self time summed per top-level package
+  stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                           'from app import create_app; create_app()'],
+                          cwd=ROOT, env=env, check=True, capture_output=True, text=True).stderr
+  times = {}
+  for line in stderr.splitlines():
+    match = IMPORTTIME.match(line)
+    if match:
+      package = match.group(2).split('.')[0]
+      times[package] = times.get(package, 0) + int(match.group(1))
+  return sorted(((microseconds, package) for package, microseconds in times.items()), reverse=True)
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Measure app factory startup.')
+  parser.add_argument('--runs', type=int, default=10)
+  parser.add_argument('--top', type=int, default=15, help='packages to list')
+  parser.add_argument('--database', help='SQLAlchemy URL; a SQLite file in the temp dir by default')
+  args = parser.parse_args(argv)
+
+  env = dict(os.environ)
+  env['DATABASE_URL'] = args.database or 'sqlite:///' + os.path.join(
+      tempfile.gettempdir(), 'fyyur-bench-startup.db')
+  env['CACHE_TYPE'] = 'null'
+  # create the schema once so the first request has something to read
+  subprocess.run([sys.executable, '-c', 'from app import create_app\n'
+                  'from extensions import db\n'
+                  'with create_app().app_context(): db.create_all()'],
+                 cwd=ROOT, env=env, check=True)
+
+  runs = [cold_start(env) for i in range(args.runs)]
+  print('create_app()    median %7.1f ms  (min %.1f, max %.1f)' % tuple(
+      seconds * 1000 for seconds in (statistics.median(run['create'] for run in runs),
+                                     min(run['create'] for run in runs),
+                                     max(run['create'] for run in runs))))
+  print('first request   median %7.1f ms  (min %.1f, max %.1f)' % tuple(
+      seconds * 1000 for seconds in (statistics.median(run['first'] for run in runs),
+                                     min(run['first'] for run in runs),
+                                     max(run['first'] for run in runs))))
+  loaded = sorted(set(name for run in runs for name in run['loaded']))
+  print('lazy libraries loaded by create_app(): %s' % (', '.join(loaded) or 'none'))
+  if any(run['status'] != 200 for run in runs):
+    print('first request failed: %s' % sorted(set(run['status'] for run in runs)))
+
+  print('\n%-32s %10s' % ('package', 'import'))
+  for microseconds, module in import_times(env)[:args.top]:
+    print('%-32s %8.1f ms' % (module, microseconds / 1000.0))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,121 @@
+#----------------------------------------------------------------------------#
+# Typeahead prefix index: build cost, memory and keystroke latency.
+#
+#   python -m benchmarks.typeahead --names 1000000
+#
+# Builds a typeahead.PrefixIndex over --names synthetic names (the
+# benchmarks.datagen naming scheme, Zipf-skewed upcoming show counts) and
+# replays keystrokes: the first 1 to 12 characters of random names. Reports
+# the latency percentiles of index lookups and of GET /api/v1/typeahead
+# through the test client, plus the cost of an insert, rename and delete,
+# and of deleting the top name of a short prefix followed by lookups of
+# short prefixes. Exits non-zero when a lookup p99 misses --target
+# milliseconds.
+#----------------------------------------------------------------------------#
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+  samples = sorted(samples)
+  return [samples[min(len(samples) - 1, int(len(samples) * point / 100.0))] * 1000 for point in points]
+
+def timed(function, arguments):
+  times = []
+  for argument in arguments:
+    started = time.perf_counter()
+    function(argument)
+    times.append(time.perf_counter() - started)
+  return times
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description='Measure the typeahead prefix index.')
+  parser.add_argument('--names', type=int, default=1000000)
+  parser.add_argument('--queries', type=int, default=100000)
+  parser.add_argument('--seed', type=int, default=42)
+  parser.add_argument('--target', type=float, default=2.0, help='p99 lookup budget in milliseconds')
+  args = parser.parse_args(argv)
+
+  os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.gettempdir(), 'fyyur-bench-typeahead.db'))
+  os.environ['CACHE_TYPE'] = 'null'
+  os.environ['COMPRESS_ENABLED'] = '0'
+
+  from app import create_app
+  from models import artist_typeahead
+  from typeahead import PrefixIndex
+  from benchmarks.datagen import entity_name
+  rng = random.Random(args.seed)
+  names = [entity_name(rng, 'Artist', i) for i in range(args.names)]
+  rows = [(i + 1, name, int(rng.paretovariate(1.2)) - 1) for i, name in enumerate(names)]
+
+  # memory of a traced build (on top of the names it shares), time of an
+  # untraced one
+  tracemalloc.start()
+  traced = PrefixIndex(rows)
+  allocated = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  del traced
+  started = time.perf_counter()
+  index = PrefixIndex(rows)
+  build_seconds = time.perf_counter() - started
+  del rows
+  print('%d names, %d precomputed prefixes, built in %.1fs, %.1f MB (%.0f bytes/name)' % (
+      len(index), len(index._tops), build_seconds, allocated / 1e6, allocated / float(len(index))))
+
+  keystrokes = []
+  for i in range(args.queries):
+    name = rng.choice(names)
+    keystrokes.append(name[:rng.randint(1, 12)])
+
+  lookups = timed(lambda prefix: index.complete(prefix, 10), keystrokes)
+  p50, p90, p99, p999 = percentiles(lookups)
+  print('lookup     p50 %.3f ms  p90 %.3f ms  p99 %.3f ms  p99.9 %.3f ms  max %.3f ms' % (
+      p50, p90, p99, p999, max(lookups) * 1000))
+
+  app = create_app()
+  # the index is not built from the database, so nothing to compare it with
+  artist_typeahead._index = index
+  artist_typeahead.check_interval = float('inf')
+  client = app.test_client()
+  requests = timed(lambda prefix: client.get('/api/v1/typeahead', query_string={'kind': 'artist', 'q': prefix}),
+                   keystrokes[:min(len(keystrokes), 20000)])
+  print('endpoint   p50 %.3f ms  p90 %.3f ms  p99 %.3f ms  p99.9 %.3f ms' % tuple(percentiles(requests)))
+
+  ids = list(range(args.names + 1, args.names + 1001))
+  inserts = timed(lambda entity_id: index.add(entity_id, entity_name(rng, 'Artist', entity_id), 1), ids)
+  renames = timed(lambda entity_id: index.rename(entity_id, entity_name(rng, 'Artist', entity_id)), ids)
+  deletes = timed(index.remove, ids)
+  for label, samples in (('insert', inserts), ('rename', renames), ('delete', deletes)):
+    print('%-10s p50 %.3f ms  p99 %.3f ms' % ((label,) + tuple(percentiles(samples, (50, 99)))))
+
+  # deleting the best name of a one or two letter prefix reranks the top
+  # lists holding it; the keystrokes after it must stay within the target
+  short = sorted(set(keystroke[:rng.randint(1, 2)] for keystroke in keystrokes))
+  top_deletes, short_lookups = [], []
+  for i in range(1000):
+    prefix = rng.choice(short)
+    top = index.complete(prefix, 1)
+    if not top:
+      continue
+    top_deletes.extend(timed(index.remove, [top[0][0]]))
+    short_lookups.extend(timed(lambda prefix: index.complete(prefix, 10), [prefix, prefix[:1]]))
+  print('top delete p50 %.3f ms  p99 %.3f ms' % tuple(percentiles(top_deletes, (50, 99))))
+  short_p99 = percentiles(short_lookups, (99,))[0]
+  print('lookup after a top delete p50 %.3f ms  p99 %.3f ms' % (percentiles(short_lookups, (50,))[0], short_p99))
+
+  for label, value in (('lookup', p99), ('lookup after a top delete', short_p99)):
+    if value > args.target:
+      print('%s p99 %.3f ms is over the %.1f ms target' % (label, value, args.target))
+      sys.exit(1)
+  print('lookup p99 within the %.1f ms target' % args.target)
+
+
+if __name__ == '__main__':
+  main()
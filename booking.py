@@ -0,0 +1,72 @@
+#----------------------------------------------------------------------------#
+# Double-booking checks.
+#
+# Every show occupies its venue and its artist for the same configured
+# duration, so two shows of one venue (or artist) overlap exactly when
+# their start times are less than one duration apart. A new booking is
+# therefore checked with one range probe per owner on the
+# (venue_id, time_to_start) and (artist_id, time_to_start) indexes, which
+# stays O(log n) however many shows the owner has. On Postgres an
+# exclusion constraint over tsrange slots backs this up against
+# concurrent inserts.
+#
+# Bulk imports validate against Bookings instead: the existing schedule
+# is loaded in one query into sorted arrays per owner (64-bit seconds, so
+# any start time fits), and each imported row is a bisect, then joins the
+# arrays so later rows see it too.
+#----------------------------------------------------------------------------#
+
+from array import array
+from bisect import bisect_right
+
+from schedule import to_seconds
+
+
+def find_conflict(session, program, venue_id, artist_id, start, duration):
+  # ('venue' or 'artist', the clashing show) for a new booking, or None
+  for kind, column, owner_id in (('venue', program.venue_id, venue_id),
+                                 ('artist', program.artist_id, artist_id)):
+    clash = session.query(program) \
+        .filter(column == owner_id,
+                program.time_to_start > start - duration,
+                program.time_to_start < start + duration) \
+        .order_by(program.time_to_start) \
+        .first()
+    if clash is not None:
+      return kind, clash
+  return None
+
+
+class Bookings(object):
+
+  def __init__(self, rows, duration):
+    # rows: (venue_id, artist_id, time_to_start) of the booked shows
+    self.duration = int(duration.total_seconds())
+    starts = {}
+    for venue_id, artist_id, start in rows:
+      start = to_seconds(start)
+      starts.setdefault(('venue', venue_id), []).append(start)
+      starts.setdefault(('artist', artist_id), []).append(start)
+    self.starts = dict((key, array('q', sorted(values))) for key, values in starts.items())
+
+  def _clashes(self, key, start):
+    # any booked start within (start - duration, start + duration)
+    starts = self.starts.get(key)
+    if not starts:
+      return False
+    position = bisect_right(starts, start - self.duration)
+    return position < len(starts) and starts[position] < start + self.duration
+
+  def conflict(self, venue_id, artist_id, start):
+    # 'venue' or 'artist' when the slot is taken, else None
+    start = to_seconds(start)
+    for kind, owner_id in (('venue', venue_id), ('artist', artist_id)):
+      if self._clashes((kind, owner_id), start):
+        return kind
+    return None
+
+  def add(self, venue_id, artist_id, start):
+    start = to_seconds(start)
+    for key in (('venue', venue_id), ('artist', artist_id)):
+      starts = self.starts.setdefault(key, array('q'))
+      starts.insert(bisect_right(starts, start), start)
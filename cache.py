@@ -0,0 +1,203 @@
+#----------------------------------------------------------------------------#
+# Read-through cache for rendered pages.
+#
+# Backends share a tiny get/set/delete interface: LRUCache keeps entries in
+# process with a TTL each, RedisCache talks to anything speaking the Redis
+# protocol (a fake client with get/setex/delete works the same way).
+# PageCache.cached() wraps a view; the view may set g.cache_expires_at to the
+# moment its content goes stale (e.g. the next show starting), and the
+# entry's TTL is cut short accordingly.
+#
+# Below whole pages, templates cache repeated markup with
+#
+#   {% cache 'venue-item', venue.id, venue.updated_at %}...{% endcache %}
+#
+# The key names the entity and its version, so an edited row simply renders
+# under a new key and nothing needs invalidating; stale versions age out of
+# the in-process LRU. Fragments are shared by every page that renders them.
+#----------------------------------------------------------------------------#
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import g, request, session
+from jinja2 import nodes
+from jinja2.ext import Extension
+
+
+class NullCache(object):
+
+  def get(self, key):
+    return None
+
+  def set(self, key, value, ttl):
+    pass
+
+  def delete(self, *keys):
+    pass
+
+
+class LRUCache(object):
+
+  def __init__(self, max_entries=1024):
+    self.max_entries = max_entries
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def get(self, key):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      value, expires_at = entry
+      if expires_at <= time.time():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return value
+
+  def set(self, key, value, ttl):
+    with self._lock:
+      self._entries[key] = (value, time.time() + ttl)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def delete(self, *keys):
+    with self._lock:
+      for key in keys:
+        self._entries.pop(key, None)
+
+
+class RedisCache(object):
+
+  def __init__(self, client, prefix='fyyur:page:'):
+    self.client = client
+    self.prefix = prefix
+
+  @classmethod
+  def from_url(cls, url, **kwargs):
+    import redis
+    return cls(redis.Redis.from_url(url), **kwargs)
+
+  def get(self, key):
+    value = self.client.get(self.prefix + key)
+    if value is None:
+      return None
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+  def set(self, key, value, ttl):
+    self.client.setex(self.prefix + key, max(1, int(math.ceil(ttl))), value.encode('utf-8'))
+
+  def delete(self, *keys):
+    if keys:
+      self.client.delete(*[self.prefix + key for key in keys])
+
+
+class PageCache(object):
+
+  def __init__(self, app=None, backend=None):
+    self.backend = backend
+    self.default_ttl = 300
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    self.default_ttl = app.config.get('CACHE_DEFAULT_TTL', 300)
+    if self.backend is not None:
+      return
+    cache_type = app.config.get('CACHE_TYPE', 'simple')
+    if cache_type == 'redis':
+      self.backend = RedisCache.from_url(app.config['CACHE_REDIS_URL'])
+    elif cache_type == 'simple':
+      self.backend = LRUCache(app.config.get('CACHE_MAX_ENTRIES', 1024))
+    else:
+      self.backend = NullCache()
+
+  def cached(self, key):
+    # key is formatted with the view arguments, e.g. 'venue:{venue_id}'
+    def decorator(view):
+      @wraps(view)
+      def wrapper(**kwargs):
+        # paged variants and pages carrying flashed messages are not shared
+        if request.args or '_flashes' in session:
+          return view(**kwargs)
+        cache_key = key.format(**kwargs)
+        html = self.backend.get(cache_key)
+        if html is not None:
+          return html
+
+        g.cache_expires_at = None
+        html = view(**kwargs)
+        ttl = self.default_ttl
+        expires_at = g.pop('cache_expires_at', None)
+        if expires_at is not None:
+          ttl = min(ttl, (expires_at - datetime.now()).total_seconds())
+        if isinstance(html, str) and ttl > 0:
+          self.backend.set(cache_key, html, ttl)
+        return html
+      return wrapper
+    return decorator
+
+  def invalidate(self, *keys):
+    self.backend.delete(*keys)
+
+
+class FragmentCacheExtension(Extension):
+  # the {% cache key, ... %} ... {% endcache %} tag. It compiles to inline
+  # nodes: look the key up and, on a miss, capture the body with a set
+  # block and store it. Lookups go through filters, which templates call
+  # directly; a call block or extension method call costs more per use
+  # than rendering a small tile.
+
+  tags = set(['cache'])
+
+  def __init__(self, environment):
+    super(FragmentCacheExtension, self).__init__(environment)
+    environment.extend(fragment_cache=NullCache(), fragment_cache_ttl=3600)
+    environment.filters['fragment_get'] = lambda key: environment.fragment_cache.get(key)
+    environment.filters['fragment_set'] = lambda html, key: environment.fragment_cache.set(
+        key, html, environment.fragment_cache_ttl)
+    self._names = 0
+
+  def parse(self, parser):
+    lineno = next(parser.stream).lineno
+    parts = [parser.parse_expression()]
+    while parser.stream.skip_if('comma'):
+      parts.append(parser.parse_expression())
+    body = parser.parse_statements(['name:endcache'], drop_needle=True)
+    # per-tag names, so nested tags keep their own key and markup
+    self._names += 1
+    key, html = '_fragment_key_%d' % self._names, '_fragment_html_%d' % self._names
+    load = lambda name: nodes.Name(name, 'load')
+    return [
+      nodes.Assign(nodes.Name(key, 'store'), nodes.Tuple(parts, 'load')),
+      nodes.Assign(nodes.Name(html, 'store'),
+                   nodes.Filter(load(key), 'fragment_get', [], [], None, None)),
+      nodes.If(nodes.Test(load(html), 'none', [], [], None, None), [
+        nodes.AssignBlock(nodes.Name(html, 'store'), None, body),
+        nodes.ExprStmt(nodes.Filter(load(html), 'fragment_set', [load(key)], [], None, None)),
+      ], [], []),
+      nodes.Output([load(html)]),
+    ]
+
+
+class FragmentCache(object):
+
+  def __init__(self, app=None):
+    self.backend = NullCache()
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    # fragments stay in process even when pages go to Redis: a lookup per
+    # tile has to be cheaper than rendering it
+    max_entries = app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 20000)
+    if max_entries:
+      self.backend = LRUCache(max_entries)
+    app.jinja_env.add_extension(FragmentCacheExtension)
+    app.jinja_env.fragment_cache = self.backend
+    app.jinja_env.fragment_cache_ttl = app.config.get('FRAGMENT_CACHE_TTL', 3600)
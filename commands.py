@@ -0,0 +1,249 @@
+#----------------------------------------------------------------------------#
+# CLI commands, registered on the app by create_app().
+#
+# Each command imports what it needs when it runs (the importer pulls in
+# the WTForms classes), so `flask --help` or `flask db upgrade` do not.
+#----------------------------------------------------------------------------#
+
+import sys
+import json
+import time
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from extensions import db, page_cache
+from models import Venue, Artist, Program, show_counters, schedule_index, deletions, \
+    venue_typeahead, artist_typeahead, venue_search, artist_search, \
+    venue_genres, artist_genres, venue_locations, show_archive
+from booking import Bookings
+from helpers import show_duration
+
+@click.command('import')
+@click.argument('kind', type=click.Choice(['venues', 'artists', 'shows']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']),
+              help='Input format; guessed from the file extension by default.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Rows per INSERT batch.')
+@click.option('--rejects', type=click.File('w'), help='Write rejected rows to this NDJSON file.')
+@with_appcontext
+def import_command(kind, path, fmt, chunk_size, rejects):
+  """Bulk-import venues, artists or shows from a CSV or NDJSON file."""
+  import importer
+  if fmt is None:
+    fmt = 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+  if kind == 'venues':
+    table, validate = Venue.__table__, importer.validate_venue
+    def after_chunk(values):
+      venue_search.invalidate()
+      venue_genres.invalidate()
+      venue_typeahead.invalidate()
+      page_cache.invalidate('venues')
+  elif kind == 'artists':
+    table, validate = Artist.__table__, importer.validate_artist
+    def after_chunk(values):
+      artist_search.invalidate()
+      artist_genres.invalidate()
+      artist_typeahead.invalidate()
+      page_cache.invalidate('artists')
+  else:
+    # name -> id maps for resolving artist/venue references, loaded once
+    table = Program.__table__
+    validate = importer.show_validator(
+        importer.NameMap(db.session.query(Artist.id, Artist.name)),
+        importer.NameMap(db.session.query(Venue.id, Venue.name)),
+        Bookings(db.session.query(Program.venue_id, Program.artist_id, Program.time_to_start),
+                 show_duration()))
+
+    def after_chunk(values):
+      # the bulk insert bypasses the ORM events, so recount the owners here
+      venue_ids = set(value['venue_id'] for value in values)
+      artist_ids = set(value['artist_id'] for value in values)
+      show_counters.refresh(db.session, {Venue.__table__: venue_ids, Artist.__table__: artist_ids})
+      db.session.commit()
+      schedule_index.invalidate()
+      venue_typeahead.invalidate()
+      artist_typeahead.invalidate()
+      page_cache.invalidate('venues', *['venue:%d' % venue_id for venue_id in venue_ids] +
+                                       ['artist:%d' % artist_id for artist_id in artist_ids])
+
+  def on_reject(line_no, row, error):
+    click.echo('line %d: %s' % (line_no, error), err=True)
+    if rejects is not None:
+      rejects.write(json.dumps({"line": line_no, "error": error, "row": row}) + '\n')
+
+  # the WTForms classes need a request context to validate
+  with current_app.test_request_context(), open(path, newline='') as stream:
+    accepted, rejected, seconds = importer.import_rows(
+        db, table, importer.read_rows(stream, fmt), validate,
+        chunk_size=chunk_size, on_reject=on_reject, after_chunk=after_chunk)
+
+  click.echo('imported %d %s in %.2fs (%.0f rows/s), %d rejected' % (
+      accepted, kind, seconds, (accepted + rejected) / seconds if seconds else 0, rejected))
+
+@click.command('conflicts')
+@with_appcontext
+def conflicts_command():
+  """List shows that double-book a venue or an artist."""
+  bookings = Bookings((), show_duration())
+  found = 0
+  rows = db.session.query(Program.id, Program.venue_id, Program.artist_id, Program.time_to_start) \
+      .order_by(Program.time_to_start, Program.id) \
+      .yield_per(10000)
+  for program_id, venue_id, artist_id, start in rows:
+    kind = bookings.conflict(venue_id, artist_id, start)
+    if kind is not None:
+      found += 1
+      click.echo('show %d (venue %d, artist %d, %s) overlaps an earlier show of its %s' % (
+          program_id, venue_id, artist_id, start, kind))
+    bookings.add(venue_id, artist_id, start)
+  click.echo('%d conflicting shows' % found)
+  if found:
+    sys.exit(1)
+
+@click.group('counters', cls=AppGroup)
+def counters_command():
+  """Maintain the materialized show counters on venues and artists."""
+
+@counters_command.command('rollover')
+@click.option('--every', type=float, help='Keep running, rolling over every this many seconds.')
+def counters_rollover(every):
+  """Move started shows from the upcoming to the past counters."""
+  while True:
+    due = show_counters.rollover(db.session)
+    db.session.commit()
+    venue_ids, artist_ids = due[Venue.__table__], due[Artist.__table__]
+    if venue_ids or artist_ids:
+      page_cache.invalidate('venues', *['venue:%d' % venue_id for venue_id in venue_ids] +
+                                       ['artist:%d' % artist_id for artist_id in artist_ids])
+    click.echo('rolled over %d venues, %d artists' % (len(venue_ids), len(artist_ids)))
+    if every is None:
+      return
+    db.session.remove()
+    time.sleep(every)
+
+@counters_command.command('check')
+@click.option('--fix', is_flag=True, help='Recount the rows that drifted.')
+def counters_check(fix):
+  """Report venues and artists whose stored counters are wrong."""
+  drifted = show_counters.drift(db.session)
+  for table, entity_id, stored, actual in drifted:
+    click.echo('%s %d: stored upcoming=%s past=%s next=%s, actual upcoming=%s past=%s next=%s' % (
+        (table, entity_id) + stored + actual))
+  click.echo('%d rows drifted' % len(drifted))
+  if drifted and fix:
+    ids = {}
+    for table, entity_id, stored, actual in drifted:
+      ids.setdefault(db.metadata.tables[table], set()).add(entity_id)
+    show_counters.refresh(db.session, ids)
+    db.session.commit()
+    page_cache.invalidate('venues', *['%s:%d' % (table.name.lower(), entity_id)
+                                      for table in ids for entity_id in ids[table]])
+    click.echo('recounted')
+  elif drifted:
+    sys.exit(1)
+
+@click.command('sweep')
+@click.option('--every', type=float, help='Keep running, sweeping every this many seconds.')
+@with_appcontext
+def sweep_command(every):
+  """Purge soft-deleted venues and artists with their shows."""
+  while True:
+    purged, affected = deletions.sweep(db.session)
+    venue_ids, artist_ids = affected.get(Venue.__table__, ()), affected.get(Artist.__table__, ())
+    if venue_ids or artist_ids:
+      page_cache.invalidate('venues', 'artists', *['venue:%d' % venue_id for venue_id in venue_ids] +
+                                                  ['artist:%d' % artist_id for artist_id in artist_ids])
+    click.echo('purged %d venues, %d artists' % (len(purged[Venue.__table__]), len(purged[Artist.__table__])))
+    if every is None:
+      return
+    db.session.remove()
+    time.sleep(every)
+
+@click.command('geocode')
+@click.option('--all', 'everything', is_flag=True, help='Geocode every venue, not just unplaced ones.')
+@click.option('--chunk-size', default=1000, show_default=True, help='Venues per UPDATE batch.')
+@with_appcontext
+def geocode_command(everything, chunk_size):
+  """Fill in venue coordinates from the configured geocoder."""
+  from sqlalchemy import bindparam
+  table = Venue.__table__
+  query = db.session.query(Venue.id, Venue.address, Venue.city, Venue.state).order_by(Venue.id)
+  if not everything:
+    query = query.filter(Venue.latitude.is_(None))
+  rows = query.all()
+  update = table.update().where(table.c.id == bindparam('venue_id')) \
+      .values(latitude=bindparam('latitude'), longitude=bindparam('longitude'), geohash=bindparam('geohash'))
+  placed = 0
+  for start in range(0, len(rows), chunk_size):
+    values = []
+    for venue_id, address, city, state in rows[start:start + chunk_size]:
+      location = venue_locations.place(address, city, state)
+      placed += location['latitude'] is not None
+      values.append(dict(location, venue_id=venue_id))
+    db.session.execute(update, values)
+    db.session.commit()
+  click.echo('placed %d of %d venues' % (placed, len(rows)))
+
+@click.command('archive')
+@click.option('--older-than', type=int, help='Archive the months before this many months ago '
+              '[default: ARCHIVE_AFTER_MONTHS].')
+@with_appcontext
+def archive_command(older_than):
+  """Move the shows of old months into the archive files."""
+  from datetime import datetime
+  import partitions
+  if older_than is None:
+    older_than = current_app.config['ARCHIVE_AFTER_MONTHS']
+  cutoff = partitions.add_months(partitions.month_start(datetime.now()), -older_than)
+  oldest = db.session.query(db.func.min(Program.time_to_start)).filter(Program.time_to_start < cutoff).scalar()
+  month = partitions.month_start(oldest) if oldest is not None else cutoff
+  archived = 0
+  while month < cutoff:
+    shows, affected = show_archive.archive_month(db.session, month, show_counters)
+    db.session.commit()
+    if shows:
+      click.echo('archived %s: %d shows of %d venues and %d artists' % (
+          month.strftime('%Y-%m'), shows, len(affected[Venue.__table__]), len(affected[Artist.__table__])))
+      archived += 1
+    month = partitions.add_months(month, 1)
+  schedule_index.invalidate()
+  click.echo('%d months archived into %s' % (archived, show_archive.directory))
+
+@click.group('partitions', cls=AppGroup)
+def partitions_command():
+  """Maintain the monthly partitions of the shows table (Postgres)."""
+
+@partitions_command.command('ensure')
+@click.option('--ahead', type=int, help='Months ahead to create [default: PROGRAM_PARTITIONS_AHEAD].')
+def partitions_ensure(ahead):
+  """Create the partitions of this month and the coming ones."""
+  from datetime import datetime
+  import partitions
+  connection = db.session.connection()
+  if not partitions.is_partitioned(connection):
+    click.echo('Program is not partitioned on this database')
+    return
+  if ahead is None:
+    ahead = current_app.config['PROGRAM_PARTITIONS_AHEAD']
+  created = partitions.ensure(connection, datetime.now(), ahead, current_app.config['SHOW_DURATION_MINUTES'])
+  db.session.commit()
+  for name, moved in created:
+    click.echo('created %s (%d shows moved from the default partition)' % (name, moved))
+  click.echo('%d partitions created' % len(created))
+
+@click.group('assets', cls=AppGroup)
+def assets_command():
+  """Build the static bundles and the template bytecode cache."""
+
+@assets_command.command('build')
+def assets_build():
+  """Write the hashed, precompressed bundles and precompile the templates."""
+  from assets import build_bundles, compile_templates
+  sizes = build_bundles(current_app.static_folder)
+  for name, (hashed, size, compressed) in sorted(sizes.items()):
+    click.echo('%-16s -> %-28s %8d bytes, %7d gzipped' % (name, hashed, size, compressed))
+  if current_app.config.get('JINJA_CACHE_DIR'):
+    click.echo('compiled %d templates into %s' % (
+        len(compile_templates(current_app)), current_app.config['JINJA_CACHE_DIR']))
@@ -0,0 +1,118 @@
+#----------------------------------------------------------------------------#
+# Negotiated response compression.
+#
+# Text responses (HTML, JSON, CSS, JS) at or above COMPRESS_MIN_SIZE bytes
+# go out as brotli when the client accepts it and the brotli package is
+# installed, else gzip. Streamed pages are compressed as they stream: the
+# compressor is flushed every STREAM_FLUSH_BYTES of input, so the head of
+# the page still leaves before the rest is rendered. Responses that already
+# carry a Content-Encoding (the precompressed static bundles) and file
+# responses are left alone.
+#
+# A compressed body is a different representation, so its strong ETag is
+# weakened; If-None-Match compares weakly, so revalidation still works.
+#----------------------------------------------------------------------------#
+
+import zlib
+from flask import request
+
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+STREAM_FLUSH_BYTES = 4096
+
+COMPRESSIBLE = set(['text/html', 'text/plain', 'text/css', 'text/javascript',
+                    'application/javascript', 'application/json'])
+
+
+class GzipCompressor(object):
+
+  def __init__(self, level):
+    # wbits 31: zlib stream with a gzip header and trailer
+    self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+  def process(self, data):
+    return self.compressor.compress(data)
+
+  def flush(self):
+    return self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+  def finish(self):
+    return self.compressor.flush(zlib.Z_FINISH)
+
+
+class Compress(object):
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    if not app.config.get('COMPRESS_ENABLED', True):
+      return
+    self.min_size = app.config.get('COMPRESS_MIN_SIZE', 500)
+    self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+    self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+    app.after_request(self._compress)
+
+  def _encoding(self):
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+      return 'br'
+    if accepted['gzip']:
+      return 'gzip'
+    return None
+
+  def _compressor(self, encoding):
+    if encoding == 'br':
+      return brotli.Compressor(quality=self.brotli_quality)
+    return GzipCompressor(self.gzip_level)
+
+  def _stream(self, chunks, compressor):
+    pending = 0
+    for chunk in chunks:
+      if isinstance(chunk, str):
+        chunk = chunk.encode('utf-8')
+      data = compressor.process(chunk)
+      pending += len(chunk)
+      if pending >= STREAM_FLUSH_BYTES:
+        data += compressor.flush()
+        pending = 0
+      if data:
+        yield data
+    yield compressor.finish()
+
+  def _compress(self, response):
+    if (response.mimetype not in COMPRESSIBLE or response.direct_passthrough
+        or 'Content-Encoding' in response.headers):
+      return response
+    response.vary.add('Accept-Encoding')
+    encoding = self._encoding()
+    if encoding is None or request.method == 'HEAD':
+      return response
+    if response.status_code == 304:
+      # keeps the validator matching the compressed copy the client holds
+      self._weaken_etag(response)
+      return response
+    if response.status_code < 200 or response.status_code in (204, 206):
+      return response
+
+    compressor = self._compressor(encoding)
+    if response.is_streamed:
+      response.response = self._stream(response.response, compressor)
+      response.headers.pop('Content-Length', None)
+    else:
+      data = response.get_data()
+      if len(data) < self.min_size:
+        return response
+      response.set_data(compressor.process(data) + compressor.finish())
+    response.headers['Content-Encoding'] = encoding
+    self._weaken_etag(response)
+    return response
+
+  def _weaken_etag(self, response):
+    etag, weak = response.get_etag()
+    if etag is not None and not weak:
+      response.set_etag(etag, weak=True)
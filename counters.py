@@ -0,0 +1,124 @@
+#----------------------------------------------------------------------------#
+# Materialized show counters.
+#
+# Venue and Artist rows carry upcoming_shows_count, past_shows_count and
+# next_show_at. Creating or deleting a Program adjusts them in the same
+# flush (so the same transaction) through mapper events; bulk loads that
+# bypass the ORM call refresh() for the rows they touched. Shows only move
+# from upcoming to past with the clock, which rollover() catches up on:
+# every row whose next_show_at has passed is recounted in one statement.
+# drift() compares the stored values with a fresh count for the checker.
+# Shows of a soft-deleted venue or artist (deletion.py) are hidden, so
+# they are not counted on the other side either.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from sqlalchemy import and_, case, event, exists, func, inspect, not_, or_, select
+
+COUNTER_COLUMNS = ('upcoming_shows_count', 'past_shows_count', 'next_show_at')
+
+
+class ShowCounters(object):
+
+  def __init__(self, program, owners):
+    # owners: (model, foreign key attribute on program) pairs whose rows
+    # carry the counters, e.g. [(Venue, 'venue_id'), (Artist, 'artist_id')]
+    self.program = program.__table__
+    self.owners = [(model.__table__, key) for model, key in owners]
+    event.listen(program, 'after_insert', self._inserted)
+    event.listen(program, 'after_delete', self._deleted)
+    event.listen(program, 'after_update', self._updated)
+
+  def _actual(self, table, key, now):
+    # correlated subqueries recounting one owner row from Program
+    program = self.program
+    owned = and_(program.c[key] == table.c.id, *[
+        ~exists().where(other.c.id == program.c[other_key], other.c.deleted_at.isnot(None))
+        for other, other_key in self.owners if other is not table and 'deleted_at' in other.c])
+    upcoming = program.c.time_to_start > now
+    return {
+      'upcoming_shows_count': select(func.count()).where(owned, upcoming).scalar_subquery(),
+      'past_shows_count': select(func.count()).where(owned, not_(upcoming)).scalar_subquery(),
+      'next_show_at': select(func.min(program.c.time_to_start)).where(owned, upcoming).scalar_subquery(),
+    }
+
+  def _shift(self, connection, target, delta):
+    now = datetime.now()
+    start = target.time_to_start
+    for table, key in self.owners:
+      if start > now:
+        values = {'upcoming_shows_count': table.c.upcoming_shows_count + delta}
+        if delta > 0:
+          values['next_show_at'] = case(
+              (or_(table.c.next_show_at.is_(None), table.c.next_show_at > start), start),
+              else_=table.c.next_show_at)
+        else:
+          # the row is already gone, so the recount finds the next one
+          values['next_show_at'] = case(
+              (table.c.next_show_at == start, self._actual(table, key, now)['next_show_at']),
+              else_=table.c.next_show_at)
+      else:
+        values = {'past_shows_count': table.c.past_shows_count + delta}
+      connection.execute(table.update().where(table.c.id == getattr(target, key)).values(**values))
+
+  def _inserted(self, mapper, connection, target):
+    self._shift(connection, target, 1)
+
+  def _deleted(self, mapper, connection, target):
+    self._shift(connection, target, -1)
+
+  def _updated(self, mapper, connection, target):
+    # a moved or rescheduled show: recount its old and new owners
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes()
+               for name in ['time_to_start'] + [key for table, key in self.owners]):
+      return
+    ids = {}
+    for table, key in self.owners:
+      history = state.attrs[key].history
+      ids[table] = set(history.deleted or ()) | set([getattr(target, key)])
+    self.refresh(connection, ids)
+
+  def refresh(self, connection, ids=None, now=None):
+    # recounts the given {table: ids} (every row when ids is None)
+    now = now or datetime.now()
+    for table, key in self.owners:
+      statement = table.update().values(**self._actual(table, key, now))
+      if ids is not None:
+        if not ids.get(table):
+          continue
+        statement = statement.where(table.c.id.in_(list(ids[table])))
+      connection.execute(statement)
+
+  def rollover(self, connection, now=None):
+    # recounts the rows whose next show has started; returns {table: ids}
+    now = now or datetime.now()
+    due = {}
+    for table, key in self.owners:
+      due[table] = [row[0] for row in connection.execute(
+          select(table.c.id).where(table.c.next_show_at <= now))]
+    self.refresh(connection, due, now)
+    return due
+
+  def drift(self, connection, now=None):
+    # (table name, id, stored values, actual values) for every row whose
+    # counters are wrong. Rows still waiting for the rollover only have their
+    # total checked; their upcoming/past split is expected to lag.
+    now = now or datetime.now()
+    drifted = []
+    for table, key in self.owners:
+      actual = self._actual(table, key, now)
+      stored_total = table.c.upcoming_shows_count + table.c.past_shows_count
+      actual_total = actual['upcoming_shows_count'] + actual['past_shows_count']
+      pending = and_(table.c.next_show_at.isnot(None), table.c.next_show_at <= now)
+      rows = connection.execute(
+          select(table.c.id, *[table.c[name] for name in COUNTER_COLUMNS] +
+                 [actual[name] for name in COUNTER_COLUMNS])
+          .where(or_(stored_total != actual_total,
+                     and_(not_(pending),
+                          or_(*[table.c[name].is_distinct_from(actual[name])
+                                for name in COUNTER_COLUMNS]))))
+          .order_by(table.c.id))
+      for row in rows:
+        drifted.append((table.name, row[0], tuple(row[1:4]), tuple(row[4:7])))
+    return drifted
@@ -0,0 +1,119 @@
+#----------------------------------------------------------------------------#
+# Set-based deletes of venues and artists.
+#
+# Deleting a venue or artist removes its shows with DELETE statements of at
+# most batch_size rows each, recounting the show counters of the other side
+# (the artists of a deleted venue's shows, and so on) per batch, and only
+# then deletes the row itself. No show is loaded into the session, so the
+# cost is bounded by the number of statements rather than by memory. The
+# row goes through the ORM so the search, genre and schedule indexes hear
+# about it; Program's foreign keys also cascade on the database for deletes
+# made outside the app.
+#
+# With SOFT_DELETE on, a delete only stamps deleted_at (one UPDATE), every
+# ORM query hides stamped rows and the shows that belong to them, and
+# `flask sweep` purges them later, committing after every batch. The other
+# side's counters are recounted when the row is stamped, leaving those
+# shows out. Run the sweep before turning SOFT_DELETE off, or stamped rows
+# reappear.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from sqlalchemy import and_, event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+
+class Deletions(object):
+
+  def __init__(self, program, owners, counters):
+    # owners: (model, foreign key attribute on program) pairs, as for
+    # ShowCounters, whose models carry a deleted_at column
+    self.program = program
+    self.owners = owners
+    self.counters = counters
+    self.soft = False
+    self.batch_size = 1000
+    self._criteria = [with_loader_criteria(model, model.deleted_at.is_(None), include_aliases=True)
+                      for model, key in owners]
+    # Core tables in the subqueries, so the criteria above do not apply
+    # to them as well
+    self._criteria.append(with_loader_criteria(program, and_(*[
+        getattr(program, key).notin_(select(model.__table__.c.id)
+                                     .where(model.__table__.c.deleted_at.isnot(None)))
+        for model, key in owners]), include_aliases=True))
+    event.listen(Session, 'do_orm_execute', self._hide_deleted)
+
+  def init_app(self, app):
+    self.soft = app.config.get('SOFT_DELETE', False)
+    self.batch_size = app.config.get('DELETE_BATCH_SIZE', 1000)
+
+  def _hide_deleted(self, state):
+    # soft-deleted rows stay out of every ORM select unless the statement
+    # asks for them with execution_options(include_deleted=True)
+    if (not self.soft or not state.is_select or state.is_column_load or state.is_relationship_load
+        or state.execution_options.get('include_deleted', False)):
+      return
+    state.statement = state.statement.options(*self._criteria)
+
+  def delete(self, session, model, entity_id):
+    # deletes (or stamps) a venue or artist; False when there is none.
+    # The caller commits.
+    entity = session.get(model, entity_id)
+    if entity is None:
+      return False
+    if self.soft:
+      entity.deleted_at = datetime.utcnow()
+      session.flush()
+      self.counters.refresh(session, self._others(session, entity))
+    else:
+      self.purge(session, entity)
+    return True
+
+  def _others(self, session, entity):
+    # {table: ids} of the other side's rows sharing shows with the entity
+    program = self.program.__table__
+    column = program.c[dict(self.owners)[type(entity)]]
+    return dict((model.__table__, set(row[0] for row in session.execute(
+                    select(program.c[key]).where(column == entity.id).distinct())))
+                for model, key in self.owners if model is not type(entity))
+
+  def purge(self, session, entity, commit_batches=False):
+    # removes the entity's shows batch by batch, then the entity; returns
+    # {table: ids} of the other side's rows that lost shows
+    program = self.program.__table__
+    column = program.c[dict(self.owners)[type(entity)]]
+    others = [(model.__table__, program.c[key]) for model, key in self.owners
+              if model is not type(entity)]
+    affected = dict((table, set()) for table, key in others)
+    while True:
+      rows = session.execute(select(program.c.id, *[key for table, key in others])
+                             .where(column == entity.id)
+                             .limit(self.batch_size)).all()
+      if not rows:
+        break
+      session.execute(program.delete().where(program.c.id.in_([row[0] for row in rows])))
+      touched = dict((table, set(row[i + 1] for row in rows)) for i, (table, key) in enumerate(others))
+      self.counters.refresh(session, touched)
+      for table, ids in touched.items():
+        affected[table] |= ids
+      if len(rows) < self.batch_size:
+        break
+      if commit_batches:
+        session.commit()
+    session.delete(entity)
+    return affected
+
+  def sweep(self, session):
+    # purges every soft-deleted row, committing after each batch; returns
+    # ({table: purged ids}, {table: ids of rows that lost shows})
+    purged, affected = {}, {}
+    for model, key in self.owners:
+      table = model.__table__
+      ids = [row[0] for row in session.execute(select(table.c.id).where(table.c.deleted_at.isnot(None)))]
+      for entity_id in ids:
+        entity = session.get(model, entity_id, execution_options={'include_deleted': True})
+        for other, other_ids in self.purge(session, entity, commit_batches=True).items():
+          affected.setdefault(other, set()).update(other_ids)
+        session.commit()
+      purged[table] = ids
+    return purged, affected
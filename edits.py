@@ -0,0 +1,73 @@
+#----------------------------------------------------------------------------#
+# Diff-based edits of venues and artists.
+#
+# The edit form carries a version token: the row's version (the mapper's
+# version_id_col) and a short digest of every editable field as the form
+# showed it. On submit only the fields whose value now digests differently
+# are written, and the row is not loaded first: the unchanged values (equal
+# to the stored ones, by their digests) and the version seed a detached
+# instance, the changed values are assigned on top, and the flush issues a
+# single UPDATE ... SET <changed columns>, version = ? WHERE id = ? AND
+# version = ?. If the row was saved in between, the version no longer
+# matches and the flush raises StaleDataError instead of overwriting that
+# save; no row lock is held while the form is open.
+#----------------------------------------------------------------------------#
+
+import hashlib
+import json
+from sqlalchemy import inspect
+from sqlalchemy.orm import make_transient_to_detached
+
+DIGEST_SIZE = 4
+
+
+def field_digest(value):
+  # None and '' render alike in the form, so they digest alike; a multiple
+  # select submits its picks in option order, so lists digest as sets
+  if value is None:
+    value = ''
+  elif isinstance(value, (list, tuple)):
+    value = sorted(value)
+  return hashlib.blake2b(json.dumps(value, sort_keys=True, default=str).encode('utf-8'),
+                         digest_size=DIGEST_SIZE).hexdigest()
+
+def version_token(version, values):
+  # values: the form's field values, in a fixed order
+  return '%d:%s' % (version, ''.join(field_digest(value) for value in values))
+
+def parse_version_token(token, count):
+  # (version, [digest]); ValueError when the token does not fit `count` fields
+  version, _, digests = (token or '').partition(':')
+  width = DIGEST_SIZE * 2
+  if len(digests) != count * width:
+    raise ValueError('malformed version token')
+  return int(version), [digests[i:i + width] for i in range(0, len(digests), width)]
+
+
+def apply_edit(session, model, entity_id, token, values):
+  # values: [(attribute, submitted value)], in the order the token was made
+  # from. Flushes the changed attributes and returns their names.
+  if not token:
+    # a form rendered without a token: diff against the stored row instead
+    entity = session.get(model, entity_id)
+    for attribute, value in values:
+      setattr(entity, attribute, value)
+    changed = [attribute for attribute, value in values if inspect(entity).attrs[attribute].history.has_changes()]
+    session.flush()
+    return changed
+  version, digests = parse_version_token(token, len(values))
+  unchanged, changed = {}, []
+  for (attribute, value), digest in zip(values, digests):
+    if field_digest(value) == digest:
+      unchanged[attribute] = value
+    else:
+      changed.append((attribute, value))
+  if not changed:
+    return []
+  entity = model(id=entity_id, version=version, **unchanged)
+  make_transient_to_detached(entity)
+  session.add(entity)
+  for attribute, value in changed:
+    setattr(entity, attribute, value)
+  session.flush()
+  return [attribute for attribute, value in changed]
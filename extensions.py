@@ -0,0 +1,23 @@
+#----------------------------------------------------------------------------#
+# Extensions, created unbound and attached to the app in create_app().
+# Flask-Migrate is not among them: create_app() only sets it up under the
+# `flask` command, so web workers never import alembic.
+#----------------------------------------------------------------------------#
+
+from flask_moment import Moment
+from flask_sqlalchemy import SQLAlchemy
+
+from assets import Assets
+from cache import PageCache, FragmentCache
+from compress import Compress
+from profiler import SQLProfiler
+from replicas import Replicas, RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+replicas = Replicas(db)
+assets = Assets()
+moment = Moment()
+page_cache = PageCache()
+fragment_cache = FragmentCache()
+compress = Compress()
+sql_profiler = SQLProfiler()
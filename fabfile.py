@@ -5,9 +5,11 @@ from fabric.contrib.console import confirm
 
 
 def test():
+    # smoke run of the benchmark suite: seeds a throwaway SQLite database and
+    # exercises every route
     with settings(warn_only=True):
         result = local(
-            "python test_tasks.py -v && python test_users.py -v", capture=True
+            "python -m benchmarks.run --scale smoke --iterations 3 --requests 20", capture=True
         )
     if result.failed and not confirm("Tests failed. Continue?"):
         abort("Aborted at user request.")
@@ -56,3 +58,13 @@ def deploy():
 
 def rollback():
     local("heroku rollback")
+
+# benchmarks
+
+
+def bench(scale="1k", baseline="benchmarks/baseline.json"):
+    local("python -m benchmarks.run --scale {0} --compare {1}".format(scale, baseline))
+
+
+def bench_baseline(scale="1k", baseline="benchmarks/baseline.json"):
+    local("python -m benchmarks.run --scale {0} --output {1}".format(scale, baseline))
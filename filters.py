@@ -0,0 +1,36 @@
+#----------------------------------------------------------------------------#
+# Filters.
+#
+# babel and dateutil are imported on first use; neither is needed to start
+# the app or run its CLI commands.
+#----------------------------------------------------------------------------#
+
+import functools
+from datetime import datetime, timezone
+
+@functools.lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  # compiled babel pattern and parsed locale, cached per (format, locale)
+  import babel.dates
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.parse_pattern(format), babel.Locale.parse(locale)
+
+def format_datetime(value, format='medium', locale='en'):
+  # accepts datetime objects directly; strings are still parsed
+  if not isinstance(value, datetime):
+    import dateutil.parser
+    value = dateutil.parser.parse(value)
+  pattern, locale = datetime_pattern(format, locale)
+  if value.tzinfo is None:
+    value = value.replace(tzinfo=timezone.utc)
+  return pattern.apply(value, locale)
+
+def format_datetimes(values, format='medium', locale='en'):
+  # batch form for listing pages: one pattern lookup for the whole list
+  pattern, locale = datetime_pattern(format, locale)
+  utc = timezone.utc
+  return [pattern.apply(value if value.tzinfo else value.replace(tzinfo=utc), locale)
+          for value in values]
@@ -0,0 +1,142 @@
+#----------------------------------------------------------------------------#
+# Genre-faceted browsing for venues and artists.
+#
+# On Postgres a genre filter is an array containment test (`genres @>
+# ARRAY[...]`) served by a GIN index on the genres column, and the facet
+# counts per city come from one aggregate over the unnested arrays. Other
+# databases (SQLite test runs, where the arrays are JSON) use an in-process
+# index built from a single query: the genre vocabulary is the fixed
+# GENRES list (which the forms offer as choices), so each row's genres pack
+# into one integer bitmask and both the filter and the counts are bit tests.
+# The bitmaps are dropped when this process writes a venue or artist
+# through the ORM, or imports them; writes from other processes are
+# noticed at most every GENRE_INDEX_CHECK_SECONDS, by comparing the number
+# of rows, the highest id and the sum of their versions with the values
+# they were built from.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from sqlalchemy import event, func, select, true
+from sqlalchemy.dialects import postgresql
+
+GENRES = [
+  'Alternative', 'Blues', 'Classical', 'Country', 'Electronic', 'Folk', 'Funk',
+  'Hip-Hop', 'Heavy Metal', 'Instrumental', 'Jazz', 'Musical Theatre', 'Pop',
+  'Punk', 'R&B', 'Reggae', 'Rock n Roll', 'Soul', 'Other',
+]
+GENRE_BITS = dict((genre, 1 << bit) for bit, genre in enumerate(GENRES))
+_canonical = dict((genre.lower(), genre) for genre in GENRES)
+
+
+def canonical_genre(genre):
+  # the vocabulary spelling of `genre` (case-insensitive), or None
+  return _canonical.get((genre or '').strip().lower())
+
+def genre_mask(genres):
+  mask = 0
+  for genre in genres or ():
+    mask |= GENRE_BITS.get(genre, 0)
+  return mask
+
+
+class GenreBitmaps(object):
+  # (id, city, state, mask) per row plus the precomputed facet counts
+
+  def __init__(self, rows):
+    self.masks = []
+    self.counts = {}
+    for entity_id, city, state, genres in rows:
+      mask = genre_mask(genres)
+      self.masks.append((entity_id, mask))
+      area = self.counts.setdefault((city, state), {})
+      for genre in GENRES:
+        if mask & GENRE_BITS[genre]:
+          area[genre] = area.get(genre, 0) + 1
+
+  def ids(self, genre):
+    bit = GENRE_BITS[genre]
+    return [entity_id for entity_id, mask in self.masks if mask & bit]
+
+
+class GenreFacets(object):
+
+  def __init__(self, db, model, column):
+    # column: the model's genres array attribute
+    self.db = db
+    self.model = model
+    self.column = column
+    self._fallback = None
+    self._lock = threading.Lock()
+    self.check_interval = 5.0
+    # (rows, highest id, sum of versions) the bitmaps reflect, and when
+    # that was last compared with the database
+    self._fingerprint = None
+    self._checked_at = 0.0
+    for name in ('after_insert', 'after_update', 'after_delete'):
+      event.listen(model, name, self._invalidate)
+
+  def init_app(self, app):
+    self.check_interval = float(app.config.get('GENRE_INDEX_CHECK_SECONDS', self.check_interval))
+
+  def _invalidate(self, mapper, connection, target):
+    self.invalidate()
+
+  def invalidate(self):
+    self._fallback = None
+
+  def fingerprint(self, session):
+    # Core table: soft-deleted rows count too
+    table = self.model.__table__
+    return tuple(session.execute(select(func.count(table.c.id), func.max(table.c.id),
+                                        func.coalesce(func.sum(table.c.version), 0))).first())
+
+  def _stale(self, session):
+    # whether another process changed the rows since the build; asks the
+    # database at most every check_interval
+    now = time.monotonic()
+    if now - self._checked_at < self.check_interval:
+      return False
+    self._checked_at = now
+    return self.fingerprint(session) != self._fingerprint
+
+  def _bitmaps(self, session):
+    with self._lock:
+      bitmaps = self._fallback
+      if bitmaps is None or self._stale(session):
+        model = self.model
+        # read first: a row committed while the genres load only costs a rebuild
+        fingerprint = self.fingerprint(session)
+        bitmaps = GenreBitmaps(session.query(model.id, model.city, model.state, self.column))
+        self._fallback, self._fingerprint = bitmaps, fingerprint
+        self._checked_at = time.monotonic()
+    return bitmaps
+
+  def criterion(self, genre, session=None):
+    # filter criterion for rows tagged with the (canonical) genre
+    session = session or self.db.session
+    if session.get_bind().dialect.name == 'postgresql':
+      return self.column.op('@>')(postgresql.array([genre]))
+    return self.model.id.in_(self._bitmaps(session).ids(genre))
+
+  def counts(self, session=None):
+    # {(city, state): {genre: number of rows}}
+    session = session or self.db.session
+    if session.get_bind().dialect.name != 'postgresql':
+      return self._bitmaps(session).counts
+    model = self.model
+    genre = func.unnest(self.column).table_valued('genre')
+    rows = session.query(model.city, model.state, genre.c.genre, func.count()) \
+        .select_from(model) \
+        .join(genre, true()) \
+        .group_by(model.city, model.state, genre.c.genre)
+    counts = {}
+    for city, state, name, count in rows:
+      counts.setdefault((city, state), {})[name] = count
+    return counts
+
+
+def facet_list(counts):
+  # [{"genre", "count"}] by descending count, for the templates and API
+  return [{"genre": genre, "count": count}
+          for genre, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))]
@@ -0,0 +1,273 @@
+#----------------------------------------------------------------------------#
+# Venue coordinates and the "venues near me" search.
+#
+# A venue gets a latitude and longitude from the geocoder when it is
+# created or its address, city or state change, and the geohash of that
+# point alongside. The geocoder is pluggable (GEOCODER in config.py):
+# 'gazetteer' looks the city up in an offline CSV of city centres, 'null'
+# leaves venues unplaced, and 'module:Class' loads any class built from the
+# app config with the same geocode(address, city, state) method.
+#
+# A search first prunes the candidates through an index, then computes the
+# exact haversine distance of all of them at once (NumPy when installed)
+# and keeps those within the radius, nearest first. On Postgres with the
+# earthdistance extension the index is a GiST index on
+# ll_to_earth(latitude, longitude), searched with earth_box(); elsewhere it
+# is the geohash column: the circle's bounding box is covered by at most
+# MAX_CELLS geohash cells and each run of neighbouring cells is one range
+# scan. A k-nearest search without a radius doubles the radius until k
+# venues are within it.
+#----------------------------------------------------------------------------#
+
+import csv
+import importlib
+import math
+from sqlalchemy import and_, event, func, inspect, or_, text
+
+from search import normalize
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+# stored hashes: cells of about 5 x 5 metres
+GEOHASH_PRECISION = 9
+# a search covers its bounding box with at most this many cells; the 32
+# cells of precision 1 cover the whole world
+MAX_CELLS = 32
+# mean radius (IUGG)
+EARTH_RADIUS_KM = 6371.0088
+
+
+#  Geohashes
+#  ----------------------------------------------------------------
+
+def cell_size(precision):
+  # (height, width) in degrees of a cell; a hash alternates longitude and
+  # latitude bits, starting with longitude
+  bits = 5 * precision
+  return 180.0 / (1 << (bits // 2)), 360.0 / (1 << ((bits + 1) // 2))
+
+def _cell(lat, lng, precision):
+  # (row, column) of the cell holding the point
+  height, width = cell_size(precision)
+  return (min(int((lat + 90.0) / height), int(round(180.0 / height)) - 1),
+          min(int((lng + 180.0) / width), int(round(360.0 / width)) - 1))
+
+def _interleave(row, column, precision):
+  bits = 5 * precision
+  lat_bits, lng_bits = bits // 2, (bits + 1) // 2
+  value = 0
+  for i in range(bits):
+    if i % 2 == 0:
+      lng_bits -= 1
+      value = (value << 1) | ((column >> lng_bits) & 1)
+    else:
+      lat_bits -= 1
+      value = (value << 1) | ((row >> lat_bits) & 1)
+  return value
+
+def _base32(value, precision):
+  return ''.join(BASE32[(value >> (5 * i)) & 31] for i in reversed(range(precision)))
+
+def geohash(lat, lng, precision=GEOHASH_PRECISION):
+  return _base32(_interleave(*_cell(lat, lng, precision) + (precision,)), precision)
+
+def covering_ranges(lat, lng, radius_km, max_cells=MAX_CELLS):
+  # [(low, high)] geohash ranges (high None: to the end) holding every
+  # point within radius_km of (lat, lng): the finest cells, at most
+  # max_cells of them, covering the circle's bounding box, with runs of
+  # consecutive cells merged
+  angle = radius_km / EARTH_RADIUS_KM
+  south = max(lat - math.degrees(angle), -90.0)
+  north = min(lat + math.degrees(angle), 90.0)
+  if south > -90.0 and north < 90.0 and math.sin(angle) < math.cos(math.radians(lat)):
+    spread = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+  else:
+    # a pole is within the circle: every longitude
+    spread = 180.0
+  for precision in range(GEOHASH_PRECISION, 0, -1):
+    height, width = cell_size(precision)
+    columns = int(round(360.0 / width))
+    first_row, last_row = _cell(south, lng, precision)[0], _cell(north, lng, precision)[0]
+    # the box may cross the antimeridian: columns wrap around
+    first_column = int(math.floor((lng - spread + 180.0) / width))
+    span = int(math.floor((lng + spread + 180.0) / width)) - first_column + 1
+    if spread >= 180.0 or span >= columns:
+      first_column, span = 0, columns
+    if (last_row - first_row + 1) * span <= max_cells or precision == 1:
+      break
+  cells = sorted(set(_interleave(row, (first_column + i) % columns, precision)
+                     for row in range(first_row, last_row + 1) for i in range(span)))
+  ranges = []
+  for value in cells:
+    if ranges and ranges[-1][1] == value:
+      ranges[-1][1] = value + 1
+    else:
+      ranges.append([value, value + 1])
+  end = 32 ** precision
+  return [(_base32(low, precision), _base32(high, precision) if high < end else None)
+          for low, high in ranges]
+
+
+#  Distances
+#  ----------------------------------------------------------------
+
+def haversine_km(lat, lng, lats, lngs):
+  # great-circle distances from (lat, lng) to each (lats[i], lngs[i])
+  if numpy is not None:
+    lat1, lng1 = math.radians(lat), math.radians(lng)
+    lats = numpy.radians(numpy.asarray(lats, dtype=float))
+    lngs = numpy.radians(numpy.asarray(lngs, dtype=float))
+    a = numpy.sin((lats - lat1) / 2) ** 2 + math.cos(lat1) * numpy.cos(lats) * numpy.sin((lngs - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * numpy.arcsin(numpy.sqrt(numpy.minimum(a, 1.0)))
+  lat1, lng1 = math.radians(lat), math.radians(lng)
+  cos_lat1 = math.cos(lat1)
+  distances = []
+  for lat2, lng2 in zip(lats, lngs):
+    lat2, lng2 = math.radians(lat2), math.radians(lng2)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    distances.append(2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0))))
+  return distances
+
+def nearest(distances, radius_km, k):
+  # positions of the (at most) k smallest distances within radius_km,
+  # nearest first; ties keep their order
+  if numpy is not None:
+    distances = numpy.asarray(distances)
+    within = numpy.flatnonzero(distances <= radius_km)
+    order = numpy.argsort(distances[within], kind='stable')
+    return within[order[:k]].tolist()
+  within = [i for i, distance in enumerate(distances) if distance <= radius_km]
+  within.sort(key=distances.__getitem__)
+  return within[:k]
+
+
+#  Geocoders
+#  ----------------------------------------------------------------
+
+class NullGeocoder(object):
+
+  def geocode(self, address, city, state):
+    return None
+
+
+class Gazetteer(object):
+  # city centres from a CSV file with city, state, latitude and longitude
+  # columns; the street address is not used
+
+  def __init__(self, path):
+    self.places = {}
+    with open(path, newline='') as stream:
+      for row in csv.DictReader(stream):
+        self.places[(normalize(row['city']), row['state'].strip().upper())] = (
+            float(row['latitude']), float(row['longitude']))
+
+  def geocode(self, address, city, state):
+    # (latitude, longitude), or None for an unknown city
+    return self.places.get((normalize(city), (state or '').strip().upper()))
+
+
+def load_geocoder(config):
+  name = config.get('GEOCODER', 'gazetteer')
+  if name == 'gazetteer':
+    return Gazetteer(config['GAZETTEER_PATH'])
+  if name == 'null':
+    return NullGeocoder()
+  module, _, attribute = name.partition(':')
+  return getattr(importlib.import_module(module), attribute)(config)
+
+
+#  Locations
+#  ----------------------------------------------------------------
+
+class Locations(object):
+
+  def __init__(self, db, model):
+    # model: carries latitude, longitude and geohash columns and the
+    # address, city and state the geocoder reads
+    self.db = db
+    self.model = model
+    self.geocoder = NullGeocoder()
+    self.max_radius_km = 500.0
+    self._earthdistance = {}
+    event.listen(model, 'before_insert', self._locate)
+    event.listen(model, 'before_update', self._relocate)
+
+  def init_app(self, app):
+    self.geocoder = load_geocoder(app.config)
+    self.max_radius_km = app.config.get('NEARBY_MAX_RADIUS_KM', 500.0)
+
+  def place(self, address, city, state):
+    # latitude, longitude and geohash column values; None when the
+    # geocoder does not know the place
+    point = self.geocoder.geocode(address, city, state)
+    if point is None:
+      return {'latitude': None, 'longitude': None, 'geohash': None}
+    return {'latitude': point[0], 'longitude': point[1], 'geohash': geohash(*point)}
+
+  def _set(self, target, values):
+    for attribute, value in values.items():
+      setattr(target, attribute, value)
+
+  def _locate(self, mapper, connection, target):
+    # coordinates given with the row are kept; only their hash is added
+    if target.latitude is not None and target.longitude is not None:
+      target.geohash = geohash(target.latitude, target.longitude)
+    else:
+      self._set(target, self.place(target.address, target.city, target.state))
+
+  def _relocate(self, mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.latitude.history.has_changes() or attrs.longitude.history.has_changes():
+      self._locate(mapper, connection, target)
+    elif any(attrs[name].history.has_changes() for name in ('address', 'city', 'state')):
+      self._set(target, self.place(target.address, target.city, target.state))
+
+  #  Searching
+  #  ----------------------------------------------------------------
+
+  def has_earthdistance(self, session):
+    bind = session.get_bind(mapper=inspect(self.model))
+    if bind.dialect.name != 'postgresql':
+      return False
+    if bind.url not in self._earthdistance:
+      with bind.connect() as connection:
+        self._earthdistance[bind.url] = connection.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'earthdistance'")).first() is not None
+    return self._earthdistance[bind.url]
+
+  def candidates(self, session, lat, lng, radius_km):
+    # rows (id, name, city, state, address, latitude, longitude) of the
+    # venues in the index cells around the circle, a superset of those in it
+    model = self.model
+    query = session.query(model.id, model.name, model.city, model.state, model.address,
+                          model.latitude, model.longitude)
+    if self.has_earthdistance(session):
+      # earth_box takes a distance on earthdistance's own sphere (earth())
+      query = query.filter(
+          func.earth_box(func.ll_to_earth(lat, lng), radius_km / EARTH_RADIUS_KM * func.earth())
+          .op('@>')(func.ll_to_earth(model.latitude, model.longitude)))
+    else:
+      query = query.filter(or_(*[
+          model.geohash >= low if high is None else and_(model.geohash >= low, model.geohash < high)
+          for low, high in covering_ranges(lat, lng, radius_km)]))
+    # sorted here rather than by ORDER BY id, which SQLite would rather
+    # serve with a primary key scan than use the geohash index
+    return sorted(query.filter(model.latitude.isnot(None)), key=lambda row: row.id)
+
+  def nearby(self, lat, lng, radius_km=None, k=10, session=None):
+    # [(row, distance in km)] of the k venues nearest to (lat, lng) within
+    # radius_km (at most max_radius_km), nearest first; rows as candidates()
+    session = session or self.db.session
+    widen = radius_km is None
+    radius_km = self.max_radius_km / 64 if widen else min(radius_km, self.max_radius_km)
+    while True:
+      rows = self.candidates(session, lat, lng, radius_km)
+      distances = haversine_km(lat, lng, [row.latitude for row in rows], [row.longitude for row in rows])
+      found = nearest(distances, radius_km, k)
+      if not widen or len(found) >= k or radius_km >= self.max_radius_km:
+        return [(rows[i], float(distances[i])) for i in found]
+      radius_km = min(radius_km * 2, self.max_radius_km)
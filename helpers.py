@@ -0,0 +1,128 @@
+#----------------------------------------------------------------------------#
+# Helpers shared by the page blueprints, the JSON API and the ASGI views.
+#----------------------------------------------------------------------------#
+
+import base64
+from datetime import datetime, timedelta
+from flask import request, abort, g, has_request_context, current_app
+
+from extensions import db
+from models import Program, show_archive
+from genres import canonical_genre
+
+def program_timeline(session, entity, criterion, related, past_limit=None, past_offset=0):
+  # loads the upcoming and past programs of `entity` (those matching
+  # `criterion`) with the `related` side (Program.artist or Program.venue)
+  # joined in, so rendering the tiles never triggers a lazy load.
+  # past_limit/past_offset page long histories; a page reaching past the
+  # live past shows goes on into the archived ones (archive.py).
+  time_now = datetime.now()
+  base = session.query(Program).options(db.joinedload(related)).filter(criterion)
+  upcoming = base.filter(Program.time_to_start > time_now) \
+                 .order_by(Program.time_to_start, Program.id).all()
+  past = base.filter(Program.time_to_start <= time_now) \
+             .order_by(Program.time_to_start.desc(), Program.id.desc()) \
+             .offset(past_offset)
+  if past_limit is not None:
+    past = past.limit(past_limit)
+
+  # the materialized total is exact; splitting it with the upcoming list
+  # keeps the counts right even before the rollover job has caught up
+  upcoming_count = len(upcoming)
+  past_count = entity.upcoming_shows_count + entity.past_shows_count - upcoming_count
+  past = past.all()
+  if entity.archived_shows_count and (past_limit is None or len(past) < past_limit):
+    past += show_archive.past_shows(session, entity, max(past_offset - past_count, 0),
+                                    None if past_limit is None else past_limit - len(past))
+  return upcoming, past, upcoming_count, past_count + entity.archived_shows_count
+
+def past_page_args():
+  # optional ?past_limit=&past_offset= paging for the past-shows section
+  past_limit = request.args.get('past_limit', type=int)
+  past_offset = request.args.get('past_offset', 0, type=int)
+  if past_limit is not None and past_limit < 0:
+    past_limit = None
+  return past_limit, max(past_offset, 0)
+
+def search_payload(entity_search, form, session=None):
+  # one ranked statement returns the requested page and the total
+  page = form.get('page', 1, type=int)
+  per_page = current_app.config['SEARCH_PAGE_SIZE']
+  results, total = entity_search.search(form.get('search_term', ''), page, per_page, session)
+  return {
+    "count": total,
+    "data": results,
+    "page": page,
+    "has_next": page * per_page < total
+  }
+
+def expire_cache_at(when):
+  # tells PageCache.cached when the page being built goes stale; payloads
+  # built outside a Flask request (the ASGI views) have nothing to tell
+  if has_request_context():
+    g.cache_expires_at = when
+
+def venue_page_keys(venue_id):
+  # cached pages showing this venue: its page, the directory, and the pages
+  # of artists with shows there
+  artist_ids = db.session.query(Program.artist_id).filter(Program.venue_id == venue_id).distinct()
+  return ['venues', 'venue:%s' % venue_id] + ['artist:%d' % artist_id for artist_id, in artist_ids]
+
+def artist_page_keys(artist_id):
+  # cached pages showing this artist, plus the directory whose upcoming
+  # counts include the artist's shows
+  venue_ids = db.session.query(Program.venue_id).filter(Program.artist_id == artist_id).distinct()
+  return ['artists', 'venues', 'artist:%s' % artist_id] + ['venue:%d' % venue_id for venue_id, in venue_ids]
+
+def show_duration():
+  return timedelta(minutes=current_app.config['SHOW_DURATION_MINUTES'])
+
+def encode_show_cursor(time_to_start, program_id):
+  # opaque seek cursor pointing just after (time_to_start, id)
+  raw = '%s|%d' % (time_to_start.isoformat(), program_id)
+  return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_show_cursor(cursor):
+  try:
+    time_to_start, program_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+    return datetime.fromisoformat(time_to_start), int(program_id)
+  except (ValueError, UnicodeError):
+    abort(400)
+
+def genre_arg():
+  # ?genre= of the directory pages, in its vocabulary spelling
+  if not request.args.get('genre'):
+    return None
+  genre = canonical_genre(request.args['genre'])
+  if genre is None:
+    abort(404)
+  return genre
+
+def show_filter_args():
+  # the non-empty ?from=&to=&city=&genre= arguments, kept on paging links
+  return dict((name, request.args[name]) for name in ('from', 'to', 'city', 'genre')
+              if request.args.get(name))
+
+def local_naive(value):
+  # start times are stored as naive local times (datetime.now()); a
+  # timestamp with a zone or offset is converted to that
+  if value is not None and value.tzinfo is not None:
+    value = value.astimezone().replace(tzinfo=None)
+  return value
+
+def show_filters():
+  # parsed show_filter_args() for shows_payload; None when no filter is
+  # given. A date-only `to` covers the whole day.
+  args = show_filter_args()
+  if not args:
+    return None
+  import dateutil.parser
+  filters = {'city': args.get('city') or None, 'genre': args.get('genre') or None}
+  try:
+    filters['start'] = local_naive(dateutil.parser.parse(args['from'])) if args.get('from') else None
+    filters['end'] = local_naive(dateutil.parser.parse(args['to'])) if args.get('to') else None
+  except (ValueError, OverflowError):
+    abort(400)
+  if filters['end'] is not None and len(args['to'].strip()) <= 10:
+    filters['end'] += timedelta(days=1, seconds=-1)
+  return filters
@@ -0,0 +1,197 @@
+#----------------------------------------------------------------------------#
+# Bulk import of venues, artists and shows from CSV or NDJSON files.
+#
+# Rows are streamed from the file, validated with the same WTForms classes as
+# the web forms, and inserted one chunk at a time with a single executemany
+# INSERT per chunk. Shows may reference artists and venues by id or by name;
+# names are resolved through an in-memory name -> id map loaded once.
+#----------------------------------------------------------------------------#
+
+import csv
+import json
+import time
+from itertools import islice
+from werkzeug.datastructures import MultiDict
+from forms import VenueForm, ArtistForm, ShowForm
+from search import normalize, search_document
+from models import venue_locations
+
+TRUE_VALUES = ('1', 'true', 'yes', 'y', 'on')
+
+
+def read_rows(stream, fmt):
+  # yields (line number, row dict or None, error message or None)
+  if fmt == 'csv':
+    for line_no, row in enumerate(csv.DictReader(stream), 2):
+      yield line_no, row, None
+    return
+  for line_no, line in enumerate(stream, 1):
+    if not line.strip():
+      continue
+    try:
+      row = json.loads(line)
+    except ValueError as error:
+      yield line_no, None, 'invalid JSON: %s' % error
+      continue
+    if not isinstance(row, dict):
+      yield line_no, None, 'expected a JSON object'
+      continue
+    yield line_no, row, None
+
+def chunked(iterable, size):
+  iterator = iter(iterable)
+  while True:
+    chunk = list(islice(iterator, size))
+    if not chunk:
+      return
+    yield chunk
+
+def form_data(row):
+  # maps a CSV/NDJSON row onto the formdata the web forms expect
+  data = MultiDict()
+  for key, value in row.items():
+    if key is None or value is None:
+      continue
+    if isinstance(value, list):
+      for item in value:
+        data.add(key, str(item))
+    elif key == 'genres':
+      for genre in str(value).split(','):
+        if genre.strip():
+          data.add(key, genre.strip())
+    elif key == 'seeking_talent':
+      if value is True or str(value).strip().lower() in TRUE_VALUES:
+        data.add(key, 'y')
+    else:
+      data.add(key, str(value))
+  return data
+
+def form_errors(form):
+  return '; '.join('%s: %s' % (field, ', '.join(errors)) for field, errors in form.errors.items())
+
+
+def validate_venue(row):
+  form = VenueForm(formdata=form_data(row), meta={'csrf': False})
+  if not form.validate():
+    return None, form_errors(form)
+  name, city = form.name.data.strip(), form.city.data.strip()
+  row = {
+    'name': name,
+    'city': city,
+    'state': form.state.data,
+    'address': form.address.data,
+    'phone': form.phone.data,
+    'image_link': form.image_link.data,
+    'facebook_link': form.facebook_link.data,
+    'genres': form.genres.data,
+    'web_link': form.website_link.data,
+    'seek_desc': form.seeking_description.data,
+    'looking_for_talent': form.seeking_talent.data,
+    'search_document': search_document(name, city, form.genres.data),
+  }
+  # the bulk insert skips the ORM events, so geocode here
+  row.update(venue_locations.place(row['address'], city, row['state']))
+  return row, None
+
+def validate_artist(row):
+  form = ArtistForm(formdata=form_data(row), meta={'csrf': False})
+  if not form.validate():
+    return None, form_errors(form)
+  name, city = form.name.data.strip(), form.city.data.strip()
+  return {
+    'name': name,
+    'city': city,
+    'state': form.state.data,
+    'phone': form.phone.data,
+    'image_link': form.image_link.data,
+    'facebook_link': form.facebook_link.data,
+    'genres': form.genres.data,
+    'web_link': form.website_link.data,
+    'seek_desc': form.seeking_description.data,
+    'search_document': search_document(name, city, form.genres.data),
+  }, None
+
+
+class NameMap(object):
+  # normalized name -> id, with names shared by several rows marked ambiguous
+
+  def __init__(self, rows):
+    self.ids = set()
+    self.by_name = {}
+    for entity_id, name in rows:
+      self.ids.add(entity_id)
+      key = normalize(name)
+      self.by_name[key] = None if key in self.by_name else entity_id
+
+  def resolve(self, kind, entity_id, name):
+    if entity_id not in (None, ''):
+      try:
+        entity_id = int(entity_id)
+      except ValueError:
+        return None, '%s_id: not an integer' % kind
+      if entity_id not in self.ids:
+        return None, '%s_id: unknown %s %d' % (kind, kind, entity_id)
+      return entity_id, None
+    key = normalize(name)
+    if not key:
+      return None, '%s: an id or a name is required' % kind
+    if key not in self.by_name:
+      return None, '%s: unknown %s %r' % (kind, kind, name)
+    if self.by_name[key] is None:
+      return None, '%s: ambiguous %s name %r' % (kind, kind, name)
+    return self.by_name[key], None
+
+def show_validator(artists, venues, bookings=None):
+  # artists/venues are NameMaps; rows carry artist_id or artist, venue_id or
+  # venue. With a booking.Bookings, rows clashing with the existing schedule
+  # or with earlier rows of the file are rejected.
+  def validate_show(row):
+    form = ShowForm(formdata=form_data(row), meta={'csrf': False})
+    errors = [] if form.validate() else [form_errors(form)]
+    if not row.get('start_time'):
+      # ShowForm would otherwise fall back to its default of today
+      errors.append('start_time: This field is required.')
+    artist_id, error = artists.resolve('artist', row.get('artist_id'), row.get('artist'))
+    if error:
+      errors.append(error)
+    venue_id, error = venues.resolve('venue', row.get('venue_id'), row.get('venue'))
+    if error:
+      errors.append(error)
+    if not errors and bookings is not None:
+      kind = bookings.conflict(venue_id, artist_id, form.start_time.data)
+      if kind is not None:
+        errors.append('start_time: the %s is already booked at that time' % kind)
+      else:
+        bookings.add(venue_id, artist_id, form.start_time.data)
+    if errors:
+      return None, '; '.join(errors)
+    return {
+      'artist_id': artist_id,
+      'venue_id': venue_id,
+      'time_to_start': form.start_time.data,
+    }, None
+  return validate_show
+
+
+def import_rows(db, table, rows, validate, chunk_size=1000, on_reject=None, after_chunk=None):
+  # rows as produced by read_rows(); returns (accepted, rejected, seconds)
+  accepted = rejected = 0
+  started = time.time()
+  for chunk in chunked(rows, chunk_size):
+    values = []
+    for line_no, row, error in chunk:
+      if error is None:
+        value, error = validate(row)
+      if error is not None:
+        rejected += 1
+        if on_reject is not None:
+          on_reject(line_no, row, error)
+        continue
+      values.append(value)
+    if values:
+      db.session.execute(table.insert(), values)
+      db.session.commit()
+      accepted += len(values)
+      if after_chunk is not None:
+        after_chunk(values)
+  return accepted, rejected, time.time() - started
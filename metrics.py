@@ -0,0 +1,100 @@
+#----------------------------------------------------------------------------#
+# Connection pool instrumentation.
+#
+# InstrumentedQueuePool times how long each checkout waits for a connection;
+# render_pool_metrics() reports that histogram together with the pool's
+# size, checked-out and overflow counts in the Prometheus text format.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from sqlalchemy.pool import QueuePool
+
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+
+class Histogram(object):
+
+  def __init__(self, buckets=WAIT_BUCKETS):
+    self.buckets = buckets
+    self.counts = [0] * (len(buckets) + 1)
+    self.sum = 0.0
+    self._lock = threading.Lock()
+
+  def observe(self, value):
+    with self._lock:
+      self.sum += value
+      for i, bound in enumerate(self.buckets):
+        if value <= bound:
+          self.counts[i] += 1
+          break
+      else:
+        self.counts[-1] += 1
+
+  def snapshot(self):
+    # cumulative (upper bound, count) pairs ending with +Inf, the sum and the count
+    with self._lock:
+      counts, total = list(self.counts), self.sum
+    cumulative, running = [], 0
+    for bound, count in zip(self.buckets + (float('inf'),), counts):
+      running += count
+      cumulative.append((bound, running))
+    return cumulative, total, running
+
+
+class InstrumentedQueuePool(QueuePool):
+
+  def __init__(self, *args, **kwargs):
+    super(InstrumentedQueuePool, self).__init__(*args, **kwargs)
+    self.wait_histogram = Histogram()
+
+  def _do_get(self):
+    started = time.perf_counter()
+    try:
+      return super(InstrumentedQueuePool, self)._do_get()
+    finally:
+      self.wait_histogram.observe(time.perf_counter() - started)
+
+
+def _format_bound(bound):
+  return '+Inf' if bound == float('inf') else repr(bound)
+
+def render_pool_metrics(pools, replicas=()):
+  # pools: {label: Pool}; pools without QueuePool accounting are skipped.
+  # replicas: replicas.Replica objects, whose last probe is reported
+  gauges = (
+    ('size', 'Configured number of persistent connections', 'size'),
+    ('checked_out', 'Connections currently checked out', 'checkedout'),
+    ('checked_in', 'Idle connections in the pool', 'checkedin'),
+    ('overflow', 'Connections open beyond pool_size (negative when below size)', 'overflow'),
+  )
+  lines = []
+  for name, description, method in gauges:
+    lines.append('# HELP fyyur_db_pool_%s %s' % (name, description))
+    lines.append('# TYPE fyyur_db_pool_%s gauge' % name)
+    for label, pool in sorted(pools.items()):
+      if hasattr(pool, method):
+        lines.append('fyyur_db_pool_%s{engine="%s"} %d' % (name, label, getattr(pool, method)()))
+
+  lines.append('# HELP fyyur_db_pool_wait_seconds Time spent waiting for a pooled connection')
+  lines.append('# TYPE fyyur_db_pool_wait_seconds histogram')
+  for label, pool in sorted(pools.items()):
+    histogram = getattr(pool, 'wait_histogram', None)
+    if histogram is None:
+      continue
+    buckets, total, count = histogram.snapshot()
+    for bound, cumulative in buckets:
+      lines.append('fyyur_db_pool_wait_seconds_bucket{engine="%s",le="%s"} %d' % (label, _format_bound(bound), cumulative))
+    lines.append('fyyur_db_pool_wait_seconds_sum{engine="%s"} %f' % (label, total))
+    lines.append('fyyur_db_pool_wait_seconds_count{engine="%s"} %d' % (label, count))
+
+  if replicas:
+    lines.append('# HELP fyyur_db_replica_up Whether the last probe of the replica passed')
+    lines.append('# TYPE fyyur_db_replica_up gauge')
+    for replica in replicas:
+      lines.append('fyyur_db_replica_up{engine="%s"} %d' % (replica.name, replica.healthy))
+    lines.append('# HELP fyyur_db_replica_lag_seconds Replication lag seen by the last probe')
+    lines.append('# TYPE fyyur_db_replica_lag_seconds gauge')
+    for replica in replicas:
+      lines.append('fyyur_db_replica_lag_seconds{engine="%s"} %f' % (replica.name, replica.lag))
+  return '\n'.join(lines) + '\n'
@@ -0,0 +1,26 @@
+"""version columns for optimistic locking of venue and artist edits
+
+Revision ID: 0b9e4d7a2c15
+Revises: f3a8c61d0e27
+Create Date: 2026-10-18 18:27:40.553019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0b9e4d7a2c15'
+down_revision = 'f3a8c61d0e27'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_column(table, 'version')
@@ -0,0 +1,40 @@
+"""venue coordinates, geohash index and earthdistance index
+
+Revision ID: 1d6f9b3e8a70
+Revises: 0b9e4d7a2c15
+Create Date: 2026-10-18 20:41:12.208316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1d6f9b3e8a70'
+down_revision = '0b9e4d7a2c15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('Venue', sa.Column('latitude', sa.Float(), nullable=True))
+    op.add_column('Venue', sa.Column('longitude', sa.Float(), nullable=True))
+    # byte order, so each geohash cell is one contiguous index range
+    op.add_column('Venue', sa.Column('geohash', sa.String(length=12, collation='C'), nullable=True))
+    op.create_index('ix_Venue_geohash', 'Venue', ['geohash'])
+    # the nearby search prefers earthdistance (a trusted extension from
+    # Postgres 13) where the server ships it; run `flask geocode` afterwards
+    # to place the existing venues
+    available = op.get_bind().execute(sa.text(
+        "SELECT 1 FROM pg_available_extensions WHERE name = 'earthdistance'")).first()
+    if available is not None:
+        op.execute('CREATE EXTENSION IF NOT EXISTS cube')
+        op.execute('CREATE EXTENSION IF NOT EXISTS earthdistance')
+        op.execute('CREATE INDEX "ix_Venue_earth" ON "Venue" USING gist (ll_to_earth(latitude, longitude))')
+
+
+def downgrade():
+    op.execute('DROP INDEX IF EXISTS "ix_Venue_earth"')
+    op.drop_index('ix_Venue_geohash', table_name='Venue')
+    for column in ('geohash', 'longitude', 'latitude'):
+        op.drop_column('Venue', column)
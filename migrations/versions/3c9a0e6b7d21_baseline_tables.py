@@ -0,0 +1,73 @@
+"""Venue, Artist and Program as they were before the first migration
+
+Revision ID: 3c9a0e6b7d21
+Revises: 
+Create Date: 2026-10-18 09:05:12.604871
+
+The tables predate the migrations (the app created them with
+db.create_all()), so each is only created when it is missing: an empty
+database gets all three, an existing one is left as it is.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a0e6b7d21'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = sa.inspect(op.get_bind()).get_table_names()
+    if 'Venue' not in existing:
+        op.create_table('Venue',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('state', sa.String(length=120), nullable=True),
+            sa.Column('address', sa.String(length=120), nullable=True),
+            sa.Column('phone', sa.String(length=120), nullable=True),
+            sa.Column('image_link', sa.String(length=500), nullable=True),
+            sa.Column('facebook_link', sa.String(length=120), nullable=True),
+            sa.Column('web_link', sa.String(length=120), nullable=True),
+            sa.Column('seek_desc', sa.String(length=500), nullable=True),
+            sa.Column('looking_for_talent', sa.Boolean(), nullable=True),
+            sa.Column('genres', postgresql.ARRAY(sa.String()), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'Artist' not in existing:
+        op.create_table('Artist',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('state', sa.String(length=120), nullable=True),
+            sa.Column('phone', sa.String(length=120), nullable=True),
+            sa.Column('image_link', sa.String(length=500), nullable=True),
+            sa.Column('facebook_link', sa.String(length=120), nullable=True),
+            sa.Column('genres', postgresql.ARRAY(sa.String()), nullable=False),
+            sa.Column('web_link', sa.String(length=120), nullable=True),
+            sa.Column('seek_desc', sa.String(length=500), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+    if 'Program' not in existing:
+        # the constraint names Postgres gives unnamed keys, which later
+        # migrations refer to
+        op.create_table('Program',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('venue_id', sa.Integer(), nullable=False),
+            sa.Column('artist_id', sa.Integer(), nullable=False),
+            sa.Column('time_to_start', sa.DateTime(), nullable=False),
+            sa.ForeignKeyConstraint(['artist_id'], ['Artist.id'], name='Program_artist_id_fkey'),
+            sa.ForeignKeyConstraint(['venue_id'], ['Venue.id'], name='Program_venue_id_fkey'),
+            sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('Program')
+    op.drop_table('Artist')
+    op.drop_table('Venue')
@@ -0,0 +1,24 @@
+"""index Program.time_to_start for keyset pagination of /shows
+
+Revision ID: 5b2e8d41c7a3
+Revises: 3c9a0e6b7d21
+Create Date: 2026-10-18 09:12:44.318205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b2e8d41c7a3'
+down_revision = '3c9a0e6b7d21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_Program_time_to_start_id', 'Program', ['time_to_start', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_Program_time_to_start_id', table_name='Program')
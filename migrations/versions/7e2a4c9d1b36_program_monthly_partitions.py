@@ -0,0 +1,103 @@
+"""partition Program by month of time_to_start; archived show counters
+
+Revision ID: 7e2a4c9d1b36
+Revises: 1d6f9b3e8a70
+Create Date: 2026-10-18 22:05:37.640183
+
+Rebuilds Program as a range-partitioned table: one partition per month
+from its oldest show to PROGRAM_PARTITIONS_AHEAD months from now, plus a
+default partition. The rows are copied, so plan for the table being locked
+while it runs. The primary key becomes (id, time_to_start), as a
+partitioned table requires, and the exclusion constraints against double
+bookings move to the partitions (see partitions.py).
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2a4c9d1b36'
+down_revision = '1d6f9b3e8a70'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+INDEXES = (
+    ('ix_Program_time_to_start_id', ['time_to_start', 'id']),
+    ('ix_Program_venue_id_time_to_start', ['venue_id', 'time_to_start']),
+    ('ix_Program_artist_id_time_to_start', ['artist_id', 'time_to_start']),
+)
+
+
+def add_months(start, months):
+    years, month = divmod(start.month - 1 + months, 12)
+    return start.replace(year=start.year + years, month=month + 1)
+
+
+def slot_constraints(table, minutes):
+    for owner, key in (('venue', 'venue_id'), ('artist', 'artist_id')):
+        op.execute('''
+            ALTER TABLE "{table}" ADD CONSTRAINT "{table}_{owner}_slot_excl"
+            EXCLUDE USING gist ({key} WITH =,
+                                tsrange(time_to_start, time_to_start + interval '{minutes} minutes') WITH &&)
+        '''.format(table=table, owner=owner, key=key, minutes=minutes))
+
+
+def keys_and_indexes():
+    for table, key in OWNERS:
+        op.create_foreign_key('Program_%s_fkey' % key, 'Program', table, [key], ['id'], ondelete='CASCADE')
+    for name, columns in INDEXES:
+        op.create_index(name, 'Program', columns)
+
+
+def upgrade():
+    minutes = int(current_app.config['SHOW_DURATION_MINUTES'])
+    ahead = int(current_app.config['PROGRAM_PARTITIONS_AHEAD'])
+    for table, key in OWNERS:
+        op.add_column(table, sa.Column('archived_shows_count', sa.Integer(), nullable=False,
+                                       server_default='0'))
+
+    # the sequence would go with the old table
+    op.execute('ALTER SEQUENCE "Program_id_seq" OWNED BY NONE')
+    op.execute('CREATE TABLE "Program_partitioned" (LIKE "Program" INCLUDING DEFAULTS) '
+               'PARTITION BY RANGE (time_to_start)')
+    oldest, now = op.get_bind().execute(sa.text(
+        'SELECT min(time_to_start), localtimestamp FROM "Program"')).first()
+    month = (oldest or now).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    last = add_months(now.replace(day=1, hour=0, minute=0, second=0, microsecond=0), ahead)
+    partitions = []
+    while month <= last:
+        name = 'Program_p%04d%02d' % (month.year, month.month)
+        op.execute("CREATE TABLE \"%s\" PARTITION OF \"Program_partitioned\" FOR VALUES FROM ('%s') TO ('%s')" % (
+            name, month.isoformat(' '), add_months(month, 1).isoformat(' ')))
+        partitions.append(name)
+        month = add_months(month, 1)
+    op.execute('CREATE TABLE "Program_default" PARTITION OF "Program_partitioned" DEFAULT')
+    partitions.append('Program_default')
+
+    op.execute('INSERT INTO "Program_partitioned" SELECT * FROM "Program"')
+    op.execute('DROP TABLE "Program"')
+    op.execute('ALTER TABLE "Program_partitioned" RENAME TO "Program"')
+    op.execute('ALTER SEQUENCE "Program_id_seq" OWNED BY "Program".id')
+    op.execute('ALTER TABLE "Program" ADD CONSTRAINT "Program_pkey" PRIMARY KEY (id, time_to_start)')
+    keys_and_indexes()
+    for name in partitions:
+        slot_constraints(name, minutes)
+
+
+def downgrade():
+    # shows already archived (`flask archive`) stay in their files
+    minutes = int(current_app.config['SHOW_DURATION_MINUTES'])
+    op.execute('ALTER SEQUENCE "Program_id_seq" OWNED BY NONE')
+    op.execute('CREATE TABLE "Program_unpartitioned" (LIKE "Program" INCLUDING DEFAULTS)')
+    op.execute('INSERT INTO "Program_unpartitioned" SELECT * FROM "Program"')
+    op.execute('DROP TABLE "Program"')
+    op.execute('ALTER TABLE "Program_unpartitioned" RENAME TO "Program"')
+    op.execute('ALTER SEQUENCE "Program_id_seq" OWNED BY "Program".id')
+    op.execute('ALTER TABLE "Program" ADD CONSTRAINT "Program_pkey" PRIMARY KEY (id)')
+    keys_and_indexes()
+    slot_constraints('Program', minutes)
+    for table, key in OWNERS:
+        op.drop_column(table, 'archived_shows_count')
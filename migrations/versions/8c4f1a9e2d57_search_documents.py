@@ -0,0 +1,37 @@
+"""trigram-indexed search documents on Venue and Artist
+
+Revision ID: 8c4f1a9e2d57
+Revises: 5b2e8d41c7a3
+Create Date: 2026-10-18 10:03:27.551940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c4f1a9e2d57'
+down_revision = '5b2e8d41c7a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        op.add_column(table, sa.Column('search_document', sa.Text(), nullable=True))
+        # same normalization as search.search_document(): lowercased,
+        # whitespace collapsed, name + city + genres
+        op.execute(
+            'UPDATE "{0}" SET search_document = btrim(lower(regexp_replace('
+            "concat_ws(' ', name, city, array_to_string(genres, ' ')), '\\s+', ' ', 'g')))".format(table)
+        )
+        op.create_index('ix_{0}_search_document_trgm'.format(table), table, ['search_document'],
+                        unique=False, postgresql_using='gin',
+                        postgresql_ops={'search_document': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_index('ix_{0}_search_document_trgm'.format(table), table_name=table)
+        op.drop_column(table, 'search_document')
@@ -0,0 +1,27 @@
+"""updated_at row versions on Venue, Artist and Program for API ETags
+
+Revision ID: a7d3e5f09b12
+Revises: 8c4f1a9e2d57
+Create Date: 2026-10-18 11:21:05.904117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7d3e5f09b12'
+down_revision = '8c4f1a9e2d57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist', 'Program'):
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=False,
+                                       server_default=sa.text("(now() at time zone 'utc')")))
+
+
+def downgrade():
+    for table in ('Venue', 'Artist', 'Program'):
+        op.drop_column(table, 'updated_at')
@@ -0,0 +1,47 @@
+"""materialized upcoming/past show counters on Venue and Artist
+
+Revision ID: c41d8b6f2e90
+Revises: a7d3e5f09b12
+Create Date: 2026-10-18 14:02:37.118250
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41d8b6f2e90'
+down_revision = 'a7d3e5f09b12'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    for table, key in OWNERS:
+        op.create_index('ix_Program_%s_time_to_start' % key, 'Program', [key, 'time_to_start'])
+        op.add_column(table, sa.Column('upcoming_shows_count', sa.Integer(), nullable=False,
+                                       server_default='0'))
+        op.add_column(table, sa.Column('past_shows_count', sa.Integer(), nullable=False,
+                                       server_default='0'))
+        op.add_column(table, sa.Column('next_show_at', sa.DateTime(), nullable=True))
+
+        # backfill; time_to_start is naive local time, as written by the app
+        op.execute('''
+            UPDATE "{table}" SET
+              upcoming_shows_count = (SELECT count(*) FROM "Program" p
+                                      WHERE p.{key} = "{table}".id AND p.time_to_start > localtimestamp),
+              past_shows_count = (SELECT count(*) FROM "Program" p
+                                  WHERE p.{key} = "{table}".id AND p.time_to_start <= localtimestamp),
+              next_show_at = (SELECT min(p.time_to_start) FROM "Program" p
+                              WHERE p.{key} = "{table}".id AND p.time_to_start > localtimestamp)
+        '''.format(table=table, key=key))
+
+
+def downgrade():
+    for table, key in OWNERS:
+        op.drop_column(table, 'next_show_at')
+        op.drop_column(table, 'past_shows_count')
+        op.drop_column(table, 'upcoming_shows_count')
+        op.drop_index('ix_Program_%s_time_to_start' % key, table_name='Program')
@@ -0,0 +1,26 @@
+"""GIN indexes on the Venue and Artist genres arrays
+
+Revision ID: d92a6c3b1f48
+Revises: c41d8b6f2e90
+Create Date: 2026-10-18 15:36:12.402871
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd92a6c3b1f48'
+down_revision = 'c41d8b6f2e90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('Venue', 'Artist'):
+        op.create_index('ix_%s_genres_gin' % table, table, ['genres'], postgresql_using='gin')
+
+
+def downgrade():
+    for table in ('Venue', 'Artist'):
+        op.drop_index('ix_%s_genres_gin' % table, table_name=table)
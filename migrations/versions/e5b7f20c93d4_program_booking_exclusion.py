@@ -0,0 +1,37 @@
+"""exclusion constraints against double-booked venues and artists
+
+Revision ID: e5b7f20c93d4
+Revises: d92a6c3b1f48
+Create Date: 2026-10-18 16:48:50.771031
+
+Existing overlaps make the upgrade fail; list them with `flask conflicts`
+first. The slot length is SHOW_DURATION_MINUTES at the time of upgrade.
+
+"""
+from alembic import op
+from flask import current_app
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b7f20c93d4'
+down_revision = 'd92a6c3b1f48'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('venue', 'venue_id'), ('artist', 'artist_id'))
+
+
+def upgrade():
+    minutes = int(current_app.config['SHOW_DURATION_MINUTES'])
+    op.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    for owner, key in OWNERS:
+        op.execute('''
+            ALTER TABLE "Program" ADD CONSTRAINT "Program_%s_slot_excl"
+            EXCLUDE USING gist (%s WITH =,
+                                tsrange(time_to_start, time_to_start + interval '%d minutes') WITH &&)
+        ''' % (owner, key, minutes))
+
+
+def downgrade():
+    for owner, key in OWNERS:
+        op.drop_constraint('Program_%s_slot_excl' % owner, 'Program')
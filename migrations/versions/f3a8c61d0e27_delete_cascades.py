@@ -0,0 +1,37 @@
+"""cascade show deletes from venues and artists; soft-delete stamps
+
+Revision ID: f3a8c61d0e27
+Revises: e5b7f20c93d4
+Create Date: 2026-10-18 17:42:03.118564
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a8c61d0e27'
+down_revision = 'e5b7f20c93d4'
+branch_labels = None
+depends_on = None
+
+OWNERS = (('Venue', 'venue_id'), ('Artist', 'artist_id'))
+
+
+def upgrade():
+    for table, key in OWNERS:
+        # the constraints predate the migrations and carry Postgres' default names
+        op.drop_constraint('Program_%s_fkey' % key, 'Program', type_='foreignkey')
+        op.create_foreign_key('Program_%s_fkey' % key, 'Program', table, [key], ['id'],
+                              ondelete='CASCADE')
+        op.add_column(table, sa.Column('deleted_at', sa.DateTime(), nullable=True))
+        op.create_index('ix_%s_deleted_at' % table, table, ['deleted_at'],
+                        postgresql_where=sa.text('deleted_at IS NOT NULL'))
+
+
+def downgrade():
+    for table, key in OWNERS:
+        op.drop_index('ix_%s_deleted_at' % table, table_name=table)
+        op.drop_column(table, 'deleted_at')
+        op.drop_constraint('Program_%s_fkey' % key, 'Program', type_='foreignkey')
+        op.create_foreign_key('Program_%s_fkey' % key, 'Program', table, [key], ['id'])
@@ -0,0 +1,149 @@
+#----------------------------------------------------------------------------#
+# Models.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+from extensions import db
+from search import EntitySearch
+from counters import ShowCounters
+from schedule import ScheduleIndex
+from genres import GenreFacets
+from deletion import Deletions
+from typeahead import Typeahead
+from geo import Locations
+from archive import ShowArchive
+
+# Postgres ARRAY, stored as JSON on SQLite (local and benchmark runs)
+GenreList = db.ARRAY(db.String()).with_variant(db.JSON(), 'sqlite')
+
+class Venue(db.Model):
+    __tablename__ = 'Venue'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    address = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    web_link = db.Column(db.String(120))
+    seek_desc = db.Column(db.String(500))
+    looking_for_talent = db.Column(db.Boolean,default=False)
+    genres_categories = db.Column("genres", GenreList, nullable=False)
+    # shows go with the venue on the database (ON DELETE CASCADE); see deletion.py
+    related_programs = db.relationship('Program', backref='venue', lazy=True, passive_deletes=True)
+
+    # normalized name, city and genres, kept current by EntitySearch
+    search_document = db.Column(db.Text)
+    # feeds the API ETags
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # materialized by ShowCounters; the split lags until the rollover job runs
+    upcoming_shows_count = db.Column(db.Integer, default=0, nullable=False)
+    past_shows_count = db.Column(db.Integer, default=0, nullable=False)
+    next_show_at = db.Column(db.DateTime)
+    # shows moved to the archive files by `flask archive` (see archive.py)
+    archived_shows_count = db.Column(db.Integer, default=0, nullable=False)
+    # set by soft deletes (SOFT_DELETE); `flask sweep` purges the row
+    deleted_at = db.Column(db.DateTime)
+    # bumped by every ORM update, which only applies to the version it read
+    # (optimistic locking; see edits.py)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    # from the geocoder, with the geohash of the point for the nearby search
+    # (see geo.py); NULL when the geocoder does not know the place. With the
+    # earthdistance extension a GiST index on ll_to_earth(latitude,
+    # longitude) serves the search instead (created by the migration only).
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    # byte order on Postgres, so cells are contiguous index ranges
+    geohash = db.Column(db.String(12, collation='C').with_variant(db.String(12), 'sqlite'))
+    __table_args__ = (
+        db.Index('ix_Venue_search_document_trgm', 'search_document',
+                 postgresql_using='gin', postgresql_ops={'search_document': 'gin_trgm_ops'}),
+        # genre filters (genres @> ARRAY[...])
+        db.Index('ix_Venue_genres_gin', 'genres', postgresql_using='gin'),
+        # the sweep's lookup; live rows are left out of the index
+        db.Index('ix_Venue_deleted_at', 'deleted_at', postgresql_where=db.text('deleted_at IS NOT NULL')),
+        db.Index('ix_Venue_geohash', 'geohash'),
+    )
+    __mapper_args__ = {'version_id_col': version}
+    
+class Artist(db.Model):
+    __tablename__ = 'Artist'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    phone = db.Column(db.String(120))
+    image_link = db.Column(db.String(500))
+    facebook_link = db.Column(db.String(120))
+    
+    # TODO: implement any missing fields, as a database migration using Flask-Migrate
+    # shows go with the artist on the database (ON DELETE CASCADE); see deletion.py
+    related_programs = db.relationship('Program', backref='artist', lazy=True, passive_deletes=True)
+    genres = db.Column("genres", GenreList, nullable=False)
+    web_link = db.Column(db.String(120))
+    seek_desc = db.Column(db.String(500))
+
+    # normalized name, city and genres, kept current by EntitySearch
+    search_document = db.Column(db.Text)
+    # feeds the API ETags
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # materialized by ShowCounters; the split lags until the rollover job runs
+    upcoming_shows_count = db.Column(db.Integer, default=0, nullable=False)
+    past_shows_count = db.Column(db.Integer, default=0, nullable=False)
+    next_show_at = db.Column(db.DateTime)
+    # shows moved to the archive files by `flask archive` (see archive.py)
+    archived_shows_count = db.Column(db.Integer, default=0, nullable=False)
+    # set by soft deletes (SOFT_DELETE); `flask sweep` purges the row
+    deleted_at = db.Column(db.DateTime)
+    # bumped by every ORM update, which only applies to the version it read
+    # (optimistic locking; see edits.py)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+    __table_args__ = (
+        db.Index('ix_Artist_search_document_trgm', 'search_document',
+                 postgresql_using='gin', postgresql_ops={'search_document': 'gin_trgm_ops'}),
+        # genre filters (genres @> ARRAY[...])
+        db.Index('ix_Artist_genres_gin', 'genres', postgresql_using='gin'),
+        # the sweep's lookup; live rows are left out of the index
+        db.Index('ix_Artist_deleted_at', 'deleted_at', postgresql_where=db.text('deleted_at IS NOT NULL')),
+    )
+    __mapper_args__ = {'version_id_col': version}
+
+# TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
+class Program(db.Model):
+    __tablename__ = 'Program'
+    # On Postgres the table is partitioned by month of time_to_start and its
+    # primary key is (id, time_to_start); id alone stays unique through the
+    # sequence, so the mapper keys on it (see partitions.py)
+
+    id = db.Column(db.Integer, primary_key=True)
+    venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), nullable=False)
+    artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), nullable=False)
+    time_to_start = db.Column(db.DateTime,default=datetime.utcnow, nullable=False )
+    # feeds the API ETags
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # (time_to_start, id) is the seek key of the /shows listing; the
+    # per-owner indexes serve the detail pages and the counter recounts
+    __table_args__ = (
+        db.Index('ix_Program_time_to_start_id', 'time_to_start', 'id'),
+        db.Index('ix_Program_venue_id_time_to_start', 'venue_id', 'time_to_start'),
+        db.Index('ix_Program_artist_id_time_to_start', 'artist_id', 'time_to_start'),
+    )
+
+venue_search = EntitySearch(db, Venue, ('name', 'city', 'genres_categories'))
+artist_search = EntitySearch(db, Artist, ('name', 'city', 'genres'))
+show_counters = ShowCounters(Program, [(Venue, 'venue_id'), (Artist, 'artist_id')])
+schedule_index = ScheduleIndex(db, Program, Venue, Artist)
+venue_genres = GenreFacets(db, Venue, Venue.genres_categories)
+artist_genres = GenreFacets(db, Artist, Artist.genres)
+venue_typeahead = Typeahead(db, Venue, Program, 'venue_id')
+artist_typeahead = Typeahead(db, Artist, Program, 'artist_id')
+venue_locations = Locations(db, Venue)
+show_archive = ShowArchive(Program, [(Venue, 'venue_id'), (Artist, 'artist_id')])
+deletions = Deletions(Program, [(Venue, 'venue_id'), (Artist, 'artist_id')], show_counters)
@@ -0,0 +1,98 @@
+#----------------------------------------------------------------------------#
+# Monthly partitions of Program (Postgres).
+#
+# Program is range-partitioned on time_to_start, one partition per calendar
+# month named Program_pYYYYMM, plus Program_default for shows outside every
+# partition (see migration 7e2a4c9d1b36). Queries on a time range only scan
+# the months they touch, and archive.py removes a month by dropping its
+# partition instead of deleting row by row. `flask partitions ensure`
+# creates the partitions of the coming months ahead of time; run it monthly.
+# Shows of a month that already landed in the default partition move into
+# its new partition.
+#
+# Exclusion constraints cannot span partitions, so each partition carries
+# its own against double bookings; an overlap across a month boundary is
+# only caught by the booking check of the show form and the importer.
+# Elsewhere (SQLite) Program stays one table and these helpers do nothing.
+#----------------------------------------------------------------------------#
+
+import re
+from datetime import datetime
+from sqlalchemy import text
+
+DEFAULT_PARTITION = 'Program_default'
+_name = re.compile(r'^Program_p(\d{4})(\d{2})$')
+
+
+def month_start(moment):
+  return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+def add_months(start, months):
+  years, month = divmod(start.month - 1 + months, 12)
+  return start.replace(year=start.year + years, month=month + 1)
+
+def partition_name(start):
+  return 'Program_p%04d%02d' % (start.year, start.month)
+
+def is_partitioned(connection):
+  if connection.dialect.name != 'postgresql':
+    return False
+  return connection.execute(text(
+      "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('\"Program\"')")).first() is not None
+
+def partitions(connection):
+  # {month start: partition name} of the attached monthly partitions
+  found = {}
+  for name, in connection.execute(text(
+      'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+      'WHERE i.inhparent = \'"Program"\'::regclass')):
+    match = _name.match(name)
+    if match:
+      found[datetime(int(match.group(1)), int(match.group(2)), 1)] = name
+  return found
+
+def slot_constraints(table, minutes):
+  # the double-booking exclusion constraints of one partition
+  return ['''
+      ALTER TABLE "{table}" ADD CONSTRAINT "{table}_{owner}_slot_excl"
+      EXCLUDE USING gist ({key} WITH =,
+                          tsrange(time_to_start, time_to_start + interval '{minutes} minutes') WITH &&)
+  '''.format(table=table, owner=owner, key=key, minutes=minutes)
+      for owner, key in (('venue', 'venue_id'), ('artist', 'artist_id'))]
+
+def create_partition(connection, start, minutes):
+  # attaches the partition of the month beginning at `start`; returns the
+  # number of its shows moved out of the default partition
+  name, end = partition_name(start), add_months(start, 1)
+  bounds = {'start': start, 'end': end}
+  connection.execute(text('LOCK TABLE "%s" IN SHARE ROW EXCLUSIVE MODE' % DEFAULT_PARTITION))
+  connection.execute(text('CREATE TABLE "%s" (LIKE "Program" INCLUDING DEFAULTS)' % name))
+  moved = connection.execute(text('''
+      WITH moved AS (DELETE FROM "%s" WHERE time_to_start >= :start AND time_to_start < :end RETURNING *)
+      INSERT INTO "%s" SELECT * FROM moved''' % (DEFAULT_PARTITION, name)), bounds).rowcount
+  for statement in slot_constraints(name, minutes):
+    connection.execute(text(statement))
+  connection.execute(text("ALTER TABLE \"Program\" ATTACH PARTITION \"%s\" FOR VALUES FROM ('%s') TO ('%s')" % (
+      name, start.isoformat(' '), end.isoformat(' '))))
+  return moved
+
+def ensure(connection, now, ahead, minutes):
+  # creates the missing partitions from this month to `ahead` months on;
+  # returns [(partition name, shows moved into it)]
+  existing = partitions(connection)
+  created = []
+  start = month_start(now)
+  for i in range(ahead + 1):
+    month = add_months(start, i)
+    if month not in existing:
+      created.append((partition_name(month), create_partition(connection, month, minutes)))
+  return created
+
+def drop_partition(connection, start):
+  # drops the partition of the month beginning at `start`, with its shows;
+  # False when there is none
+  name = partitions(connection).get(start)
+  if name is None:
+    return False
+  connection.execute(text('DROP TABLE "%s"' % name))
+  return True
@@ -0,0 +1,142 @@
+#----------------------------------------------------------------------------#
+# Per-request SQL profiling and N+1 detection.
+#
+# Every statement executed on any engine is timed and reported to the
+# profiles active on the current thread. SQLProfiler opens one profile per
+# request (when SQL_PROFILER_ENABLED) and logs requests that go over the
+# configured thresholds; profile_queries() / query_budget() give tests the
+# same numbers as context managers:
+#
+#   with query_budget(4, max_repeats=1):
+#     client.get('/venues/1')
+#----------------------------------------------------------------------------#
+
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_active = threading.local()
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_placeholders = re.compile(r'%\(\w+\)s|:\w+|\?|%s|\$\d+')
+_in_lists = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+_whitespace = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+  # the statement with literals and bind parameters folded to '?', so the
+  # same query issued for different ids collapses into one template
+  shape = _placeholders.sub('?', _literals.sub('?', statement))
+  shape = _in_lists.sub('IN (?)', shape)
+  return _whitespace.sub(' ', shape).strip()
+
+
+class QueryProfile(object):
+
+  def __init__(self):
+    self.statements = []
+
+  def record(self, statement, duration):
+    self.statements.append((statement_shape(statement), duration))
+
+  @property
+  def count(self):
+    return len(self.statements)
+
+  @property
+  def total_time(self):
+    return sum(duration for shape, duration in self.statements)
+
+  def repeated(self, threshold):
+    # statement shapes issued more than `threshold` times: likely N+1 loops
+    counts = Counter(shape for shape, duration in self.statements)
+    return dict((shape, count) for shape, count in counts.items() if count > threshold)
+
+
+def _profiles():
+  if not hasattr(_active, 'profiles'):
+    _active.profiles = []
+  return _active.profiles
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  if _profiles():
+    conn.info.setdefault('profiler_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+  started = conn.info.get('profiler_started')
+  if not started:
+    return
+  duration = time.perf_counter() - started.pop()
+  for profile in _profiles():
+    profile.record(statement, duration)
+
+@contextmanager
+def profile_queries():
+  profile = QueryProfile()
+  _profiles().append(profile)
+  try:
+    yield profile
+  finally:
+    _profiles().remove(profile)
+
+@contextmanager
+def query_budget(max_queries, max_repeats=None):
+  # fails when the block issues more than max_queries statements, or repeats
+  # any one statement shape more than max_repeats times
+  with profile_queries() as profile:
+    yield profile
+  if profile.count > max_queries:
+    raise AssertionError('%d queries issued, budget is %d' % (profile.count, max_queries))
+  if max_repeats is not None:
+    repeated = profile.repeated(max_repeats)
+    if repeated:
+      raise AssertionError('statements repeated more than %d times: %r' % (max_repeats, repeated))
+
+
+class SQLProfiler(object):
+
+  def __init__(self, app=None):
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    if not app.config.get('SQL_PROFILER_ENABLED'):
+      return
+    self.app = app
+    app.before_request(self._start)
+    app.after_request(self._finish)
+    app.teardown_request(self._discard)
+
+  def _start(self):
+    profile = QueryProfile()
+    _profiles().append(profile)
+    g.sql_profile = profile
+
+  def _discard(self, error=None):
+    profile = g.pop('sql_profile', None)
+    if profile is not None and profile in _profiles():
+      _profiles().remove(profile)
+
+  def _finish(self, response):
+    profile = g.get('sql_profile')
+    if profile is None:
+      return response
+    config = self.app.config
+    response.headers['X-Query-Count'] = str(profile.count)
+    response.headers['Server-Timing'] = 'db;dur=%.1f' % (profile.total_time * 1000)
+
+    repeated = profile.repeated(config.get('SQL_PROFILER_REPEAT_THRESHOLD', 5))
+    if (profile.count > config.get('SQL_PROFILER_MAX_QUERIES', 20)
+        or profile.total_time > config.get('SQL_PROFILER_MAX_TIME', 0.5)
+        or repeated):
+      self.app.logger.warning('%s %s: %d queries in %.1fms',
+                              request.method, request.path, profile.count, profile.total_time * 1000)
+      for shape, count in repeated.items():
+        self.app.logger.warning('possible N+1 in %s: %dx %s', request.path, count, shape)
+    return response
@@ -0,0 +1,140 @@
+#----------------------------------------------------------------------------#
+# Read replicas.
+#
+# Replicas are Flask-SQLAlchemy binds named replica0, replica1, ... (see
+# DATABASE_REPLICA_URLS in config.py). The SELECTs of a GET or HEAD request
+# go to one replica, picked round-robin when the request starts; writes,
+# SELECT ... FOR UPDATE, text statements, other methods and CLI commands go
+# to the primary, and so does every read after a write in the same request.
+#
+# A replica is probed at most every REPLICA_CHECK_INTERVAL seconds, when it
+# is next picked. One that fails the probe or lags more than
+# REPLICA_MAX_LAG seconds is skipped until a later probe passes; with none
+# left, reads fall back to the primary.
+#
+# Read your writes: a request that wrote sets a cookie keeping that client
+# on the primary for REPLICA_READ_YOUR_WRITES seconds, so the page it is
+# redirected to shows the change. The worker that served the write also
+# reads from the primary for REPLICA_MAX_LAG seconds, so the pages it puts
+# in the page cache right after an invalidation are current. Other workers
+# sharing a Redis page cache are not covered; keep the lag bound small.
+#----------------------------------------------------------------------------#
+
+import itertools
+import threading
+import time
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+PRIMARY_COOKIE = 'fyyur_primary'
+READ_METHODS = ('GET', 'HEAD')
+
+# seconds a Postgres standby is behind; 0 once it has replayed everything
+# it received, and on a server that is not in recovery
+PG_LAG = text('''
+  SELECT CASE WHEN pg_is_in_recovery() AND pg_last_wal_receive_lsn() <> pg_last_wal_replay_lsn()
+              THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+              ELSE 0 END''')
+
+
+class Replica(object):
+
+  def __init__(self, name, engine):
+    self.name = name
+    self.engine = engine
+    self.healthy = True
+    self.lag = 0.0
+    self.checked_at = None
+    self._lock = threading.Lock()
+
+  def probe(self):
+    try:
+      with self.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+          self.lag = float(connection.execute(PG_LAG).scalar())
+        else:
+          connection.execute(text('SELECT 1'))
+          self.lag = 0.0
+      self.healthy = True
+    except SQLAlchemyError:
+      self.healthy = False
+    self.checked_at = time.monotonic()
+
+  def usable(self, now, check_interval, max_lag):
+    if self.checked_at is None or now - self.checked_at >= check_interval:
+      with self._lock:
+        # another request may have probed while this one waited
+        if self.checked_at is None or now - self.checked_at >= check_interval:
+          self.probe()
+    return self.healthy and self.lag <= max_lag
+
+
+class ReplicaSet(object):
+
+  def __init__(self, replicas, max_lag=5, check_interval=5):
+    self.replicas = replicas
+    self.max_lag = max_lag
+    self.check_interval = check_interval
+    self.last_write = None
+    self._turn = itertools.count()
+
+  def pick(self):
+    # the engine of the next usable replica, or None for the primary
+    now = time.monotonic()
+    if self.last_write is not None and now - self.last_write < self.max_lag:
+      return None
+    start = next(self._turn)
+    for i in range(len(self.replicas)):
+      replica = self.replicas[(start + i) % len(self.replicas)]
+      if replica.usable(now, self.check_interval, self.max_lag):
+        return replica.engine
+    return None
+
+
+class RoutingSession(Session):
+
+  def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+    if bind is None and has_app_context():
+      if self._flushing or (clause is not None and clause.is_dml):
+        g.wrote = True
+        g.replica = None
+      else:
+        replica = g.get('replica')
+        if (replica is not None and clause is not None and clause.is_select
+            and getattr(clause, '_for_update_arg', None) is None):
+          return replica
+    return super(RoutingSession, self).get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class Replicas(object):
+
+  def __init__(self, db, app=None):
+    self.db = db
+    if app is not None:
+      self.init_app(app)
+
+  def init_app(self, app):
+    with app.app_context():
+      engines = self.db.engines
+    names = sorted(name for name in engines if name and name.startswith('replica'))
+    app.extensions['replicas'] = ReplicaSet([Replica(name, engines[name]) for name in names],
+                                            app.config.get('REPLICA_MAX_LAG', 5),
+                                            app.config.get('REPLICA_CHECK_INTERVAL', 5))
+    if not names:
+      return
+    self.read_your_writes = app.config.get('REPLICA_READ_YOUR_WRITES', 10)
+    app.before_request(self._route)
+    app.after_request(self._remember_writes)
+
+  def _route(self):
+    if request.method in READ_METHODS and PRIMARY_COOKIE not in request.cookies:
+      g.replica = current_app.extensions['replicas'].pick()
+
+  def _remember_writes(self, response):
+    if g.get('wrote'):
+      current_app.extensions['replicas'].last_write = time.monotonic()
+      response.set_cookie(PRIMARY_COOKIE, '1', max_age=self.read_your_writes,
+                          httponly=True, samesite='Lax')
+    return response
@@ -0,0 +1,314 @@
+#----------------------------------------------------------------------------#
+# In-process schedule index for time-range questions.
+#
+# "What is playing between T1 and T2 in city X / genre Y" is answered from
+# sorted arrays instead of a Program scan. Every show is posted to the
+# global list and to the lists of its venue, its artist, its venue's city
+# and each of its artist's genres. A posting list is two parallel arrays,
+# start time in seconds since 2000-01-01 (array('q'), so any datetime
+# fits) and show id (array('i')), sorted by (start, id), so a time range
+# is two bisects and a posting costs 12 bytes. Times are kept to the
+# second.
+#
+# The index is built from one bulk query, at startup under asgi.py and on
+# first use otherwise. Shows created or deleted through the ORM are applied
+# incrementally once their transaction commits; edits to venues or artists
+# that move shows between cities and genres, and bulk loads, drop the index
+# so it is rebuilt.
+#
+# Other processes (the other workers, `flask import`, `flask archive`) do
+# not reach these hooks, so at most every SCHEDULE_INDEX_CHECK_SECONDS a
+# query compares the number of shows and the highest show id, and the
+# number of venues and artists and the sum of their versions (every ORM
+# write bumps a version), with the values the index was built from, and
+# rebuilds it when they differ. The changes the index applied itself are
+# counted in, so they cost no rebuild.
+#----------------------------------------------------------------------------#
+
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from search import normalize
+
+EPOCH = datetime(2000, 1, 1)
+
+
+def to_seconds(value):
+  return (value - EPOCH) // timedelta(seconds=1)
+
+
+class Postings(object):
+
+  __slots__ = ('times', 'ids')
+
+  def __init__(self):
+    self.times = array('q')
+    self.ids = array('i')
+
+  def __len__(self):
+    return len(self.ids)
+
+  def _position(self, start, show_id):
+    # first position at or after (start, show_id)
+    position, end = bisect_left(self.times, start), bisect_right(self.times, start)
+    while position < end and self.ids[position] < show_id:
+      position += 1
+    return position
+
+  def append(self, start, show_id):
+    # for building from rows already in (start, id) order
+    self.times.append(start)
+    self.ids.append(show_id)
+
+  def add(self, start, show_id):
+    position = self._position(start, show_id)
+    self.times.insert(position, start)
+    self.ids.insert(position, show_id)
+
+  def remove(self, start, show_id):
+    position = self._position(start, show_id)
+    if position < len(self.ids) and self.ids[position] == show_id:
+      del self.times[position]
+      del self.ids[position]
+
+  def span(self, start=None, end=None, after=None):
+    # positions [lo, hi) of the shows starting in [start, end], past `after`
+    lo = 0 if start is None else bisect_left(self.times, start)
+    if after is not None:
+      lo = max(lo, self._position(after[0], after[1] + 1))
+    hi = len(self.times) if end is None else bisect_right(self.times, end)
+    return lo, hi
+
+  def nbytes(self):
+    return (self.times.buffer_info()[1] * self.times.itemsize +
+            self.ids.buffer_info()[1] * self.ids.itemsize)
+
+
+class ScheduleIndex(object):
+
+  def __init__(self, db, program, venue, artist):
+    # venue/artist are the models, read through id, city and genres
+    self.db = db
+    self.program = program
+    self.venue = venue
+    self.artist = artist
+    self._postings = None
+    self._lock = threading.RLock()
+    self.check_interval = 5.0
+    # (shows, highest show id, venues, sum of venue versions, artists, sum
+    # of artist versions) the index reflects, and when that was last
+    # compared with the database
+    self._fingerprint = None
+    self._checked_at = 0.0
+    event.listen(program, 'after_insert', self._show_inserted)
+    event.listen(program, 'after_delete', self._show_deleted)
+    for model in (venue, artist):
+      event.listen(model, 'after_insert', self._entity_inserted)
+      event.listen(model, 'after_update', self._entity_updated)
+      event.listen(model, 'after_delete', self._entity_deleted)
+    event.listen(Session, 'after_commit', self._apply)
+    event.listen(Session, 'after_rollback', self._discard)
+
+  def init_app(self, app):
+    self.check_interval = float(app.config.get('SCHEDULE_INDEX_CHECK_SECONDS', self.check_interval))
+
+  #  Keeping current
+  #  ----------------------------------------------------------------
+  #  Changes are queued on the session during the flush and applied once
+  #  the transaction commits, so a rollback leaves the index untouched.
+
+  def _queue(self, target, change):
+    object_session(target).info.setdefault('schedule_changes', []).append(change)
+
+  def _show_inserted(self, mapper, connection, target):
+    self._queue(target, ('add', target.id, target.time_to_start, target.venue_id, target.artist_id))
+
+  def _show_deleted(self, mapper, connection, target):
+    self._queue(target, ('remove', target.id, target.time_to_start, target.venue_id, target.artist_id))
+
+  def _counted(self, mapper):
+    # position of the entity's row count in the fingerprint
+    return 2 if mapper.class_ is self.venue else 4
+
+  def _entity_inserted(self, mapper, connection, target):
+    # captured now; the committed object is expired by the time it applies
+    if mapper.class_ is self.venue:
+      self._queue(target, ('city', target.id, normalize(target.city)))
+    else:
+      self._queue(target, ('genres', target.id, tuple(normalize(genre) for genre in target.genres or ())))
+    self._queue(target, ('counted', self._counted(mapper), 1, target.version))
+
+  def _entity_updated(self, mapper, connection, target):
+    # moving a venue to another city or changing an artist's genres moves
+    # all their shows between posting lists, and a soft delete hides them;
+    # rebuild instead
+    name = 'city' if mapper.class_ is self.venue else 'genres'
+    attrs = inspect(target).attrs
+    if attrs[name].history.has_changes() or attrs.deleted_at.history.has_changes():
+      self._queue(target, ('invalidate',))
+    else:
+      self._queue(target, ('counted', self._counted(mapper), 0, 1))
+
+  def _entity_deleted(self, mapper, connection, target):
+    self._queue(target, ('invalidate',))
+
+  def _apply(self, session):
+    changes = session.info.pop('schedule_changes', None)
+    if not changes or self._postings is None:
+      return
+    with self._lock:
+      for change in changes:
+        if change[0] == 'invalidate':
+          self._postings = None
+          return
+        if change[0] == 'city':
+          self._venue_cities[change[1]] = change[2]
+          continue
+        if change[0] == 'genres':
+          self._artist_genres[change[1]] = change[2]
+          continue
+        if change[0] == 'counted':
+          position, rows, versions = change[1:]
+          self._adjust({position: rows, position + 1: versions})
+          continue
+        action, show_id, start, venue_id, artist_id = change
+        keys = self._keys(venue_id, artist_id)
+        if keys is None:
+          self._postings = None
+          return
+        for key in keys:
+          if key not in self._postings:
+            self._postings[key] = Postings()
+          getattr(self._postings[key], action)(to_seconds(start), show_id)
+        if action == 'add':
+          self._adjust({0: 1, 1: max(self._fingerprint[1] or 0, show_id) - (self._fingerprint[1] or 0)})
+        else:
+          self._adjust({0: -1})
+
+  def _adjust(self, deltas):
+    self._fingerprint = tuple((value or 0) + deltas.get(position, 0) if position in deltas else value
+                              for position, value in enumerate(self._fingerprint))
+
+  def _discard(self, session):
+    session.info.pop('schedule_changes', None)
+
+  def invalidate(self):
+    with self._lock:
+      self._postings = None
+
+  #  Building
+  #  ----------------------------------------------------------------
+
+  def _keys(self, venue_id, artist_id):
+    city = self._venue_cities.get(venue_id)
+    genres = self._artist_genres.get(artist_id)
+    if city is None or genres is None:
+      return None
+    return [None, ('venue', venue_id), ('artist', artist_id), ('city', city)] + \
+        [('genre', genre) for genre in genres]
+
+  def fingerprint(self, session):
+    venue, artist, program = self.venue, self.artist, self.program
+    # Core tables: soft-deleted rows count too
+    entities = []
+    for table in (venue.__table__, artist.__table__):
+      entities += [select(func.count(table.c.id)).scalar_subquery(),
+                   select(func.coalesce(func.sum(table.c.version), 0)).scalar_subquery()]
+    return tuple(session.execute(select(func.count(program.id), func.max(program.id), *entities)).first())
+
+  def build(self, session=None):
+    session = session or self.db.session
+    venue, artist, program = self.venue, self.artist, self.program
+    # read first: a show committed while the rows load only costs a rebuild
+    fingerprint = self.fingerprint(session)
+    self._venue_cities = dict((venue_id, normalize(city))
+                              for venue_id, city in session.query(venue.id, venue.city))
+    self._artist_genres = dict((artist_id, tuple(normalize(genre) for genre in genres or ()))
+                               for artist_id, genres in session.query(artist.id, artist.genres))
+    postings = {}
+    rows = session.query(program.id, program.time_to_start, program.venue_id, program.artist_id) \
+        .order_by(program.time_to_start, program.id) \
+        .yield_per(10000)
+    for show_id, start, venue_id, artist_id in rows:
+      start = to_seconds(start)
+      for key in self._keys(venue_id, artist_id) or ():
+        if key not in postings:
+          postings[key] = Postings()
+        postings[key].append(start, show_id)
+    self._postings = postings
+    self._fingerprint = fingerprint
+    self._checked_at = time.monotonic()
+    return postings
+
+  def _stale(self, session):
+    # whether another process changed the shows, venues or artists since
+    # the index was built; asks the database at most every check_interval
+    now = time.monotonic()
+    if now - self._checked_at < self.check_interval:
+      return False
+    self._checked_at = now
+    return self.fingerprint(session or self.db.session) != self._fingerprint
+
+  def _index(self, session):
+    with self._lock:
+      if self._postings is None or self._stale(session):
+        self.build(session)
+      return self._postings
+
+  #  Querying
+  #  ----------------------------------------------------------------
+
+  def query(self, start=None, end=None, city=None, genre=None, venue_id=None, artist_id=None,
+            after=None, limit=None, session=None):
+    # ids of the shows starting in [start, end] that match every given
+    # filter, in (time_to_start, id) order; `after` is the (time, id) of the
+    # last show of the previous page
+    keys = [None]
+    if city:
+      keys.append(('city', normalize(city)))
+    if genre:
+      keys.append(('genre', normalize(genre)))
+    if venue_id is not None:
+      keys.append(('venue', venue_id))
+    if artist_id is not None:
+      keys.append(('artist', artist_id))
+    start = None if start is None else to_seconds(start)
+    end = None if end is None else to_seconds(end)
+    after = None if after is None else (to_seconds(after[0]), after[1])
+
+    with self._lock:
+      index = self._index(session)
+      lists = [index.get(key) for key in keys[1:] or keys]
+      if any(postings is None for postings in lists):
+        return []
+      # walk the narrowest list, probe the others with id sets over the
+      # same time range
+      spans = [(postings.span(start, end, after), postings) for postings in lists]
+      spans.sort(key=lambda item: item[0][1] - item[0][0])
+      (lo, hi), driver = spans[0]
+      others = [set(postings.ids[other_lo:other_hi])
+                for (other_lo, other_hi), postings in spans[1:]]
+      ids = []
+      for position in range(lo, hi):
+        show_id = driver.ids[position]
+        if all(show_id in other for other in others):
+          ids.append(show_id)
+          if limit is not None and len(ids) >= limit:
+            break
+      return ids
+
+  def stats(self, session=None):
+    # posting lists, postings and bytes held by the index arrays
+    with self._lock:
+      index = self._index(session)
+      return {
+        'shows': len(index.get(None, ())),
+        'lists': len(index),
+        'postings': sum(len(postings) for postings in index.values()),
+        'array_bytes': sum(postings.nbytes() for postings in index.values()),
+      }
@@ -0,0 +1,158 @@
+#----------------------------------------------------------------------------#
+# Search backends for venues and artists.
+#
+# On Postgres a `search_document` column (name, city and genres, normalized)
+# is matched through a pg_trgm GIN index and ranked by trigram similarity,
+# with the total taken from a window function so one statement returns both
+# the page and the count. Other databases (SQLite test runs) fall back to an
+# in-process trigram index built from a single query. It is dropped when
+# this process writes a venue or artist through the ORM, or imports them;
+# writes from other processes are noticed at most every
+# SEARCH_INDEX_CHECK_SECONDS, by comparing the number of rows, the highest
+# id and the sum of their versions with the values it was built from.
+#----------------------------------------------------------------------------#
+
+import re
+import threading
+import time
+from sqlalchemy import event, func, inspect, select
+
+_whitespace = re.compile(r'\s+')
+
+
+def normalize(text):
+  return _whitespace.sub(' ', (text or '').lower()).strip()
+
+def search_document(name, city, genres):
+  return normalize(' '.join([name or '', city or ''] + list(genres or [])))
+
+def trigrams(text):
+  padded = '  ' + text + ' '
+  return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def similarity(a, b):
+  a, b = trigrams(a), trigrams(b)
+  if not a or not b:
+    return 0.0
+  return len(a & b) / float(len(a | b))
+
+def escape_like(term):
+  return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+class TrigramIndex(object):
+  # trigram -> ids postings over the normalized search documents
+
+  def __init__(self, rows):
+    self.documents = {}
+    self.postings = {}
+    for entity_id, name, document in rows:
+      self.documents[entity_id] = (normalize(name), document or '')
+      for gram in trigrams(document or ''):
+        self.postings.setdefault(gram, set()).add(entity_id)
+
+  def search(self, term):
+    # candidates must contain every inner trigram of the term, then the
+    # substring test removes false positives
+    inner = [term[i:i + 3] for i in range(len(term) - 2)]
+    if inner:
+      candidates = set.intersection(*[self.postings.get(gram, set()) for gram in inner])
+    else:
+      candidates = self.documents.keys()
+    matches = [entity_id for entity_id in candidates if term in self.documents[entity_id][1]]
+    matches.sort(key=lambda entity_id: (-similarity(self.documents[entity_id][0], term),
+                                        self.documents[entity_id][0], entity_id))
+    return matches
+
+
+class EntitySearch(object):
+
+  def __init__(self, db, model, fields):
+    # fields: the (name, city, genres) attributes feeding the search document
+    self.db = db
+    self.model = model
+    self.fields = fields
+    self._fallback = None
+    self._lock = threading.Lock()
+    self.check_interval = 5.0
+    # (rows, highest id, sum of versions) the fallback index reflects, and
+    # when that was last compared with the database
+    self._fingerprint = None
+    self._checked_at = 0.0
+    event.listen(model, 'before_insert', self._refresh_document)
+    event.listen(model, 'before_update', self._refresh_document)
+    for name in ('after_insert', 'after_update', 'after_delete'):
+      event.listen(model, name, self._invalidate)
+
+  def init_app(self, app):
+    self.check_interval = float(app.config.get('SEARCH_INDEX_CHECK_SECONDS', self.check_interval))
+
+  def _refresh_document(self, mapper, connection, target):
+    # updates leave the document alone (and out of the UPDATE) unless
+    # one of its fields changed
+    state = inspect(target)
+    if state.has_identity and not any(state.attrs[field].history.has_changes() for field in self.fields):
+      return
+    target.search_document = search_document(*[getattr(target, field) for field in self.fields])
+
+  def _invalidate(self, mapper, connection, target):
+    self.invalidate()
+
+  def invalidate(self):
+    self._fallback = None
+
+  def search(self, term, page=1, per_page=20, session=None):
+    # returns (entities on the requested page, total number of matches)
+    session = session or self.db.session
+    term = normalize(term)
+    page = max(page, 1)
+    offset = (page - 1) * per_page
+    if session.get_bind().dialect.name == 'postgresql':
+      return self._search_postgres(session, term, offset, per_page)
+    return self._search_fallback(session, term, offset, per_page)
+
+  def _search_postgres(self, session, term, offset, limit):
+    model = self.model
+    rows = session.query(model, func.count().over()) \
+        .filter(model.search_document.ilike('%' + escape_like(term) + '%', escape='\\')) \
+        .order_by(func.similarity(model.name, term).desc(), model.name, model.id) \
+        .offset(offset) \
+        .limit(limit) \
+        .all()
+    if not rows:
+      return [], 0
+    return [entity for entity, total in rows], rows[0][1]
+
+  def fingerprint(self, session):
+    # Core table: soft-deleted rows count too
+    table = self.model.__table__
+    return tuple(session.execute(select(func.count(table.c.id), func.max(table.c.id),
+                                        func.coalesce(func.sum(table.c.version), 0))).first())
+
+  def _stale(self, session):
+    # whether another process changed the rows since the build; asks the
+    # database at most every check_interval
+    now = time.monotonic()
+    if now - self._checked_at < self.check_interval:
+      return False
+    self._checked_at = now
+    return self.fingerprint(session) != self._fingerprint
+
+  def _search_fallback(self, session, term, offset, limit):
+    with self._lock:
+      index = self._fallback
+      if index is None or self._stale(session):
+        model = self.model
+        # read first: a row committed while the documents load only costs a rebuild
+        fingerprint = self.fingerprint(session)
+        index = TrigramIndex(session.query(
+            model.id, model.name, model.search_document).all())
+        self._fallback, self._fingerprint = index, fingerprint
+        self._checked_at = time.monotonic()
+    ids = index.search(term)
+    page_ids = ids[offset:offset + limit]
+    if not page_ids:
+      return [], len(ids)
+    entities = dict((entity.id, entity) for entity in
+                    session.query(self.model).filter(self.model.id.in_(page_ids)).all())
+    return [entities[entity_id] for entity_id in page_ids if entity_id in entities], len(ids)
@@ -0,0 +1,127 @@
+#----------------------------------------------------------------------------#
+# Show pages.
+#----------------------------------------------------------------------------#
+
+from flask import Blueprint, render_template, stream_template, request, Response, flash, current_app
+
+from extensions import db, page_cache
+from models import Venue, Artist, Program, schedule_index
+from filters import format_datetime, format_datetimes
+from genres import GENRES
+from booking import find_conflict
+from helpers import show_duration, encode_show_cursor, decode_show_cursor, show_filters, show_filter_args, \
+    local_naive
+
+blueprint = Blueprint('shows', __name__)
+
+def shows_payload(cursor=None, session=None, filters=None, format_times=True):
+  # one keyset page of shows: cursor seeks past the last (time_to_start, id)
+  # of the previous page. Returns (shows, cursor of the next page or None).
+  # Filtered pages (see show_filters) take their ids from the schedule index.
+  # The HTML page formats start times inside its cached tiles (format_times=False).
+  session = session or db.session
+  page_size = current_app.config['SHOWS_PAGE_SIZE']
+  programs = session.query(
+      Program.id,
+      Program.time_to_start,
+      Program.venue_id,
+      Venue.name,
+      Program.artist_id,
+      Artist.name,
+      Artist.image_link,
+      Program.updated_at,
+      Venue.updated_at,
+      Artist.updated_at
+  ).join(Venue, Program.venue_id == Venue.id) \
+   .join(Artist, Program.artist_id == Artist.id)
+
+  # one extra row tells us whether there is a next page
+  if filters:
+    ids = schedule_index.query(after=decode_show_cursor(cursor) if cursor else None,
+                               limit=page_size + 1, session=session, **filters)
+    position = dict((program_id, i) for i, program_id in enumerate(ids))
+    rows = programs.filter(Program.id.in_(ids)).all() if ids else []
+    rows.sort(key=lambda row: position[row[0]])
+  else:
+    if cursor:
+      programs = programs.filter(
+          db.tuple_(Program.time_to_start, Program.id) > db.tuple_(*decode_show_cursor(cursor)))
+    rows = programs.order_by(Program.time_to_start, Program.id).limit(page_size + 1).all()
+  next_cursor = None
+  if len(rows) > page_size:
+    rows = rows[:page_size]
+    next_cursor = encode_show_cursor(rows[-1][1], rows[-1][0])
+
+  start_times = [row[1] for row in rows]
+  if format_times:
+    start_times = format_datetimes(start_times, 'full')
+  data = []
+  for row, start_time in zip(rows, start_times):
+    program_id, time_to_start, venue_id, venue_name, artist_id, artist_name, artist_image_link = row[:7]
+    data.append({
+        "id": program_id,
+        "venue_id": venue_id,
+        "venue_name": venue_name,
+        "artist_id": artist_id,
+        "artist_name": artist_name,
+        "artist_image_link": artist_image_link,
+        "start_time": start_time,
+        # the tile shows all three rows
+        "updated_at": max(row[7:])
+    })
+  return data, next_cursor
+
+@blueprint.route('/shows')
+def shows():
+  # displays list of shows at /shows, one keyset page at a time
+  filters = show_filters()
+  data, next_cursor = shows_payload(request.args.get('cursor'), filters=filters, format_times=False)
+  # stream so the first tiles go out before the whole page is rendered
+  return Response(stream_template('pages/shows.html', shows=data, next_cursor=next_cursor,
+                                  filters=show_filter_args(), genres=GENRES))
+
+@blueprint.route('/shows/create')
+def create_shows():
+  from forms import ShowForm
+  # renders form. do not touch.
+  form = ShowForm()
+  return render_template('forms/new_show.html', form=form)
+
+@blueprint.route('/shows/create', methods=['POST'])
+def create_show_submission():
+  import dateutil.parser
+  # called to create new shows in the db, upon submitting new show listing form
+  # TODO: insert form data as a new Show record in the db, instead
+  try:
+    program = Program(artist_id=request.form['artist_id'], venue_id=request.form['venue_id'],
+                time_to_start=local_naive(dateutil.parser.parse(request.form['start_time'])))
+
+    # the form's typeahead fills in ids; a typed one may name nothing
+    if db.session.get(Artist, program.artist_id) is None or db.session.get(Venue, program.venue_id) is None:
+      flash('Program could not be listed: there is no such artist or venue.')
+      return render_template('pages/home.html')
+
+    conflict = find_conflict(db.session, Program, program.venue_id, program.artist_id,
+                             program.time_to_start, show_duration())
+    if conflict is not None:
+      kind, clash = conflict
+      flash('Program could not be listed: the %s already has a show at %s.' % (
+          kind, format_datetime(clash.time_to_start, 'full')))
+      return render_template('pages/home.html')
+
+    db.session.add(program)
+    db.session.commit()
+    page_cache.invalidate('venues', 'venue:%s' % request.form['venue_id'], 'artist:%s' % request.form['artist_id'])
+
+
+  # on successful db insert, flash success
+    flash('Program was successfully listed!')
+  # TODO: on unsuccessful db insert, flash an error instead.
+  # e.g., flash('An error occurred. Show could not be listed.')
+  # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  except:
+    db.session.rollback()
+    flash('An error occurred. Program could not be listed.')
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
@@ -0,0 +1,36 @@
+#----------------------------------------------------------------------------#
+# Test fixtures: the app on a throwaway SQLite database, without the page
+# cache, so every request renders.
+#----------------------------------------------------------------------------#
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['CACHE_TYPE'] = 'null'
+os.environ['JINJA_CACHE_DIR'] = ''
+
+import pytest
+
+from app import create_app
+from extensions import db as _db
+
+
+@pytest.fixture
+def app():
+  app = create_app()
+  app.config['TESTING'] = True
+  with app.app_context():
+    _db.create_all()
+    yield app
+    _db.session.remove()
+    _db.drop_all()
+
+@pytest.fixture
+def db(app):
+  return _db
+
+@pytest.fixture
+def client(app):
+  return app.test_client()
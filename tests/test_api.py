@@ -0,0 +1,31 @@
+#----------------------------------------------------------------------------#
+# The JSON API answers a matching If-None-Match with 304 until the
+# resource changes.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+from models import Venue, Artist, Program
+
+
+def test_etag_until_changed(db, client):
+  venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz'])
+  artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+  db.session.add_all([venue, artist])
+  db.session.commit()
+  venue_id, artist_id = venue.id, artist.id
+  db.session.remove()
+
+  response = client.get('/api/v1/venues/%d' % venue_id)
+  assert response.status_code == 200
+  etag = response.headers['ETag']
+  response = client.get('/api/v1/venues/%d' % venue_id, headers={'If-None-Match': etag})
+  assert response.status_code == 304
+  assert response.data == b''
+
+  db.session.add(Program(venue_id=venue_id, artist_id=artist_id, time_to_start=datetime.now() + timedelta(days=1)))
+  db.session.commit()
+  response = client.get('/api/v1/venues/%d' % venue_id, headers={'If-None-Match': etag})
+  assert response.status_code == 200
+  assert response.headers['ETag'] != etag
+  assert response.get_json()['upcoming_shows_count'] == 1
@@ -0,0 +1,63 @@
+#----------------------------------------------------------------------------#
+# A venue or artist cannot be booked for two overlapping shows, on the
+# create form or within one import chunk; back-to-back shows are fine.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+import importer
+from booking import Bookings
+from models import Venue, Artist, Program
+
+START = datetime(2031, 5, 21, 21, 30)
+
+
+def seed(db):
+  db.session.add_all([
+      Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz']),
+      Venue(name='The Dueling Pianos Bar', city='New York', state='NY', genres_categories=['Classical']),
+      Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll']),
+      Artist(name='Matt Quevedo', city='New York', state='NY', genres=['Jazz']),
+  ])
+  db.session.commit()
+
+def book(client, artist_id, venue_id, start):
+  response = client.post('/shows/create', data={'artist_id': artist_id, 'venue_id': venue_id,
+                                                 'start_time': start.strftime('%Y-%m-%d %H:%M:%S')})
+  assert response.status_code == 200
+  # the page rendered in reply shows the flashed message
+  return response.get_data(as_text=True)
+
+def test_double_booking_is_refused(app, db, client):
+  seed(db)
+  duration = timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
+  assert 'Program was successfully listed!' in book(client, 1, 1, START)
+
+  # the venue, then the artist, one minute before the first show ends
+  assert 'the venue already has a show' in book(client, 2, 1, START + duration - timedelta(minutes=1))
+  assert 'the artist already has a show' in book(client, 1, 2, START - duration + timedelta(minutes=1))
+  assert Program.query.count() == 1
+
+  # starting as the first show ends
+  assert 'Program was successfully listed!' in book(client, 2, 1, START + duration)
+  assert 'Program was successfully listed!' in book(client, 1, 2, START - duration)
+  assert Program.query.count() == 3
+
+def test_import_rows_clash_within_a_chunk(app, db):
+  seed(db)
+  duration = timedelta(minutes=app.config['SHOW_DURATION_MINUTES'])
+  validate = importer.show_validator(
+      importer.NameMap(db.session.query(Artist.id, Artist.name)),
+      importer.NameMap(db.session.query(Venue.id, Venue.name)),
+      Bookings([], duration))
+  starts = [START, START + timedelta(minutes=30), START + duration, START + duration]
+  rows = [(line_no, {'artist_id': line_no % 2 + 1, 'venue_id': 1, 'start_time': str(start)}, None)
+          for line_no, start in enumerate(starts, 1)]
+  rejected = []
+  with app.test_request_context():
+    accepted = importer.import_rows(db, Program.__table__, rows, validate, chunk_size=10,
+                                    on_reject=lambda line_no, row, error: rejected.append((line_no, error)))[0]
+  assert accepted == 2
+  assert rejected == [(2, 'start_time: the venue is already booked at that time'),
+                      (4, 'start_time: the venue is already booked at that time')]
+  assert sorted(start for start, in db.session.query(Program.time_to_start)) == [START, START + duration]
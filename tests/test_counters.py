@@ -0,0 +1,37 @@
+#----------------------------------------------------------------------------#
+# The stored show counters follow shows being booked, deleted and starting.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+from models import Venue, Artist, Program, show_counters
+
+
+def counters(entity):
+  return entity.upcoming_shows_count, entity.past_shows_count, entity.next_show_at
+
+def test_counters_after_create_delete_and_rollover(db):
+  now = datetime.now()
+  tomorrow, next_week = now + timedelta(days=1), now + timedelta(days=7)
+  venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz'])
+  artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+  db.session.add_all([venue, artist])
+  db.session.flush()
+  shows = [Program(venue_id=venue.id, artist_id=artist.id, time_to_start=start)
+           for start in (now - timedelta(days=1), tomorrow, next_week)]
+  db.session.add_all(shows)
+  db.session.commit()
+  assert counters(venue) == counters(artist) == (2, 1, tomorrow)
+
+  db.session.delete(shows[1])
+  db.session.commit()
+  assert counters(venue) == counters(artist) == (1, 1, next_week)
+  assert show_counters.drift(db.session) == []
+
+  # a week on, the last show has started
+  later = now + timedelta(days=8)
+  due = show_counters.rollover(db.session, later)
+  db.session.commit()
+  assert due == {Venue.__table__: [venue.id], Artist.__table__: [artist.id]}
+  assert counters(venue) == counters(artist) == (0, 2, None)
+  assert show_counters.drift(db.session, later) == []
@@ -0,0 +1,68 @@
+#----------------------------------------------------------------------------#
+# Deleting venues: soft deletes hide the venue's shows from the artists'
+# counters and pages, the sweep purges them, and hard deletes cascade to
+# the shows and recount the artists.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+from models import Venue, Artist, Program, show_counters, deletions
+
+
+def seed(db):
+  # the artist plays an upcoming show at each venue and a past one at the
+  # second
+  now = datetime.now()
+  hop = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz'])
+  dueling = Venue(name='The Dueling Pianos Bar', city='New York', state='NY', genres_categories=['Classical'])
+  artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+  db.session.add_all([hop, dueling, artist])
+  db.session.flush()
+  db.session.add_all([
+      Program(venue_id=hop.id, artist_id=artist.id, time_to_start=now + timedelta(days=10)),
+      Program(venue_id=dueling.id, artist_id=artist.id, time_to_start=now + timedelta(days=20)),
+      Program(venue_id=dueling.id, artist_id=artist.id, time_to_start=now - timedelta(days=10)),
+  ])
+  db.session.commit()
+  ids = hop.id, dueling.id, artist.id
+  db.session.remove()
+  return ids
+
+def artist_json(client, artist_id):
+  response = client.get('/api/v1/artists/%d' % artist_id)
+  assert response.status_code == 200
+  return response.get_json()
+
+def test_soft_delete_and_sweep(db, client, monkeypatch):
+  monkeypatch.setattr(deletions, 'soft', True)
+  hop_id, dueling_id, artist_id = seed(db)
+
+  response = client.delete('/venues/%d' % hop_id)
+  assert response.status_code == 302
+  assert db.session.get(Venue, hop_id) is None
+  artist = artist_json(client, artist_id)
+  assert artist['upcoming_shows_count'] == len(artist['upcoming_shows']) == 1
+  assert artist['past_shows_count'] == len(artist['past_shows']) == 1
+  assert show_counters.drift(db.session) == []
+
+  purged, affected = deletions.sweep(db.session)
+  assert purged[Venue.__table__] == [hop_id]
+  assert Program.query.filter_by(venue_id=hop_id).count() == 0
+  assert db.session.get(Venue, hop_id, execution_options={'include_deleted': True}) is None
+  artist = artist_json(client, artist_id)
+  assert (artist['upcoming_shows_count'], artist['past_shows_count']) == (1, 1)
+  assert show_counters.drift(db.session) == []
+
+def test_hard_delete_cascades(db, client):
+  hop_id, dueling_id, artist_id = seed(db)
+
+  response = client.delete('/venues/%d' % dueling_id)
+  assert response.status_code == 302
+  assert db.session.get(Venue, dueling_id) is None
+  assert Program.query.filter_by(venue_id=dueling_id).count() == 0
+  artist = db.session.get(Artist, artist_id)
+  assert (artist.upcoming_shows_count, artist.past_shows_count) == (1, 0)
+  assert show_counters.drift(db.session) == []
+  artist = artist_json(client, artist_id)
+  assert artist['upcoming_shows_count'] == len(artist['upcoming_shows']) == 1
+  assert artist['past_shows_count'] == len(artist['past_shows']) == 0
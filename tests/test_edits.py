@@ -0,0 +1,80 @@
+#----------------------------------------------------------------------------#
+# Saving the venue edit form is one UPDATE guarded by the form's version
+# token: a stale token is refused, an unchanged form writes nothing.
+#----------------------------------------------------------------------------#
+
+import re
+
+from models import Venue
+from profiler import profile_queries
+
+
+def seed_venue(db):
+  venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz'],
+                address='1015 Folsom Street', phone='123-123-1234')
+  db.session.add(venue)
+  db.session.commit()
+  venue_id = venue.id
+  db.session.remove()
+  return venue_id
+
+def edit_form(db, client, venue_id):
+  # the fields the edit page shows, as the browser would submit them
+  response = client.get('/venues/%d/edit' % venue_id)
+  assert response.status_code == 200
+  token = re.search(rb'name="version_token"[^>]*value="([^"]*)"', response.data).group(1).decode()
+  venue = db.session.get(Venue, venue_id)
+  return {
+    'name': venue.name, 'genres': venue.genres_categories, 'address': venue.address or '',
+    'city': venue.city, 'state': venue.state, 'phone': venue.phone or '', 'website_link': '',
+    'facebook_link': '', 'seeking_description': '', 'image_link': '', 'version_token': token,
+  }
+
+def submit(client, venue_id, form):
+  with profile_queries() as profile:
+    response = client.post('/venues/%d/edit' % venue_id, data=form)
+  assert response.status_code == 302
+  with client.session_transaction() as session:
+    flashes = [message for category, message in session.pop('_flashes', [])]
+  updates = [shape for shape, duration in profile.statements if shape.startswith('UPDATE "Venue"')]
+  return flashes, updates
+
+def stored(db, venue_id):
+  db.session.remove()
+  return db.session.get(Venue, venue_id)
+
+def test_edit_is_one_guarded_update(app, db, client):
+  app.config['WTF_CSRF_ENABLED'] = False
+  venue_id = seed_venue(db)
+  form = edit_form(db, client, venue_id)
+  form['name'] = 'The Dueling Pianos Bar'
+
+  flashes, updates = submit(client, venue_id, form)
+  assert flashes == ['Particular Venue  has been updated']
+  # only the changed column, checked against the form's version
+  assert updates == ['UPDATE "Venue" SET name=?, search_document=?, updated_at=?, version=? '
+                     'WHERE "Venue".id = ? AND "Venue".version = ?']
+  venue = stored(db, venue_id)
+  assert (venue.name, venue.city, venue.version) == ('The Dueling Pianos Bar', 'San Francisco', 2)
+
+def test_stale_token_is_refused(app, db, client):
+  app.config['WTF_CSRF_ENABLED'] = False
+  venue_id = seed_venue(db)
+  form = edit_form(db, client, venue_id)
+  other = dict(form, name='The Dueling Pianos Bar')
+  submit(client, venue_id, other)
+
+  # the first form was made before that save
+  form['city'] = 'Oakland'
+  flashes, updates = submit(client, venue_id, form)
+  assert flashes == ['This venue was changed by someone else meanwhile; reopen the form to edit it']
+  venue = stored(db, venue_id)
+  assert (venue.name, venue.city, venue.version) == ('The Dueling Pianos Bar', 'San Francisco', 2)
+
+def test_unchanged_form_writes_nothing(app, db, client):
+  app.config['WTF_CSRF_ENABLED'] = False
+  venue_id = seed_venue(db)
+  flashes, updates = submit(client, venue_id, edit_form(db, client, venue_id))
+  assert flashes == ['Particular Venue  has been updated']
+  assert updates == []
+  assert stored(db, venue_id).version == 1
@@ -0,0 +1,23 @@
+#----------------------------------------------------------------------------#
+# The in-process genre bitmaps (no Postgres) pick up venues written by
+# other processes.
+#----------------------------------------------------------------------------#
+
+from models import Venue, venue_genres
+
+
+def test_rows_written_elsewhere(db, monkeypatch):
+  monkeypatch.setattr(venue_genres, 'check_interval', 0)
+  db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz']))
+  db.session.commit()
+  assert venue_genres.counts() == {('San Francisco', 'CA'): {'Jazz': 1}}
+
+  # a bulk insert and retag, as `flask import` or another worker would do
+  table = Venue.__table__
+  db.session.execute(table.insert(), [{'name': 'The Blue Room', 'city': 'San Francisco', 'state': 'CA',
+                                       'genres': ['Jazz', 'Blues']}])
+  db.session.execute(table.update().where(table.c.name == 'The Musical Hop')
+                     .values(genres=['Folk'], version=table.c.version + 1))
+  db.session.commit()
+  assert venue_genres.counts() == {('San Francisco', 'CA'): {'Jazz': 1, 'Blues': 1, 'Folk': 1}}
+  assert [venue.name for venue in Venue.query.filter(venue_genres.criterion('Jazz'))] == ['The Blue Room']
@@ -0,0 +1,74 @@
+#----------------------------------------------------------------------------#
+# The schedule index picks up shows written by other processes and takes
+# start times outside the 32-bit range.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+
+from models import Venue, Artist, Program, schedule_index
+
+
+def seed(db):
+  venue = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz'])
+  artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+  db.session.add_all([venue, artist])
+  db.session.commit()
+  return venue.id, artist.id
+
+def test_far_dates(db):
+  venue_id, artist_id = seed(db)
+  for start in (datetime(1900, 1, 1), datetime(2024, 1, 1), datetime(2099, 5, 1)):
+    db.session.add(Program(venue_id=venue_id, artist_id=artist_id, time_to_start=start))
+  db.session.commit()
+  schedule_index.invalidate()
+  assert len(schedule_index.query(city='San Francisco')) == 3
+  assert len(schedule_index.query(city='San Francisco', start=datetime(2050, 1, 1))) == 1
+
+def test_rebuilds_after_writes_elsewhere(db, monkeypatch):
+  venue_id, artist_id = seed(db)
+  monkeypatch.setattr(schedule_index, 'check_interval', 0)
+  schedule_index.invalidate()
+  assert schedule_index.query(city='San Francisco') == []
+
+  # through the ORM in this process: applied in place, no rebuild
+  built = schedule_index._postings
+  db.session.add(Program(venue_id=venue_id, artist_id=artist_id, time_to_start=datetime(2030, 1, 1)))
+  db.session.add(Venue(name='Park Square Live', city='San Francisco', state='CA', genres_categories=['Folk']))
+  db.session.commit()
+  artist = db.session.get(Artist, artist_id)
+  artist.name = 'Guns N Roses'
+  db.session.commit()
+  assert len(schedule_index.query(city='San Francisco')) == 1
+  assert schedule_index._postings is built
+
+  # a bulk insert, as `flask import` or another worker would do
+  db.session.execute(Program.__table__.insert(),
+                     [{'venue_id': venue_id, 'artist_id': artist_id, 'time_to_start': datetime(2031, 1, 1),
+                       'updated_at': datetime.utcnow()}])
+  db.session.commit()
+  assert len(schedule_index.query(city='San Francisco')) == 2
+
+  db.session.execute(Program.__table__.delete().where(Program.time_to_start < datetime(2031, 1, 1)))
+  db.session.commit()
+  assert len(schedule_index.query(city='San Francisco')) == 1
+
+  # a venue moving city in another process, with the version bump of an
+  # ORM update
+  venues = Venue.__table__
+  db.session.execute(venues.update().values(city='Oakland', version=venues.c.version + 1))
+  db.session.commit()
+  assert schedule_index.query(city='San Francisco') == []
+  assert len(schedule_index.query(city='Oakland')) == 1
+
+def test_filters_with_a_zone(db, client):
+  venue_id, artist_id = seed(db)
+  db.session.add(Program(venue_id=venue_id, artist_id=artist_id, time_to_start=datetime(2030, 6, 1, 20)))
+  db.session.commit()
+  schedule_index.invalidate()
+  for start in ('2030-01-01T00:00:00Z', '2030-01-01T00:00:00+02:00'):
+    response = client.get('/shows', query_string={'from': start, 'city': 'San Francisco'})
+    assert response.status_code == 200
+    assert b'Guns N Petals' in response.data
+  response = client.get('/shows', query_string={'from': '2031-01-01T00:00:00-05:00', 'city': 'San Francisco'})
+  assert response.status_code == 200
+  assert b'Guns N Petals' not in response.data
@@ -0,0 +1,28 @@
+#----------------------------------------------------------------------------#
+# The in-process search index (no Postgres) picks up venues written by
+# other processes.
+#----------------------------------------------------------------------------#
+
+from models import Venue, venue_search
+
+
+def names(venues):
+  return sorted(venue.name for venue in venues)
+
+def test_rows_written_elsewhere(db, monkeypatch):
+  monkeypatch.setattr(venue_search, 'check_interval', 0)
+  db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz']))
+  db.session.commit()
+  venues, total = venue_search.search('hop')
+  assert (names(venues), total) == (['The Musical Hop'], 1)
+
+  # a bulk insert and rename, as `flask import` or another worker would do
+  table = Venue.__table__
+  db.session.execute(table.insert(), [{'name': 'Hop Scotch', 'city': 'Austin', 'state': 'TX',
+                                       'genres': ['Blues'], 'search_document': 'hop scotch austin blues'}])
+  db.session.execute(table.update().where(table.c.name == 'The Musical Hop')
+                     .values(name='The Dueling Pianos Bar', search_document='the dueling pianos bar',
+                             version=table.c.version + 1))
+  db.session.commit()
+  venues, total = venue_search.search('hop')
+  assert (names(venues), total) == (['Hop Scotch'], 1)
@@ -0,0 +1,67 @@
+#----------------------------------------------------------------------------#
+# The typeahead index replaces deleted top names on the spot and picks up
+# names and counts written by other processes.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+from models import Venue, Artist, Program, show_counters, venue_typeahead
+from typeahead import PrefixIndex
+
+
+def test_delete_pulls_in_the_next_name():
+  rows = [(i, 'Blue Note %d' % i, i) for i in range(1, 101)]
+  index = PrefixIndex(rows, top_k=5, hot_range=10)
+  assert 'b' in index._tops
+  assert [row[0] for row in index.complete('b', 3)] == [100, 99, 98]
+
+  index.remove(100)
+  index.shift(99, -99)
+  # still stored, so the next keystroke ranks nothing on the spot
+  assert 'b' in index._tops and 'blue note' in index._tops
+  assert [row[0] for row in index.complete('b', 5)] == [98, 97, 96, 95, 94]
+  assert [row[0] for row in index.complete('blue note 9', 3)] == [98, 97, 96]
+
+def test_names_written_elsewhere(db, monkeypatch):
+  monkeypatch.setattr(venue_typeahead, 'check_interval', 0)
+  db.session.add(Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz']))
+  db.session.commit()
+  venue_typeahead.invalidate()
+  assert [row[1] for row in venue_typeahead.complete('the')] == ['The Musical Hop']
+
+  # through the ORM in this process: applied in place, no rebuild
+  built = venue_typeahead._index
+  venue = Venue.query.first()
+  venue.name = 'The Dueling Pianos Bar'
+  db.session.commit()
+  assert [row[1] for row in venue_typeahead.complete('the')] == ['The Dueling Pianos Bar']
+  assert venue_typeahead._index is built
+
+  # a bulk insert, as `flask import` or another worker would do
+  db.session.execute(Venue.__table__.insert(), [{'name': 'The Blue Room', 'city': 'Austin', 'state': 'TX',
+                                                 'genres': ['Blues']}])
+  db.session.commit()
+  assert sorted(row[1] for row in venue_typeahead.complete('the')) == ['The Blue Room', 'The Dueling Pianos Bar']
+
+def test_counts_changed_in_bulk(db, monkeypatch):
+  monkeypatch.setattr(venue_typeahead, 'check_interval', 0)
+  hop = Venue(name='The Musical Hop', city='San Francisco', state='CA', genres_categories=['Jazz'])
+  artist = Artist(name='Guns N Petals', city='San Francisco', state='CA', genres=['Rock n Roll'])
+  db.session.add_all([hop, artist])
+  db.session.commit()
+  venue_typeahead.invalidate()
+  assert venue_typeahead.complete('the') == [(hop.id, 'The Musical Hop', 0)]
+
+  # booked through the ORM: counted in place, no rebuild
+  built = venue_typeahead._index
+  db.session.add(Program(venue_id=hop.id, artist_id=artist.id, time_to_start=datetime.now() + timedelta(days=1)))
+  db.session.commit()
+  assert venue_typeahead.complete('the') == [(hop.id, 'The Musical Hop', 1)]
+  assert venue_typeahead._index is built
+
+  # the show moved into the past and recounted in bulk, as the rollover does
+  program = Program.__table__
+  db.session.execute(program.update().values(time_to_start=datetime.now() - timedelta(days=1)))
+  show_counters.refresh(db.session)
+  db.session.commit()
+  assert venue_typeahead.complete('the') == [(hop.id, 'The Musical Hop', 0)]
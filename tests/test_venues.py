@@ -0,0 +1,54 @@
+#----------------------------------------------------------------------------#
+# /venues issues a fixed number of queries however many venues there are.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime, timedelta
+
+from models import Venue, Artist, Program
+from profiler import profile_queries, query_budget
+
+CITIES = [('San Francisco', 'CA'), ('New York', 'NY'), ('Austin', 'TX'), ('Seattle', 'WA')]
+
+
+def seed_venues(db, count, start=0):
+  artist = Artist.query.first()
+  if artist is None:
+    artist = Artist(name='The Wild Sax Band', city='San Francisco', state='CA', genres=['Jazz'])
+    db.session.add(artist)
+    db.session.flush()
+  now = datetime.now()
+  for i in range(start, start + count):
+    city, state = CITIES[i % len(CITIES)]
+    venue = Venue(name='Venue %d' % i, city=city, state=state, genres_categories=['Jazz', 'Folk'])
+    db.session.add(venue)
+    db.session.flush()
+    # one past and one upcoming show each, a day apart per venue so
+    # nothing double-books the artist
+    db.session.add(Program(venue_id=venue.id, artist_id=artist.id, time_to_start=now - timedelta(days=i + 1)))
+    db.session.add(Program(venue_id=venue.id, artist_id=artist.id, time_to_start=now + timedelta(days=i + 1)))
+  db.session.commit()
+  db.session.remove()
+
+def render(client, path):
+  with profile_queries() as profile:
+    response = client.get(path)
+  assert response.status_code == 200
+  return response, profile.count
+
+def test_venues_query_count_does_not_grow_with_venues(db, client):
+  seed_venues(db, 10)
+  response, few = render(client, '/venues')
+  assert b'Venue 9' in response.data
+
+  seed_venues(db, 90, start=10)
+  with query_budget(few, max_repeats=1):
+    response, many = render(client, '/venues')
+  assert b'Venue 99' in response.data
+  assert many == few
+
+def test_venues_by_genre_query_count_does_not_grow_with_venues(db, client):
+  seed_venues(db, 10)
+  few = render(client, '/venues?genre=Jazz')[1]
+  seed_venues(db, 90, start=10)
+  with query_budget(few, max_repeats=1):
+    render(client, '/venues?genre=Jazz')
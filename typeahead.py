@@ -0,0 +1,365 @@
+#----------------------------------------------------------------------------#
+# In-process prefix index for the artist and venue typeahead.
+#
+# Names are normalized (search.normalize) and kept sorted in a list, with
+# the ids, display names and upcoming show counts in parallel arrays, so
+# the names starting with a prefix are one contiguous range found by two
+# bisects. A range of at most HOT_RANGE names is ranked on the spot (by
+# upcoming shows, then name); larger ranges, the first few letters of a
+# name, have their top TOP_K precomputed when the index is built and kept
+# current on writes, so no keystroke scans more than HOT_RANGE names. A
+# name that leaves a top list (deleted, renamed, fewer shows) is replaced
+# on the spot from the top lists one character longer, deepest first.
+#
+# The index is built from one query on first use. Venues and artists
+# created, renamed or deleted through the ORM, and shows booked or deleted
+# through it, are applied once their transaction commits; the importer
+# drops the index so it is rebuilt. Anything else (other workers, `flask
+# import`, set-based deletes, shows starting) is noticed at most every
+# TYPEAHEAD_CHECK_SECONDS, by comparing the number of rows, the sum of
+# their versions and the sum of their upcoming show counts with the
+# values the index was built from; the index is then rebuilt while the
+# old one keeps serving.
+#
+# A PrefixIndex is not thread-safe: Typeahead reads and updates it under
+# one lock, as lookups also fill in top lists.
+#----------------------------------------------------------------------------#
+
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+
+from search import normalize
+
+TOP_K = 20
+HOT_RANGE = 512
+# sorts after any character a name can hold
+_END = '\U0010ffff'
+
+
+def _rank_key(entry):
+  # (count, key, id, name) entries: most upcoming shows first, then by
+  # position in the index
+  return (-entry[0], entry[1], entry[2])
+
+
+class PrefixIndex(object):
+
+  def __init__(self, rows, top_k=TOP_K, hot_range=HOT_RANGE):
+    # rows: (id, name, upcoming show count)
+    rows = sorted((normalize(name), entity_id, name, count or 0) for entity_id, name, count in rows)
+    self.keys = [row[0] for row in rows]
+    self.ids = array('i', (row[1] for row in rows))
+    self.names = [row[2] for row in rows]
+    self.counts = array('i', (row[3] for row in rows))
+    self.key_of = dict((row[1], row[0]) for row in rows)
+    self.top_k = top_k
+    self.hot_range = hot_range
+    self._tops = {}
+    del rows
+    self._precompute()
+
+  def __len__(self):
+    return len(self.keys)
+
+  def _range(self, prefix, lo=0, hi=None):
+    hi = len(self.keys) if hi is None else hi
+    lo = bisect_left(self.keys, prefix, lo, hi)
+    return lo, bisect_left(self.keys, prefix + _END, lo, hi)
+
+  def _entry(self, position):
+    return (self.counts[position], self.keys[position], self.ids[position], self.names[position])
+
+  def _rank(self, lo, hi, k):
+    # [(count, key, id, name)] of the k positions in [lo, hi) with the most
+    # upcoming shows; ties keep index order
+    return [self._entry(position)
+            for position in heapq.nlargest(k, range(lo, hi), key=self.counts.__getitem__)]
+
+  def _top(self, prefix, lo, hi):
+    # top list of the range [lo, hi) of prefix: ranked on the spot when
+    # small, else the stored one (ranked now if the range grew past
+    # hot_range since the build)
+    if hi - lo <= self.hot_range:
+      return self._rank(lo, hi, self.top_k)
+    top = self._tops.get(prefix)
+    if top is None:
+      top = self._tops[prefix] = self._rank(lo, hi, self.top_k)
+    return top
+
+  def _children(self, prefix, lo, hi):
+    # yields the entries named exactly prefix, and (child prefix, lo, hi)
+    # of the ranges one character longer, in [lo, hi)
+    depth = len(prefix) + 1
+    position = lo
+    while position < hi:
+      child = self.keys[position][:depth]
+      if len(child) < depth:
+        yield self._entry(position), None, None
+        position += 1
+        continue
+      start, end = self._range(child, position, hi)
+      yield child, start, end
+      position = end
+
+  def _precompute(self, prefix='', lo=0, hi=None):
+    # top list of the range [lo, hi) of prefix, stored when the range holds
+    # more than hot_range names. It is merged from the top lists of the
+    # ranges one character longer, so each name is ranked once.
+    hi = len(self.keys) if hi is None else hi
+    if hi - lo <= self.hot_range:
+      return self._rank(lo, hi, self.top_k)
+    candidates = []
+    for child, start, end in self._children(prefix, lo, hi):
+      if start is None:
+        # the name is the prefix itself
+        candidates.append(child)
+      else:
+        candidates.extend(self._precompute(child, start, end))
+    top = heapq.nsmallest(self.top_k, candidates, key=_rank_key)
+    if prefix:
+      self._tops[prefix] = top
+    return top
+
+  def _rerank(self, prefix):
+    # recomputes the stored top list of prefix from the top lists of the
+    # ranges one character longer, which must be current
+    lo, hi = self._range(prefix)
+    if hi - lo <= self.hot_range:
+      # ranked on the spot from now on
+      del self._tops[prefix]
+      return
+    candidates = []
+    for child, start, end in self._children(prefix, lo, hi):
+      if start is None:
+        candidates.append(child)
+      else:
+        candidates.extend(self._top(child, start, end))
+    self._tops[prefix] = heapq.nsmallest(self.top_k, candidates, key=_rank_key)
+
+  def complete(self, prefix, k=10):
+    # [(id, name, upcoming show count)] of the best k names starting with prefix
+    term = normalize(prefix)
+    if not term:
+      return []
+    if prefix[-1].isspace():
+      # "blue " stops at the end of the word
+      term += ' '
+    lo, hi = self._range(term)
+    if hi - lo <= self.hot_range:
+      top = self._rank(lo, hi, k)
+    else:
+      top = self._top(term, lo, hi)
+    return [(entity_id, name, count) for count, key, entity_id, name in top[:k]]
+
+  #  Updates
+  #  ----------------------------------------------------------------
+
+  def _position(self, entity_id):
+    key = self.key_of[entity_id]
+    position = bisect_left(self.keys, key)
+    while self.ids[position] != entity_id:
+      position += 1
+    return position
+
+  def _promote(self, entry):
+    # enters (count, key, id, name) into the top lists of its prefixes
+    key = entry[1]
+    for length in range(1, len(key) + 1):
+      top = self._tops.get(key[:length])
+      if top is None:
+        continue
+      top[:] = [other for other in top if other[2] != entry[2]]
+      if len(top) < self.top_k or _rank_key(entry) < _rank_key(top[-1]):
+        top.append(entry)
+        top.sort(key=_rank_key)
+        del top[self.top_k:]
+
+  def _demote(self, key, entity_id):
+    # reranks the top lists holding the id, longest prefix first, so each
+    # merges top lists already current; the next best name moves up
+    for length in range(len(key), 0, -1):
+      top = self._tops.get(key[:length])
+      if top is not None and any(other[2] == entity_id for other in top):
+        self._rerank(key[:length])
+
+  def add(self, entity_id, name, count=0):
+    if entity_id in self.key_of:
+      self.remove(entity_id)
+    key = normalize(name)
+    position = bisect_left(self.keys, key)
+    while position < len(self.keys) and self.keys[position] == key and self.ids[position] < entity_id:
+      position += 1
+    self.keys.insert(position, key)
+    self.ids.insert(position, entity_id)
+    self.names.insert(position, name)
+    self.counts.insert(position, count)
+    self.key_of[entity_id] = key
+    self._promote((count, key, entity_id, name))
+
+  def remove(self, entity_id):
+    if entity_id not in self.key_of:
+      return None
+    position = self._position(entity_id)
+    count = self.counts[position]
+    key = self.key_of.pop(entity_id)
+    del self.keys[position], self.ids[position], self.names[position], self.counts[position]
+    self._demote(key, entity_id)
+    return count
+
+  def rename(self, entity_id, name):
+    count = self.remove(entity_id)
+    if count is not None:
+      self.add(entity_id, name, count)
+
+  def shift(self, entity_id, delta):
+    # upcoming show count += delta
+    if entity_id not in self.key_of:
+      return
+    position = self._position(entity_id)
+    self.counts[position] += delta
+    entry = self._entry(position)
+    if delta > 0:
+      self._promote(entry)
+    else:
+      self._demote(entry[1], entity_id)
+
+
+class Typeahead(object):
+
+  def __init__(self, db, model, program, key):
+    # key: the program attribute pointing at model
+    self.db = db
+    self.model = model
+    self.key = key
+    self._index = None
+    self._lock = threading.RLock()
+    self._info_key = 'typeahead:%s' % model.__tablename__
+    self.check_interval = 5.0
+    # (rows, sum of versions, sum of upcoming show counts) the index reflects, when that was last
+    # compared with the database, and whether a rebuild is under way
+    self._fingerprint = None
+    self._checked_at = 0.0
+    self._rebuilding = False
+    event.listen(model, 'after_insert', self._entity_inserted)
+    event.listen(model, 'after_update', self._entity_updated)
+    event.listen(model, 'after_delete', self._entity_deleted)
+    event.listen(program, 'after_insert', self._show_inserted)
+    event.listen(program, 'after_delete', self._show_deleted)
+    event.listen(Session, 'after_commit', self._apply)
+    event.listen(Session, 'after_rollback', self._discard)
+
+  def init_app(self, app):
+    self.check_interval = float(app.config.get('TYPEAHEAD_CHECK_SECONDS', self.check_interval))
+
+  #  Change tracking
+  #  ----------------------------------------------------------------
+
+  def _queue(self, target, change):
+    inspect(target).session.info.setdefault(self._info_key, []).append(change)
+
+  def _entity_inserted(self, mapper, connection, target):
+    count = target.upcoming_shows_count or 0
+    self._queue(target, ('add', target.id, target.name, count))
+    self._queue(target, ('counted', 1, target.version, count))
+
+  def _entity_updated(self, mapper, connection, target):
+    attrs = inspect(target).attrs
+    if attrs.deleted_at.history.has_changes() and target.deleted_at is not None:
+      self._queue(target, ('remove', target.id))
+    elif attrs.name.history.has_changes():
+      self._queue(target, ('rename', target.id, target.name))
+    # every ORM update bumps the version
+    self._queue(target, ('counted', 0, 1, 0))
+
+  def _entity_deleted(self, mapper, connection, target):
+    self._queue(target, ('remove', target.id))
+    self._queue(target, ('counted', -1, -target.version, -(target.upcoming_shows_count or 0)))
+
+  def _show_inserted(self, mapper, connection, target):
+    if target.time_to_start > datetime.now():
+      # counters.py bumps the stored count in the same flush
+      self._queue(target, ('shift', getattr(target, self.key), 1))
+      self._queue(target, ('counted', 0, 0, 1))
+
+  def _show_deleted(self, mapper, connection, target):
+    if target.time_to_start > datetime.now():
+      self._queue(target, ('shift', getattr(target, self.key), -1))
+      self._queue(target, ('counted', 0, 0, -1))
+
+  def _apply(self, session):
+    changes = session.info.pop(self._info_key, None)
+    if not changes or self._index is None:
+      return
+    with self._lock:
+      index = self._index
+      if index is None:
+        return
+      for change in changes:
+        if change[0] == 'counted':
+          self._fingerprint = tuple(value + delta for value, delta in zip(self._fingerprint, change[1:]))
+        else:
+          getattr(index, change[0])(*change[1:])
+
+  def _discard(self, session):
+    session.info.pop(self._info_key, None)
+
+  def invalidate(self):
+    with self._lock:
+      self._index = None
+
+  #  Building and querying
+  #  ----------------------------------------------------------------
+
+  def fingerprint(self, session):
+    # Core table: soft-deleted rows count too
+    table = self.model.__table__
+    rows, versions, counts = session.execute(select(
+        func.count(table.c.id),
+        func.coalesce(func.sum(table.c.version), 0),
+        func.coalesce(func.sum(table.c.upcoming_shows_count), 0))).first()
+    return rows, versions, counts
+
+  def build(self, session=None):
+    session = session or self.db.session
+    model = self.model
+    # read first: a row committed while the names load only costs a rebuild
+    fingerprint = self.fingerprint(session)
+    index = PrefixIndex(session.query(model.id, model.name, model.upcoming_shows_count).yield_per(10000))
+    with self._lock:
+      self._index, self._fingerprint = index, fingerprint
+      self._checked_at = time.monotonic()
+    return index
+
+  def _stale(self, session):
+    # whether the names or counts changed elsewhere since the build; one
+    # thread asks the database, at most every check_interval
+    with self._lock:
+      now = time.monotonic()
+      if self._rebuilding or now - self._checked_at < self.check_interval:
+        return False
+      self._checked_at = now
+      fingerprint = self._fingerprint
+    return self.fingerprint(session or self.db.session) != fingerprint
+
+  def complete(self, prefix, k=10, session=None):
+    index = self._index
+    if index is None:
+      with self._lock:
+        index = self._index
+        if index is None:
+          index = self.build(session)
+    elif self._stale(session):
+      # this request rebuilds; the others keep the old index until then
+      self._rebuilding = True
+      try:
+        index = self.build(session)
+      finally:
+        self._rebuilding = False
+    with self._lock:
+      return index.complete(prefix, k)
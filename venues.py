@@ -0,0 +1,241 @@
+#----------------------------------------------------------------------------#
+# Venue pages.
+#
+# The WTForms classes are imported inside the form views, so only requests
+# that render or read a form load them.
+#----------------------------------------------------------------------------#
+
+from datetime import datetime
+from flask import Blueprint, render_template, request, flash, redirect, url_for, abort
+from sqlalchemy.orm.exc import StaleDataError
+
+from extensions import db, page_cache
+from models import Venue, Program, venue_search, venue_genres, deletions
+from filters import format_datetimes
+from genres import facet_list
+from edits import apply_edit, version_token
+from helpers import program_timeline, past_page_args, search_payload, expire_cache_at, \
+    venue_page_keys, genre_arg
+
+blueprint = Blueprint('venues', __name__)
+
+def venues_payload(session=None, genre=None):
+  session = session or db.session
+  # every venue (tagged with `genre`, if given) with its materialized
+  # upcoming-show count, bucketed by (city, state) in a single pass. Each
+  # area carries the genre counts of all its venues.
+  now_date = datetime.now()
+  rows = session.query(
+      Venue.id,
+      Venue.name,
+      Venue.city,
+      Venue.state,
+      Venue.upcoming_shows_count,
+      Venue.next_show_at,
+      Venue.updated_at
+  )
+  if genre is not None:
+    rows = rows.filter(venue_genres.criterion(genre, session))
+  rows = rows.order_by(Venue.state, Venue.city, Venue.name).all()
+  facets = venue_genres.counts(session)
+
+  # venues whose next show started since the last rollover are recounted
+  pending = set(row[0] for row in rows if row[5] is not None and row[5] <= now_date)
+  recounted = {}
+  if pending:
+    recounted = dict((venue_id, (count, next_at)) for venue_id, count, next_at in session.query(
+        Program.venue_id,
+        db.func.count(Program.id),
+        db.func.min(Program.time_to_start)
+    ).filter(Program.venue_id.in_(list(pending)), Program.time_to_start > now_date) \
+     .group_by(Program.venue_id))
+
+  areas = {}
+  next_show_at = None
+  for venue_id, name, city, state, num_upcoming_programs, next_program_at, updated_at in rows:
+    if venue_id in pending:
+      num_upcoming_programs, next_program_at = recounted.get(venue_id, (0, None))
+    if next_program_at is not None and (next_show_at is None or next_program_at < next_show_at):
+      next_show_at = next_program_at
+    area = areas.setdefault((city, state), {
+        "city": city,
+        "state": state,
+        "genres": facet_list(facets.get((city, state), {})),
+        "venues": [],
+        # with the venue count, versions the area's cached venue list
+        "updated_at": updated_at
+    })
+    area['venues'].append({
+        "id": venue_id,
+        "name": name,
+        "num_upcoming_shows": num_upcoming_programs
+    })
+    area['updated_at'] = max(area['updated_at'], updated_at)
+  data = list(areas.values())
+  # counts change as soon as the next show starts
+  expire_cache_at(next_show_at)
+  return data
+
+@blueprint.route('/venues')
+@page_cache.cached('venues')
+def venues():
+  genre = genre_arg()
+  return render_template('pages/venues.html', areas=venues_payload(genre=genre), genre=genre)
+
+@blueprint.route('/venues/search', methods=['POST'])
+def search_venues():
+  # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
+  # seach for Hop should return "The Musical Hop".
+  # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
+  response = search_payload(venue_search, request.form)
+  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+
+def venue_payload(venue_id, past_limit=None, past_offset=0, session=None):
+  session = session or db.session
+  particular_venue = session.query(Venue).get(venue_id)
+  if particular_venue is None:
+    abort(404)
+  upcoming, past, upcoming_count, past_count = program_timeline(
+      session, particular_venue, Program.venue_id == venue_id, Program.artist, past_limit, past_offset)
+
+  def program_data(programs):
+    start_times = format_datetimes([program.time_to_start for program in programs], 'full')
+    return [{
+        "artist_id": program.artist_id,
+        "artist_name": program.artist.name,
+        "artist_image_link": program.artist.image_link,
+        "start_time": start_time
+    } for program, start_time in zip(programs, start_times)]
+  future_programs = program_data(upcoming)
+  prev_programs = program_data(past)
+  # the upcoming/past split moves when the next show starts
+  expire_cache_at(upcoming[0].time_to_start if upcoming else None)
+
+  data={
+    "id": particular_venue.id,
+    "name": particular_venue.name,
+    "genres": particular_venue.genres_categories,
+    "address": particular_venue.address,
+    "city": particular_venue.city,
+    "state": particular_venue.state,
+    "phone": particular_venue.phone,
+    "website_link": particular_venue.web_link,
+    "facebook_link": particular_venue.facebook_link,
+    "seeking_talent": particular_venue.looking_for_talent,
+    "seeking_description":particular_venue.seek_desc,
+    "image_link": particular_venue.image_link,
+    "past_shows": prev_programs,
+    "upcoming_shows": future_programs,
+    "past_shows_count": past_count,
+    "upcoming_shows_count": upcoming_count,
+  }
+  return data
+
+@blueprint.route('/venues/<int:venue_id>')
+@page_cache.cached('venue:{venue_id}')
+def show_venue(venue_id):
+  # shows the venue page with the given venue_id
+  data = venue_payload(venue_id, *past_page_args())
+  return render_template('pages/show_venue.html', venue=data)
+
+#  Create Venue
+#  ----------------------------------------------------------------
+
+@blueprint.route('/venues/create', methods=['GET'])
+def create_venue_form():
+  from forms import VenueForm
+  form = VenueForm()
+  return render_template('forms/new_venue.html', form=form)
+
+@blueprint.route('/venues/create', methods=['POST'])
+def create_venue_submission():
+  from forms import VenueForm
+  # TODO: insert form data as a new Venue record in the db, instead
+  # TODO: modify data to be the data object returned from db insertion
+  try:
+      # get form data and create 
+    form = VenueForm()
+    venue_instance = Venue(name=form.name.data, city=form.city.data, state=form.state.data, address=form.address.data,phone=form.phone.data, image_link=form.image_link.data,genres_categories=form.genres.data, facebook_link=form.facebook_link.data, seek_desc=form.seeking_description.data,
+                  web_link=form.website_link.data, looking_for_talent=form.seeking_talent.data)
+    # on successful db insert, flash success
+    db.session.add(venue_instance)
+    db.session.commit()
+    page_cache.invalidate('venues')
+    flash('Venue ' + request.form['name'] + ' was successfully listed!')
+    # TODO: on unsuccessful db insert, flash an error instead.
+    # e.g., flash('An error occurred. Venue ' + data.name + ' could not be listed.')
+    # see: http://flask.pocoo.org/docs/1.0/patterns/flashing/
+  except:
+    # catching error exception
+    db.session.rollback()
+    flash('An error occurred while creating venue')
+  finally:
+    db.session.close()
+  return render_template('pages/home.html')
+
+@blueprint.route('/venues/<venue_id>', methods=['DELETE'])
+def delete_venue(venue_id):
+  # TODO: Complete this endpoint for taking a venue_id, and using
+  # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
+
+  # BONUS CHALLENGE: Implement a button to delete a Venue on a Venue Page, have it so that
+  # clicking that button delete it from the db then redirect the user to the homepage
+  
+  try:
+    # its shows go in set-based batches (or, with SOFT_DELETE, later)
+    stale_pages = venue_page_keys(venue_id)
+    if deletions.delete(db.session, Venue, venue_id):
+      db.session.commit()
+      page_cache.invalidate(*stale_pages)
+      flash('Desired Venue  was deleted successfully')
+    else:
+      flash('Venue not found')
+  except:
+    flash('An error occurred while delting venue')
+    db.session.rollback()
+  finally:
+    db.session.close()
+
+  return redirect(url_for('index'))
+
+#  Update
+#  ----------------------------------------------------------------
+
+# (model attribute, form field) pairs of the edit form, in version token order
+EDIT_FIELDS = [
+  ('name', 'name'), ('genres_categories', 'genres'), ('address', 'address'), ('city', 'city'),
+  ('state', 'state'), ('phone', 'phone'), ('web_link', 'website_link'),
+  ('facebook_link', 'facebook_link'), ('looking_for_talent', 'seeking_talent'),
+  ('seek_desc', 'seeking_description'), ('image_link', 'image_link'),
+]
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['GET'])
+def edit_venue(venue_id):
+  from forms import VenueForm
+  venue_to_be_edited = Venue.query.get_or_404(venue_id)
+  form = VenueForm(data=dict((field, getattr(venue_to_be_edited, attribute)) for attribute, field in EDIT_FIELDS))
+  form.version_token.data = version_token(venue_to_be_edited.version,
+                                          [form[field].data for attribute, field in EDIT_FIELDS])
+  return render_template('forms/edit_venue.html', form=form, venue=venue_to_be_edited)
+
+@blueprint.route('/venues/<int:venue_id>/edit', methods=['POST'])
+def edit_venue_submission(venue_id):
+  from forms import VenueForm
+  form = VenueForm()
+  try:
+    # one UPDATE of the changed columns, guarded by the version the form was made from
+    changed = apply_edit(db.session, Venue, venue_id, form.version_token.data,
+                         [(attribute, form[field].data) for attribute, field in EDIT_FIELDS])
+    stale_pages = venue_page_keys(venue_id) if changed else []
+    db.session.commit()
+    page_cache.invalidate(*stale_pages)
+    flash('Particular Venue  has been updated')
+  except StaleDataError:
+    db.session.rollback()
+    flash('This venue was changed by someone else meanwhile; reopen the form to edit it')
+  except:
+    db.session.rollback()
+    flash('Error while updating venue')
+  finally:
+    db.session.close()
+  return redirect(url_for('venues.show_venue', venue_id=venue_id))